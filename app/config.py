@@ -1,5 +1,6 @@
 """Application configuration"""
 
+import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import List
 
@@ -16,20 +17,139 @@ class Settings(BaseSettings):
     )
     
     # OpenAI Configuration
-    openai_api_key: str  # Required - set via OPENAI_API_KEY environment variable
+    openai_api_key: str = ""  # Required for analysis - set via OPENAI_API_KEY environment variable
     openai_model: str = "gpt-4o"
+    openai_requests_per_minute: int = 500  # 0 = unlimited
+    openai_tokens_per_minute: int = 0  # 0 = unlimited; set to the account's TPM limit
+    openai_max_retries: int = 5
     
     # Server Configuration
     max_file_size_mb: int = 10
     allowed_extensions: str = "jpg,jpeg,png,pdf"
     
-    # Logging
+    # Logging (queued, written by a background thread)
     log_level: str = "INFO"
+    log_format: str = "json"  # "json" (one object per line) or "text"
+    log_sample_rates: str = ""  # Shares of INFO/DEBUG records kept per logger, e.g. "app.utils.image_utils=0.1"
+    log_max_message_length: int = 2000  # Longer messages are cut (0 = no limit)
     
     # API Configuration
     api_v1_prefix: str = "/api/v1"
     cors_origins: str = "*"
     
+    # Startup: load PyMuPDF/PIL/OpenAI SDK and create services before serving
+    # (default: load them in the background after the first health check can answer)
+    eager_startup: bool = False
+    
+    # Single-flight coalescing of identical concurrent uploads
+    single_flight_enabled: bool = True
+    single_flight_cross_worker: bool = True
+    single_flight_lock_ttl_seconds: float = 180.0
+    
+    # Speculative extraction (start extraction for the likely type while classifying)
+    speculative_extraction: bool = False
+    speculation_min_samples: int = 5
+    speculation_min_probability: float = 0.6
+    
+    # Extraction output budget (learned per document type, capped here)
+    # and continuation calls for responses cut off at max_tokens
+    extraction_max_output_tokens: int = 4096
+    extraction_max_continuations: int = 2
+    
+    # Ask the model for arrays of objects as tables (header row + value rows)
+    compact_output: bool = False
+    
+    # Turn sideways, upside-down and skewed pages upright before encoding
+    # (EXIF orientation is always applied); pages with unclear direction are left as they are
+    auto_orient: bool = False
+    
+    # Local image quality gate before any model call: "reject", "flag" or "off"
+    # ("flag" until the thresholds are validated on real phone photos)
+    quality_gate: str = "flag"
+    quality_min_ink_coverage: float = 0.002
+    quality_min_sharpness: float = 50.0
+    quality_min_text_likelihood: float = 0.3
+    
+    # Tiled extraction: lab result tables read from overlapping high-resolution strips
+    tiled_extraction: bool = False
+    tile_overlap: float = 0.15
+    tile_max_count: int = 6
+    
+    # Multi-document photos: find separate documents and analyze each one
+    split_documents: bool = False
+    
+    # Worker Configuration
+    web_concurrency: int = 0  # 0 = derive from CPU count
+    max_workers: int = 8
+    
+    # Priority Lanes (X-Priority header: interactive or batch)
+    interactive_max_concurrency: int = 16
+    interactive_max_queue: int = 32
+    interactive_deadline_seconds: float = 90.0
+    interactive_image_workers: int = 2
+    interactive_model_concurrency: int = 16
+    batch_max_concurrency: int = 4
+    batch_max_queue: int = 100
+    batch_deadline_seconds: float = 600.0
+    batch_image_workers: int = 1
+    batch_model_concurrency: int = 4
+    batch_tenants: str = ""  # Comma-separated tenants always routed to the batch lane
+    
+    # Adaptive (AIMD) model API concurrency per lane; *_model_concurrency are the upper bounds
+    adaptive_model_concurrency: bool = True
+    model_concurrency_initial: int = 4
+    model_concurrency_min: int = 1
+    model_latency_tolerance: float = 1.5  # Latency over the best seen that counts as overload
+    
+    # Event-loop lag monitor and load shedding: over a threshold, analyze answers
+    # 503 with Retry-After and the health endpoint reports the worker not ready
+    loop_lag_sample_interval_ms: float = 100.0  # 0 disables the monitor
+    loop_lag_window_seconds: float = 2.0  # Lag is the maximum over this window
+    shed_max_loop_lag_ms: float = 1000.0  # 0 = never shed on lag
+    shed_max_queued: int = 0  # Requests queued across lanes; 0 = never shed on queue depth
+    shed_retry_after_seconds: int = 2
+    
+    # Shared State (cross-worker, SQLite WAL)
+    shared_state_path: str = "/tmp/meddocs_shared_state.db"
+    result_cache_enabled: bool = False  # Stores full results (patient data) in the shared state file
+    result_cache_ttl_seconds: int = 3600
+    
+    # Token (X-API-Key header) for endpoints that return stored patient data; empty disables them
+    data_api_token: str = ""
+    
+    # Full-text search over analyzed documents (stores extracted fields on disk)
+    search_index_enabled: bool = False
+    search_index_path: str = "/tmp/meddocs_search.db"
+    
+    # Per-patient lab value time series (stores patient identifiers and values on disk)
+    trend_store_enabled: bool = False
+    trend_store_path: str = "/tmp/meddocs_trends.db"
+    
+    # Streaming export from the document database (database_schema.sql); empty disables it
+    database_url: str = ""
+    export_batch_size: int = 10000
+    
+    # Canonical codes for lab test and medication names (test_code / code fields)
+    name_normalization: bool = True
+    name_dictionary_path: str = ""  # Extra synonyms JSON merged into the bundled dictionary
+    
+    # Critical limits per test code and unit, as defined by the laboratory (JSON);
+    # without them lab results are only marked normal or abnormal
+    critical_limits_path: str = ""
+    
+    # OpenTelemetry tracing of the analyze pipeline: "file", "otlp" or "" (off)
+    tracing_exporter: str = ""
+    tracing_file_path: str = "/tmp/meddocs_traces.jsonl"
+    tracing_otlp_endpoint: str = ""  # e.g. http://localhost:4318/v1/traces (default: OTEL_EXPORTER_OTLP_* variables)
+    tracing_service_name: str = "medical-documents-ocr"
+    
+    # On-demand profiling of /analyze requests (X-Profile-Token header or sampling), listed at /debug/profiles
+    profiling_token: str = ""  # Admin token; empty disables on-demand profiles and /debug/profiles
+    profiling_sample_rate: float = 0.0  # Share of requests profiled without the token
+    profiling_engine: str = "cprofile"  # "cprofile" (pstats) or "pyinstrument" (HTML flame graph)
+    profiling_dir: str = "/tmp/meddocs_profiles"
+    profiling_max_profiles: int = 50
+    
     @property
     def allowed_extensions_list(self) -> List[str]:
         """Get allowed extensions as a list"""
@@ -46,6 +166,14 @@ class Settings(BaseSettings):
         if self.cors_origins == "*":
             return ["*"]
         return [origin.strip() for origin in self.cors_origins.split(",")]
+    
+    @property
+    def worker_count(self) -> int:
+        """Get number of worker processes (explicit or derived from CPU count)"""
+        if self.web_concurrency > 0:
+            return self.web_concurrency
+        cpu_count = os.cpu_count() or 1
+        return max(1, min(cpu_count, self.max_workers))
 
 
 # Global settings instance
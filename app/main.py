@@ -1,39 +1,127 @@
 """Main FastAPI application"""
 
+import asyncio
+import contextvars
+import hashlib
+import hmac
 import logging
 import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from datetime import datetime
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from typing import List
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 
 from app.config import settings
 from app.models import (
+    AnalyzeOptions,
     AnalyzeResponse,
+    SearchResponse,
+    TrendsResponse,
     HealthResponse,
     SupportedDocumentsResponse,
     DocumentTypeInfo,
     ErrorResponse
 )
 from app.schemas.base import DocumentType
-from app.services import OpenAIService, DocumentClassifier, DocumentParser
-from app.utils import encode_image_to_base64, validate_image, get_file_extension
+from app.services import OpenAIService, DocumentClassifier, DocumentParser, SharedStore
+from app.services.priority_lanes import PriorityLanes, Lane, LaneFullError
+from app.services.speculation import SpeculativeAnalyzer, TypePredictor
+from app.services.single_flight import SingleFlight
+from app.services.tiled_extraction import TiledExtractor
+from app.services.search_index import SearchIndex
+from app.services.trend_store import TrendStore
+from app.services.name_normalizer import NameNormalizer
+from app.services.lab_status import CriticalLimits, compute_statuses, load_critical_limits
+from app.services.exporter import DATASETS, FORMATS, Exporter
+from app.services.profiler import RequestProfiler
+from app.services.load_monitor import AdmissionController, LoopLagMonitor
+from app.services.metrics import metrics
+from app.services import tracing
+from app.utils import (
+    assess_image_quality,
+    encode_image_to_base64,
+    encode_image_tiles,
+    encode_document_regions,
+    validate_image,
+    get_file_extension,
+    ORJSONResponse,
+)
+from app.utils import json_utils
+from app.utils.logging_utils import configure_logging
 from app import __version__
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging: handlers only enqueue, a background thread formats and writes
+configure_logging(
+    level=settings.log_level,
+    log_format=settings.log_format,
+    sample_rates=settings.log_sample_rates,
+    max_message_length=settings.log_max_message_length
 )
 logger = logging.getLogger(__name__)
 
 
+# Client-facing reasons for rejected uploads, by quality issue
+QUALITY_MESSAGES = {
+    "blank": "The image looks like a blank page.",
+    "blurry": "The image is too blurry to read.",
+    "not_a_document": "The image doesn't look like a medical document.",
+}
+
+
 # Global service instances
 openai_service: OpenAIService = None
 document_classifier: DocumentClassifier = None
 document_parser: DocumentParser = None
+shared_store: SharedStore = None
+priority_lanes: PriorityLanes = None
+speculative_analyzer: SpeculativeAnalyzer = None
+single_flight: SingleFlight = None
+tiled_extractor: TiledExtractor = None
+search_index: SearchIndex = None
+trend_store: TrendStore = None
+name_normalizer: NameNormalizer = None
+critical_limits: CriticalLimits = None
+request_profiler: RequestProfiler = None
+loop_monitor: LoopLagMonitor = None
+admission_controller: AdmissionController = None
+
+
+def preload_dependencies() -> None:
+    """Import PyMuPDF, PIL and the OpenAI SDK so the first request doesn't pay for them"""
+    import openai  # noqa: F401
+    from app.utils import image_utils
+    
+    image_utils.preload()
+
+
+def init_model_services() -> None:
+    """Create the model-backed services on first use"""
+    global openai_service, document_classifier, document_parser, speculative_analyzer, tiled_extractor, name_normalizer
+    global critical_limits
+    
+    if document_parser is not None:
+        return
+    
+    openai_service = OpenAIService(shared_store=shared_store)
+    document_classifier = DocumentClassifier(openai_service)
+    document_parser = DocumentParser(openai_service)
+    speculative_analyzer = SpeculativeAnalyzer(
+        document_classifier,
+        document_parser,
+        TypePredictor(
+            min_samples=settings.speculation_min_samples,
+            min_probability=settings.speculation_min_probability
+        )
+    )
+    tiled_extractor = TiledExtractor(document_parser)
+    if settings.name_normalization:
+        name_normalizer = NameNormalizer.load(settings.name_dictionary_path or None)
+    if settings.critical_limits_path:
+        critical_limits = load_critical_limits(settings.critical_limits_path)
+    logger.info("Model services initialized")
 
 
 @asynccontextmanager
@@ -41,18 +129,65 @@ async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown"""
     # Startup
     logger.info("Starting Medical Documents OCR API...")
-    global openai_service, document_classifier, document_parser
+    global shared_store, priority_lanes, single_flight, search_index, trend_store, request_profiler
+    global loop_monitor, admission_controller
     
-    # Initialize services
-    openai_service = OpenAIService()
-    document_classifier = DocumentClassifier(openai_service)
-    document_parser = DocumentParser(openai_service)
+    # Initialize lightweight services (runs once per worker process, after fork)
+    shared_store = SharedStore(settings.shared_state_path)
+    priority_lanes = PriorityLanes(settings)
+    single_flight = SingleFlight(
+        shared_store=shared_store if settings.single_flight_cross_worker else None,
+        lock_ttl_seconds=settings.single_flight_lock_ttl_seconds
+    )
+    if settings.loop_lag_sample_interval_ms > 0:
+        loop_monitor = LoopLagMonitor(
+            interval=settings.loop_lag_sample_interval_ms / 1000,
+            window_seconds=settings.loop_lag_window_seconds,
+            lanes=list(priority_lanes.lanes.values())
+        )
+        loop_monitor.start()
+        admission_controller = AdmissionController(
+            loop_monitor,
+            max_lag_ms=settings.shed_max_loop_lag_ms,
+            max_queued=settings.shed_max_queued,
+            retry_after=settings.shed_retry_after_seconds
+        )
+    if settings.search_index_enabled:
+        search_index = SearchIndex(settings.search_index_path)
+    if settings.trend_store_enabled:
+        trend_store = TrendStore(settings.trend_store_path)
+    tracing.configure_tracing(
+        settings.tracing_exporter,
+        service_name=settings.tracing_service_name,
+        file_path=settings.tracing_file_path,
+        otlp_endpoint=settings.tracing_otlp_endpoint
+    )
+    if settings.profiling_token or settings.profiling_sample_rate > 0:
+        request_profiler = RequestProfiler(
+            settings.profiling_dir,
+            token=settings.profiling_token,
+            sample_rate=settings.profiling_sample_rate,
+            engine=settings.profiling_engine,
+            max_profiles=settings.profiling_max_profiles
+        )
+    
+    if settings.eager_startup:
+        preload_dependencies()
+        init_model_services()
+    else:
+        # Start serving (and answering health checks) right away; heavy
+        # imports finish in the background
+        asyncio.get_running_loop().run_in_executor(None, preload_dependencies)
     
     logger.info("Services initialized successfully")
     yield
     
     # Shutdown
     logger.info("Shutting down Medical Documents OCR API...")
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    priority_lanes.shutdown()
+    tracing.shutdown_tracing()
 
 
 # Create FastAPI app
@@ -73,19 +208,68 @@ app.add_middleware(
 )
 
 
+if settings.profiling_token or settings.profiling_sample_rate > 0:
+    # Registered only when profiling is configured, so other deployments
+    # don't pay for the middleware on every request
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        """Profile /analyze requests that carry the admin token or are sampled"""
+        if request_profiler is None or request.url.path != f"{settings.api_v1_prefix}/analyze":
+            return await call_next(request)
+        profile = request_profiler.begin(
+            request.headers.get("x-profile-token"),
+            f"analyze-{request.headers.get('x-tenant-id') or 'default'}"
+        )
+        if profile is None:
+            return await call_next(request)
+        try:
+            response = await call_next(request)
+        finally:
+            request_profiler.end(profile)
+            name = await asyncio.get_running_loop().run_in_executor(None, request_profiler.save, profile)
+        if name is not None:
+            response.headers["X-Profile"] = name
+        return response
+
+
 @app.get(
     f"{settings.api_v1_prefix}/health",
     response_model=HealthResponse,
+    response_model_exclude_none=True,
     tags=["Health"]
 )
-async def health_check():
-    """Health check endpoint"""
+async def health_check(response: Response):
+    """
+    Health check endpoint
+    
+    With the load monitor on, also reports readiness: while the worker
+    sheds load it answers 503 with status "overloaded", so load balancers
+    route traffic to other workers.
+    """
+    if admission_controller is None:
+        return HealthResponse(
+            status="healthy",
+            version=__version__
+        )
+    
+    load = admission_controller.status()
+    ready = load.pop("ready")
+    if not ready:
+        response.status_code = 503
     return HealthResponse(
-        status="healthy",
-        version=__version__
+        status="healthy" if ready else "overloaded",
+        version=__version__,
+        ready=ready,
+        load=load
     )
 
 
+@app.get(f"{settings.api_v1_prefix}/metrics", tags=["Health"])
+async def get_metrics():
+    """Counters, gauges and summaries of this worker process"""
+    return metrics.snapshot()
+
+
 @app.get(
     f"{settings.api_v1_prefix}/supported-documents",
     response_model=SupportedDocumentsResponse,
@@ -119,28 +303,398 @@ async def get_supported_documents():
     return SupportedDocumentsResponse(supported_documents=supported_docs)
 
 
+async def _process_document(
+    file_content: bytes,
+    filename: str,
+    lane: Lane,
+    tenant: str,
+    options: AnalyzeOptions
+) -> Tuple[DocumentType, float, Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """
+    Run the validate -> quality check -> encode -> classify -> parse pipeline for one upload
+    
+    Image work runs on the lane's thread pool and model calls use the lane's
+    priority, so bulk traffic can't hold up interactive requests.
+    
+    Args:
+        file_content: Uploaded file bytes
+        filename: Original filename
+        lane: Priority lane the request was admitted into
+        tenant: Tenant identifier
+        options: Extraction options
+        
+    Returns:
+        Tuple of (document_type, confidence, parsed_data, quality scores, per-document results)
+    """
+    init_model_services()
+    
+    # Validate image
+    with tracing.span("validate"):
+        is_valid, error_msg = await lane.run_in_executor(
+            validate_image,
+            file_content,
+            settings.max_file_size_bytes,
+            settings.allowed_extensions_list
+        )
+    
+    if not is_valid:
+        logger.error("Image validation failed for %s: %s", filename, error_msg)
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "success": False,
+                "error": "Invalid file",
+                "detail": error_msg
+            }
+        )
+    
+    if options.split:
+        # Several documents photographed together are analyzed one by one, concurrently
+        try:
+            with tracing.span("split_documents") as split_span:
+                regions = await lane.run_in_executor(encode_document_regions, file_content, settings.auto_orient)
+                split_span.set_attribute("split.documents", len(regions))
+        except ValueError as e:
+            logger.warning("Document splitting failed for %s, treating it as one document: %s", filename, e)
+            regions = []
+        if regions:
+            return await _process_regions(regions, filename, lane, tenant, options)
+    
+    quality = await _check_quality(file_content, filename, lane)
+    
+    # Encode image to base64
+    try:
+        base64_image = await lane.run_in_executor(
+            encode_image_to_base64, file_content, filename, settings.auto_orient
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "success": False,
+                "error": "Failed to process image",
+                "detail": str(e)
+            }
+        )
+    
+    result = await _run_pipeline(file_content, base64_image, filename, lane, tenant, options)
+    return (*result, quality, None)
+
+
+async def _process_regions(
+    regions: List[Tuple[Tuple[int, int, int, int], bytes, str]],
+    filename: str,
+    lane: Lane,
+    tenant: str,
+    options: AnalyzeOptions
+) -> Tuple[DocumentType, float, Optional[Dict[str, Any]], None, List[Dict[str, Any]]]:
+    """
+    Classify and parse every document found in one photo concurrently
+    
+    The top-level result describes the first document in reading order.
+    The quality gate is skipped: it scores whole pages, and a photo with
+    several slips on a table would not look like one.
+    
+    Returns:
+        Tuple of (document_type, confidence, parsed_data, None, per-document results)
+    """
+    metrics.incr("split.images")
+    metrics.incr("split.documents", len(regions))
+    logger.info("Found %s documents in %s", len(regions), filename)
+    
+    region_options = options.model_copy(update={"split": False, "tiled": False})
+    results = await asyncio.gather(*(
+        _run_pipeline(content, base64_image, f"{filename}#{index + 1}", lane, tenant, region_options)
+        for index, (_, content, base64_image) in enumerate(regions)
+    ))
+    
+    documents = [
+        {
+            "bbox": list(box),
+            "document_type": document_type,
+            "confidence": float(confidence),
+            "data": parsed_data,
+        }
+        for (box, _, _), (document_type, confidence, parsed_data) in zip(regions, results)
+    ]
+    first = documents[0]
+    return first["document_type"], first["confidence"], first["data"], None, documents
+
+
+@tracing.traced("pipeline")
+async def _run_pipeline(
+    file_content: bytes,
+    base64_image: str,
+    filename: str,
+    lane: Lane,
+    tenant: str,
+    options: AnalyzeOptions
+) -> Tuple[DocumentType, float, Optional[Dict[str, Any]]]:
+    """Classify and parse an encoded image, sharing the work with identical concurrent uploads"""
+    tracing.set_attributes({"file.name": filename, "pipeline.fields": ",".join(options.fields or []) or None})
+    if single_flight is not None and settings.single_flight_enabled:
+        # Identical concurrent uploads (double clicks, client retries) share one pipeline
+        key = hashlib.sha256(base64_image.encode("ascii") + options.cache_key().encode("utf-8")).hexdigest()
+        return await single_flight.do(
+            key,
+            lambda: _classify_and_parse(file_content, base64_image, filename, lane, tenant, options),
+            encode=_encode_pipeline_result,
+            decode=_decode_pipeline_result
+        )
+    
+    return await _classify_and_parse(file_content, base64_image, filename, lane, tenant, options)
+
+
+@tracing.traced("quality_check")
+async def _check_quality(file_content: bytes, filename: str, lane: Lane) -> Optional[Dict[str, Any]]:
+    """
+    Score the upload and stop blank, blurry or non-document images before any model call
+    
+    Returns:
+        Quality scores, or None if the gate is off or scoring failed
+        
+    Raises:
+        HTTPException: If the image fails the gate in "reject" mode
+    """
+    if settings.quality_gate == "off":
+        return None
+    
+    try:
+        quality = await lane.run_in_executor(
+            assess_image_quality,
+            file_content,
+            settings.quality_min_ink_coverage,
+            settings.quality_min_sharpness,
+            settings.quality_min_text_likelihood
+        )
+    except Exception as e:
+        logger.warning("Quality check failed for %s, skipping it: %s", filename, e)
+        return None
+    
+    tracing.set_attributes({"quality.acceptable": quality["acceptable"], "quality.issues": ",".join(quality["issues"])})
+    if quality["acceptable"]:
+        return quality
+    
+    issues = ", ".join(quality["issues"])
+    if settings.quality_gate != "reject":
+        metrics.incr("quality.flagged")
+        logger.warning("Low quality upload %s (%s), processing anyway", filename, issues)
+        return quality
+    
+    metrics.incr("quality.rejected")
+    logger.warning("Rejecting low quality upload %s: %s", filename, issues)
+    raise HTTPException(
+        status_code=422,
+        detail={
+            "success": False,
+            "error": "Image quality too low",
+            "detail": f"{QUALITY_MESSAGES[quality['issues'][0]]} Please upload a sharp photo or scan of the document.",
+            "quality": quality
+        }
+    )
+
+
+def _parse_options(
+    fields: Optional[str],
+    tiled: Optional[bool] = None,
+    split: Optional[bool] = None
+) -> AnalyzeOptions:
+    """
+    Build extraction options from query parameters
+    
+    Raises:
+        HTTPException: If an unknown field is requested
+    """
+    field_list = None
+    if fields:
+        field_list = [name.strip() for name in fields.split(",") if name.strip()]
+        known = DocumentParser.all_field_names()
+        unknown = [name for name in field_list if name not in known]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "success": False,
+                    "error": "Invalid fields",
+                    "detail": f"Unknown fields: {', '.join(unknown)}. Supported fields: {', '.join(known)}"
+                }
+            )
+    if tiled is None:
+        tiled = settings.tiled_extraction
+    if split is None:
+        split = settings.split_documents
+    return AnalyzeOptions(fields=field_list or None, tiled=tiled, split=split)
+
+
+def _encode_pipeline_result(result: Tuple[DocumentType, float, Optional[Dict[str, Any]]]) -> bytes:
+    """Encode a pipeline result for sharing between workers"""
+    document_type, confidence, parsed_data = result
+    return json_utils.dumps({
+        "document_type": document_type.value,
+        "confidence": confidence,
+        "data": parsed_data
+    })
+
+
+def _decode_pipeline_result(payload: bytes) -> Tuple[DocumentType, float, Optional[Dict[str, Any]]]:
+    """Decode a pipeline result published by another worker"""
+    content = json_utils.loads(payload)
+    return DocumentType(content["document_type"]), content["confidence"], content["data"]
+
+
+async def _classify_and_parse(
+    file_content: bytes,
+    base64_image: str,
+    filename: str,
+    lane: Lane,
+    tenant: str,
+    options: AnalyzeOptions
+) -> Tuple[DocumentType, float, Optional[Dict[str, Any]]]:
+    """
+    Classify a prepared image and extract its data
+    
+    Args:
+        file_content: Uploaded file bytes (source of high-resolution tiles)
+        base64_image: Base64 encoded, normalized image
+        filename: Original filename
+        lane: Priority lane of the request
+        tenant: Tenant identifier
+        options: Extraction options
+        
+    Returns:
+        Tuple of (document_type, confidence, parsed_data)
+    """
+    tiles = None
+    if options.tiled:
+        # Cut the high-resolution strips while the classifier runs
+        tiles = asyncio.ensure_future(lane.run_in_executor(
+            encode_image_tiles, file_content, 2048, settings.tile_overlap, settings.tile_max_count, settings.auto_orient
+        ))
+    elif settings.speculative_extraction:
+        # Extraction for the likely type starts while classification runs
+        document_type, confidence, parsed_data = await speculative_analyzer.analyze(
+            base64_image, filename=filename, tenant=tenant, priority=lane.name, fields=options.fields
+        )
+        return document_type, confidence, _add_computed_fields(document_type, parsed_data)
+    
+    # Classify document
+    logger.info("Classifying document: %s", filename)
+    try:
+        document_type, confidence = await document_classifier.classify(
+            base64_image, tenant=tenant, priority=lane.name
+        )
+    except BaseException:
+        if tiles is not None:
+            tiles.cancel()
+        raise
+    logger.info("Document classified as %s with confidence %s", document_type.value, confidence)
+    
+    tile_images = None
+    if tiles is not None and TiledExtractor.supports(document_type, options.fields):
+        try:
+            tile_images = await tiles
+        except ValueError as e:
+            logger.warning("Tiling failed, extracting from the whole page: %s", e)
+    elif tiles is not None:
+        tiles.cancel()
+    
+    # Parse document if not unknown
+    parsed_data = None
+    if tile_images is not None:
+        logger.info("Parsing %s document from %s high-resolution strips", document_type.value, len(tile_images))
+        parsed_data = await tiled_extractor.parse(
+            base64_image, tile_images, document_type, tenant=tenant, priority=lane.name, fields=options.fields
+        )
+    elif document_type != DocumentType.UNKNOWN:
+        logger.info("Parsing %s document", document_type.value)
+        parsed_data = await document_parser.parse(
+            base64_image, document_type, tenant=tenant, priority=lane.name, fields=options.fields
+        )
+    
+    return document_type, confidence, _add_computed_fields(document_type, parsed_data)
+
+
+@tracing.traced("computed_fields")
+def _add_computed_fields(document_type: DocumentType, parsed_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Add the fields computed locally rather than extracted: lab statuses and canonical names"""
+    if not parsed_data:
+        return parsed_data
+    # Codes first: critical limits are per test code
+    if name_normalizer is not None:
+        name_normalizer.annotate(document_type, parsed_data)
+    if document_type == DocumentType.LAB_REPORT:
+        compute_statuses(parsed_data.get("test_results"), critical_limits)
+    return parsed_data
+
+
 @app.post(
     f"{settings.api_v1_prefix}/analyze",
     response_model=AnalyzeResponse,
+    response_class=ORJSONResponse,
     tags=["Analysis"],
     responses={
         400: {"model": ErrorResponse},
-        500: {"model": ErrorResponse}
+        422: {"model": ErrorResponse},
+        429: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+        504: {"model": ErrorResponse}
     }
 )
-async def analyze_document(file: UploadFile = File(...)):
+@tracing.traced("analyze")
+async def analyze_document(
+    file: UploadFile = File(...),
+    x_tenant_id: Optional[str] = Header(None, description="Tenant or API key used for fair model API scheduling"),
+    x_priority: Optional[str] = Header(None, description="Traffic lane: interactive (default) or batch"),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated top-level fields to extract, e.g. test_results or medications (default: all)"
+    ),
+    tiled: Optional[bool] = Query(
+        None,
+        description="Read lab result tables from overlapping high-resolution strips of the page (default: TILED_EXTRACTION)"
+    ),
+    split: Optional[bool] = Query(
+        None,
+        description="Find several documents in one photo and analyze each of them (default: SPLIT_DOCUMENTS)"
+    )
+):
     """
     Analyze a medical document image and extract structured data
     
     Args:
         file: Image file to analyze (JPG, PNG, or PDF)
+        x_tenant_id: Optional tenant identifier (X-Tenant-ID header)
+        x_priority: Optional traffic lane (X-Priority header)
+        fields: Optional comma-separated subset of fields to extract
+        tiled: Optional override of tiled high-resolution extraction
+        split: Optional override of multi-document splitting
         
     Returns:
         Analysis results with document type and extracted data
     """
     start_time = time.time()
+    tenant = x_tenant_id or "default"
+    tracing.set_attributes({"file.name": file.filename, "tenant": tenant})
     
     try:
+        # Shed new work while this worker is already behind
+        if admission_controller is not None:
+            reason = admission_controller.admit()
+            if reason is not None:
+                logger.warning("Shedding %s: %s", file.filename, reason)
+                raise HTTPException(
+                    status_code=503,
+                    detail={
+                        "success": False,
+                        "error": "Server overloaded",
+                        "detail": reason
+                    },
+                    headers={"Retry-After": str(admission_controller.retry_after_seconds())}
+                )
+        
+        options = _parse_options(fields, tiled, split)
+        
         # Validate file extension
         file_ext = get_file_extension(file.filename)
         if file_ext not in settings.allowed_extensions_list:
@@ -154,68 +708,91 @@ async def analyze_document(file: UploadFile = File(...)):
             )
         
         # Read file content
-        file_content = await file.read()
+        with tracing.span("read_upload") as read_span:
+            file_content = await file.read()
+            read_span.set_attribute("file.bytes", len(file_content))
         
-        # Validate image
-        is_valid, error_msg = validate_image(
-            file_content,
-            settings.max_file_size_bytes,
-            settings.allowed_extensions_list
-        )
+        # Serve repeated uploads from the cross-worker result cache (SQLite, so off the event loop)
+        cache_key = None
+        if shared_store is not None and settings.result_cache_enabled:
+            cache_key = "analyze:" + hashlib.sha256(file_content + options.cache_key().encode("utf-8")).hexdigest()
+            cached = await asyncio.get_running_loop().run_in_executor(None, shared_store.cache_get, cache_key)
+            tracing.set_attributes({"cache.hit": cached is not None})
+            if cached is not None:
+                logger.info("Result cache hit for %s", file.filename)
+                content = json_utils.loads(cached)
+                content["processing_time_ms"] = int((time.time() - start_time) * 1000)
+                return ORJSONResponse(content=content)
         
-        if not is_valid:
-            logger.error(f"Image validation failed for {file.filename}: {error_msg}")
+        # Admit into the request's priority lane and enforce its deadline
+        priority = priority_lanes.resolve(x_priority, tenant)
+        lane = priority_lanes.get(priority)
+        tracing.set_attributes({"lane": lane.name})
+        try:
+            async with lane.slot(timeout=lane.remaining(start_time)):
+                document_type, confidence, parsed_data, quality, documents = await asyncio.wait_for(
+                    _process_document(file_content, file.filename, lane, tenant, options),
+                    timeout=lane.remaining(start_time)
+                )
+        except LaneFullError as e:
+            logger.warning("Rejecting %s: %s", file.filename, e)
             raise HTTPException(
-                status_code=400,
+                status_code=429,
                 detail={
                     "success": False,
-                    "error": "Invalid file",
-                    "detail": error_msg
-                }
+                    "error": "Too many requests",
+                    "detail": str(e)
+                },
+                headers={"Retry-After": str(e.retry_after)}
             )
-        
-        # Encode image to base64
-        try:
-            base64_image = encode_image_to_base64(file_content, file.filename)
-        except Exception as e:
+        except asyncio.TimeoutError:
+            logger.error("Deadline of %ss exceeded for %s in %s lane", lane.deadline_seconds, file.filename, lane.name)
             raise HTTPException(
-                status_code=400,
+                status_code=504,
                 detail={
                     "success": False,
-                    "error": "Failed to process image",
-                    "detail": str(e)
+                    "error": "Processing deadline exceeded",
+                    "detail": f"Document was not processed within {lane.deadline_seconds:.0f} seconds"
                 }
             )
         
-        # Classify document
-        logger.info(f"Classifying document: {file.filename}")
-        document_type, confidence = await document_classifier.classify(base64_image)
-        logger.info(f"Document classified as {document_type.value} with confidence {confidence}")
-        
-        # Parse document if not unknown
-        parsed_data = None
-        if document_type != DocumentType.UNKNOWN:
-            logger.info(f"Parsing {document_type.value} document")
-            parsed_data = await document_parser.parse(base64_image, document_type)
-        
         # Calculate processing time
         processing_time_ms = int((time.time() - start_time) * 1000)
+        tracing.set_attributes({
+            "document.type": document_type,
+            "document.confidence": float(confidence),
+            "documents": len(documents) if documents else None,
+        })
         
-        # Build response
-        return AnalyzeResponse(
+        # Build response. parsed_data was already validated against the
+        # document schema, so skip re-validating it and serialize straight to bytes
+        response = AnalyzeResponse.model_construct(
             success=True,
             document_type=document_type,
-            confidence=confidence,
+            confidence=float(confidence),
             data=parsed_data,
             raw_text=None,  # Could add OCR text extraction if needed
             processing_time_ms=processing_time_ms,
-            error=None
+            error=None,
+            quality=quality,
+            documents=documents
         )
+        body = json_utils.dumps(dict(response))
+        
+        if cache_key is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, shared_store.cache_set, cache_key, body, settings.result_cache_ttl_seconds
+            )
+        
+        _store_result(file_content, file.filename, document_type, parsed_data, documents)
+        
+        return ORJSONResponse(content=body)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error analyzing document: {str(e)}", exc_info=True)
+        logger.error("Error analyzing document: %s", e, exc_info=True)
+        tracing.set_attributes({"error.type": type(e).__name__})
         processing_time_ms = int((time.time() - start_time) * 1000)
         
         return AnalyzeResponse(
@@ -229,6 +806,276 @@ async def analyze_document(file: UploadFile = File(...)):
         )
 
 
+def _store_result(
+    file_content: bytes,
+    filename: str,
+    document_type: DocumentType,
+    parsed_data: Optional[Dict[str, Any]],
+    documents: Optional[List[Dict[str, Any]]]
+) -> None:
+    """Add an analyzed upload to the search index and lab trends in the background"""
+    if search_index is None and trend_store is None:
+        return
+    
+    # The content hash identifies a document, so re-analyzing it replaces its entry
+    document_id = hashlib.sha256(file_content).hexdigest()
+    if documents:
+        entries = [
+            (f"{document_id}-{index + 1}", document["document_type"], document["data"])
+            for index, document in enumerate(documents)
+        ]
+    else:
+        entries = [(document_id, document_type, parsed_data)]
+    entries = [entry for entry in entries if entry[2]]
+    if not entries:
+        return
+    
+    def store() -> None:
+        with tracing.span("store", {"store.documents": len(entries)}):
+            for entry_id, entry_type, data in entries:
+                if search_index is not None:
+                    search_index.add(entry_id, DocumentType(entry_type).value, data, filename=filename)
+                if trend_store is not None and entry_type == DocumentType.LAB_REPORT:
+                    trend_store.add_report(data)
+    
+    def log_failure(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            metrics.incr("storage.failed")
+            logger.error("Failed to store results of %s: %s", filename, future.exception())
+    
+    # Run in the request's context, so the store span belongs to its trace
+    context = contextvars.copy_context()
+    asyncio.get_running_loop().run_in_executor(None, context.run, store).add_done_callback(log_failure)
+
+
+def _require_data_token(token: Optional[str]) -> None:
+    """Check the X-API-Key of an endpoint that returns stored patient data"""
+    if not settings.data_api_token:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "success": False,
+                "error": "Patient data endpoints are disabled",
+                "detail": "Set DATA_API_TOKEN to enable them"
+            }
+        )
+    if token is None or not hmac.compare_digest(token, settings.data_api_token):
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "success": False,
+                "error": "Forbidden",
+                "detail": "A valid X-API-Key header is required"
+            }
+        )
+
+
+@app.get(
+    f"{settings.api_v1_prefix}/search",
+    response_model=SearchResponse,
+    response_class=ORJSONResponse,
+    tags=["Search"],
+    responses={
+        403: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}
+    }
+)
+async def search_documents(
+    q: str = Query(..., min_length=1, description="Words to find, in any inflected form, e.g. ферритин"),
+    patient: Optional[str] = Query(None, description="Only documents whose patient name contains these words"),
+    document_type: Optional[DocumentType] = Query(None, description="Only documents of this type"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results"),
+    offset: int = Query(0, ge=0, le=10000, description="Number of results to skip"),
+    x_api_key: Optional[str] = Header(None, description="Patient data token (DATA_API_TOKEN)")
+):
+    """
+    Search analyzed documents by summary, diagnosis, findings and test names
+    
+    Returns:
+        Matching documents, best matches first
+    """
+    _require_data_token(x_api_key)
+    if search_index is None:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "success": False,
+                "error": "Search is disabled",
+                "detail": "Set SEARCH_INDEX_ENABLED=true to index analyzed documents"
+            }
+        )
+    
+    start_time = time.time()
+    results = await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: search_index.search(
+            q,
+            patient=patient,
+            document_type=document_type.value if document_type else None,
+            limit=limit,
+            offset=offset
+        )
+    )
+    metrics.observe("search.latency_ms", (time.time() - start_time) * 1000)
+    
+    return ORJSONResponse(content={
+        "query": q,
+        "results": results,
+        "took_ms": int((time.time() - start_time) * 1000),
+    })
+
+
+@app.get(
+    f"{settings.api_v1_prefix}/patients/{{patient_id}}/trends",
+    response_model=TrendsResponse,
+    response_class=ORJSONResponse,
+    tags=["Patients"],
+    responses={
+        400: {"model": ErrorResponse},
+        403: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}
+    }
+)
+async def patient_trends(
+    patient_id: str,
+    test: Optional[str] = Query(None, description="Only this test, e.g. Гемоглобин"),
+    since: Optional[str] = Query(None, description="First date of returned points (YYYY-MM-DD)"),
+    until: Optional[str] = Query(None, description="Last date of returned points (YYYY-MM-DD)"),
+    points: bool = Query(True, description="Include the values, not only min/max/last"),
+    x_api_key: Optional[str] = Header(None, description="Patient data token (DATA_API_TOKEN)")
+):
+    """
+    Get a patient's lab values over time
+    
+    Args:
+        patient_id: Patient ID from the lab reports
+        
+    Returns:
+        One series per test and unit with min/max/last aggregates
+    """
+    _require_data_token(x_api_key)
+    if trend_store is None:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "success": False,
+                "error": "Lab trends are disabled",
+                "detail": "Set TREND_STORE_ENABLED=true to record lab values of analyzed reports"
+            }
+        )
+    
+    # Series of recognized tests are keyed by code, so "Hb" finds "Гемоглобин"
+    test_code = (name_normalizer.lookup("lab_tests", test) if test and name_normalizer is not None else None) or test
+    try:
+        series = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: trend_store.trends(patient_id, test=test_code, since=since, until=until, include_points=points)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "success": False,
+                "error": "Invalid date",
+                "detail": str(e)
+            }
+        )
+    if not series:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "success": False,
+                "error": "No lab values found",
+                "detail": f"No lab values recorded for patient {patient_id}" + (f" and test {test}" if test else "")
+            }
+        )
+    
+    return ORJSONResponse(content={"patient_id": patient_id, "series": series})
+
+
+@app.get(
+    f"{settings.api_v1_prefix}/export/{{dataset}}",
+    tags=["Export"],
+    responses={
+        400: {"model": ErrorResponse},
+        403: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}
+    }
+)
+async def export_dataset(
+    dataset: str,
+    format: str = Query("ndjson", description="ndjson, csv or parquet"),
+    since: Optional[datetime] = Query(None, description="Only documents processed at or after this time (ISO 8601)"),
+    x_api_key: Optional[str] = Header(None, description="Patient data token (DATA_API_TOKEN)")
+):
+    """
+    Stream all stored extractions of a dataset
+    
+    Args:
+        dataset: documents, lab_results or prescriptions
+        
+    Returns:
+        The whole dataset in the requested format, streamed as it is read
+    """
+    _require_data_token(x_api_key)
+    if not settings.database_url:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "success": False,
+                "error": "Export is disabled",
+                "detail": "Set DATABASE_URL to the database created from database_schema.sql"
+            }
+        )
+    if dataset not in DATASETS:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "success": False,
+                "error": "Unknown dataset",
+                "detail": f"Available datasets: {', '.join(DATASETS)}"
+            }
+        )
+    try:
+        Exporter.check_format(format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "error": "Unknown format", "detail": f"{str(e)}; use {', '.join(FORMATS)}"}
+        )
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"success": False, "error": "Export format unavailable", "detail": str(e)}
+        )
+    
+    exporter = Exporter(settings.database_url, batch_size=settings.export_batch_size)
+    stream = exporter.stream(dataset, format, since=since)
+    try:
+        # Connect and read the first batch before answering, so a database
+        # error is a 503 rather than a truncated 200
+        first = await asyncio.get_running_loop().run_in_executor(None, next, stream, b"")
+    except Exception as e:
+        logger.error("Export of %s failed: %s", dataset, e, exc_info=True)
+        raise HTTPException(
+            status_code=503,
+            detail={"success": False, "error": "Export failed", "detail": str(e)}
+        )
+    metrics.incr(f"export.{format}")
+    
+    def body():
+        yield first
+        yield from stream
+    
+    return StreamingResponse(
+        body(),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'}
+    )
+
+
 @app.get("/test", response_class=HTMLResponse, tags=["Testing"])
 async def test_page():
     """
@@ -266,6 +1113,58 @@ async def debug_env():
     }
 
 
+def _require_profiler(token: Optional[str]) -> RequestProfiler:
+    """Profiler, if profiling is on and the admin token is right"""
+    if request_profiler is None or not request_profiler.token:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "success": False,
+                "error": "Profiling not enabled",
+                "detail": "Set PROFILING_TOKEN to enable on-demand profiling"
+            }
+        )
+    if not request_profiler.authorized(token):
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "success": False,
+                "error": "Forbidden",
+                "detail": "A valid X-Profile-Token header is required"
+            }
+        )
+    return request_profiler
+
+
+@app.get("/debug/profiles", tags=["Debug"])
+async def list_profiles(
+    x_profile_token: Optional[str] = Header(None, description="Admin token (PROFILING_TOKEN)")
+):
+    """Profiles of /analyze requests stored by this worker's host, newest first"""
+    profiler = _require_profiler(x_profile_token)
+    return {"engine": profiler.engine, "profiles": profiler.list_profiles()}
+
+
+@app.get("/debug/profiles/{name}", tags=["Debug"])
+async def get_profile(
+    name: str,
+    x_profile_token: Optional[str] = Header(None, description="Admin token (PROFILING_TOKEN)")
+):
+    """Download a profile: pstats for cProfile (python -m pstats), HTML flame graph for pyinstrument"""
+    path = _require_profiler(x_profile_token).path_of(name)
+    if path is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "success": False,
+                "error": "Profile not found",
+                "detail": f"No profile named {name}"
+            }
+        )
+    media_type = "text/html" if path.suffix == ".html" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=path.name)
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint with API information"""
@@ -276,6 +1175,7 @@ async def root():
         "endpoints": {
             "health": f"{settings.api_v1_prefix}/health",
             "supported_documents": f"{settings.api_v1_prefix}/supported-documents",
+            "metrics": f"{settings.api_v1_prefix}/metrics",
             "analyze": f"{settings.api_v1_prefix}/analyze",
             "test": "/test",
             "debug": "/debug/env"
@@ -1,8 +1,15 @@
 """API models"""
 
-from .requests import AnalyzeRequest
+from .requests import AnalyzeRequest, AnalyzeOptions
 from .responses import (
     AnalyzeResponse,
+    DocumentRegionResult,
+    ImageQuality,
+    SearchHit,
+    SearchResponse,
+    TrendPoint,
+    TrendSeries,
+    TrendsResponse,
     HealthResponse,
     SupportedDocumentsResponse,
     DocumentTypeInfo,
@@ -11,7 +18,15 @@ from .responses import (
 
 __all__ = [
     "AnalyzeRequest",
+    "AnalyzeOptions",
     "AnalyzeResponse",
+    "DocumentRegionResult",
+    "ImageQuality",
+    "SearchHit",
+    "SearchResponse",
+    "TrendPoint",
+    "TrendSeries",
+    "TrendsResponse",
     "HealthResponse",
     "SupportedDocumentsResponse",
     "DocumentTypeInfo",
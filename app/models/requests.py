@@ -1,7 +1,7 @@
 """API request models"""
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 
 
 class AnalyzeRequest(BaseModel):
@@ -16,3 +16,15 @@ class AnalyzeRequest(BaseModel):
             }
         }
 
+
+
+class AnalyzeOptions(BaseModel):
+    """Per-request extraction options (from /analyze query parameters)"""
+    
+    fields: Optional[List[str]] = Field(None, description="Top-level fields to extract (None = all fields)")
+    tiled: bool = Field(False, description="Extract lab result tables from high-resolution page strips")
+    split: bool = Field(False, description="Analyze each document of a photo with several documents")
+    
+    def cache_key(self) -> str:
+        """Stable string identifying options that change the result"""
+        return self.model_dump_json(exclude_defaults=True)
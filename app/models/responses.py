@@ -5,6 +5,25 @@ from typing import Optional, Any, List, Dict
 from app.schemas.base import DocumentType
 
 
+class ImageQuality(BaseModel):
+    """Local image quality scores computed before any model call"""
+    
+    ink_coverage: float = Field(..., description="Share of pixels clearly darker than the paper")
+    sharpness: float = Field(..., description="Variance of the Laplacian (low = blurry)")
+    text_likelihood: float = Field(..., description="Estimate (0-1) that the image is a text document")
+    issues: List[str] = Field(default_factory=list, description="Problems found: blank, blurry, not_a_document")
+    acceptable: bool = Field(..., description="Whether no problems were found")
+
+
+class DocumentRegionResult(BaseModel):
+    """Result for one of several documents found in a photo"""
+    
+    bbox: List[int] = Field(..., description="Document position in the upload: left, top, right, bottom (pixels)")
+    document_type: DocumentType = Field(..., description="Identified document type")
+    confidence: float = Field(..., description="Confidence score for document type (0-1)")
+    data: Optional[Dict[str, Any]] = Field(None, description="Parsed document data according to document-specific schema")
+
+
 class AnalyzeResponse(BaseModel):
     """Response model for document analysis"""
     
@@ -15,6 +34,11 @@ class AnalyzeResponse(BaseModel):
     raw_text: Optional[str] = Field(None, description="Raw extracted text from the document")
     processing_time_ms: int = Field(..., description="Processing time in milliseconds")
     error: Optional[str] = Field(None, description="Error message if analysis failed")
+    quality: Optional[ImageQuality] = Field(None, description="Image quality scores (when the quality gate is enabled)")
+    documents: Optional[List[DocumentRegionResult]] = Field(
+        None,
+        description="Every document found in the photo, in reading order (when splitting found several)"
+    )
     
     class Config:
         json_schema_extra = {
@@ -38,7 +62,14 @@ class AnalyzeResponse(BaseModel):
                 },
                 "raw_text": "Original extracted text...",
                 "processing_time_ms": 1234,
-                "error": None
+                "error": None,
+                "quality": {
+                    "ink_coverage": 0.052,
+                    "sharpness": 1843.6,
+                    "text_likelihood": 0.94,
+                    "issues": [],
+                    "acceptable": True
+                }
             }
         }
 
@@ -46,14 +77,18 @@ class AnalyzeResponse(BaseModel):
 class HealthResponse(BaseModel):
     """Health check response"""
     
-    status: str = Field(..., description="Service status")
+    status: str = Field(..., description="Service status: healthy, or overloaded while the worker sheds load")
     version: str = Field(..., description="API version")
+    ready: Optional[bool] = Field(None, description="Whether the worker takes new requests (with the load monitor on)")
+    load: Optional[Dict[str, Any]] = Field(None, description="Event-loop lag, in-flight and queued requests")
     
     class Config:
         json_schema_extra = {
             "example": {
                 "status": "healthy",
-                "version": "1.0.0"
+                "version": "1.0.0",
+                "ready": True,
+                "load": {"reason": None, "loop_lag_ms": 1.2, "in_flight": 3, "queued": 0}
             }
         }
 
@@ -106,3 +141,50 @@ class ErrorResponse(BaseModel):
             }
         }
 
+
+class SearchHit(BaseModel):
+    """One document found by /search"""
+    
+    document_id: str = Field(..., description="SHA-256 of the uploaded file (with -N suffix for split photos)")
+    document_type: DocumentType = Field(..., description="Document type")
+    patient_name: Optional[str] = Field(None, description="Patient name")
+    document_date: Optional[str] = Field(None, description="Report, study, prescription or visit date")
+    filename: Optional[str] = Field(None, description="Original filename")
+    indexed_at: float = Field(..., description="Unix time the document was indexed")
+    score: float = Field(..., description="Relevance (bm25, higher is better)")
+    snippet: Optional[str] = Field(None, description="Text around the first matching word")
+
+
+class SearchResponse(BaseModel):
+    """Response model for document search"""
+    
+    query: str = Field(..., description="Search query")
+    results: List[SearchHit] = Field(default_factory=list, description="Matching documents, best first")
+    took_ms: int = Field(..., description="Search time in milliseconds")
+
+
+class TrendPoint(BaseModel):
+    """One lab value"""
+    
+    date: str = Field(..., description="Collection or report date (YYYY-MM-DD)")
+    value: float = Field(..., description="Numeric result")
+
+
+class TrendSeries(BaseModel):
+    """Values of one test in one unit over time"""
+    
+    test: str = Field(..., description="Normalized test name")
+    test_name: str = Field(..., description="Test name as last extracted")
+    unit: Optional[str] = Field(None, description="Unit of measurement")
+    count: int = Field(..., description="Number of values")
+    min: float = Field(..., description="Lowest value")
+    max: float = Field(..., description="Highest value")
+    last: TrendPoint = Field(..., description="Most recent value")
+    points: Optional[List[TrendPoint]] = Field(None, description="Values in date order")
+
+
+class TrendsResponse(BaseModel):
+    """Response model for patient lab trends"""
+    
+    patient_id: str = Field(..., description="Patient ID or name")
+    series: List[TrendSeries] = Field(default_factory=list, description="One series per test and unit")
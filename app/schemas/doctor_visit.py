@@ -19,6 +19,10 @@ class VisitMedication(BaseModel):
     dosage: str = Field(..., description="Dosage amount")
     frequency: str = Field(..., description="How often to take")
     duration: str = Field(..., description="How long to take")
+    code: Optional[str] = Field(
+        None, description="Canonical medication code (e.g. ibuprofen), set after extraction",
+        json_schema_extra={"computed": True}
+    )
 
 
 class DoctorVisitSchema(BaseModel):
@@ -19,7 +19,13 @@ class TestResult(BaseModel):
     result_value: str = Field(..., description="Test result value")
     unit: Optional[str] = Field(None, description="Unit of measurement")
     reference_range: Optional[str] = Field(None, description="Normal reference range")
-    status: Optional[str] = Field(None, description="Status: normal, abnormal, or critical")
+    status: Optional[str] = Field(
+        None, description="Status: normal or abnormal (computed from reference_range), critical beyond configured critical limits",
+        json_schema_extra={"computed": True}
+    )
+    test_code: Optional[str] = Field(
+        None, description="Canonical test code (e.g. HGB), set after extraction", json_schema_extra={"computed": True}
+    )
 
 
 class LabReportSchema(BaseModel):
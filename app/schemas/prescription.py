@@ -12,6 +12,10 @@ class Medication(BaseModel):
     frequency: str = Field(..., description="How often to take (e.g., '3 times daily', 'twice a day')")
     duration: str = Field(..., description="How long to take (e.g., '7 days', '2 weeks')")
     instructions: Optional[str] = Field(None, description="Additional instructions (e.g., 'after meals')")
+    code: Optional[str] = Field(
+        None, description="Canonical medication code (e.g. ibuprofen), set after extraction",
+        json_schema_extra={"computed": True}
+    )
 
 
 class PrescriptionSchema(BaseModel):
@@ -3,10 +3,15 @@
 from .openai_service import OpenAIService
 from .document_classifier import DocumentClassifier
 from .document_parser import DocumentParser
+from .shared_store import SharedStore
+from .metrics import Metrics, metrics
 
 __all__ = [
     "OpenAIService",
     "DocumentClassifier",
     "DocumentParser",
+    "SharedStore",
+    "Metrics",
+    "metrics",
 ]
 
@@ -0,0 +1,169 @@
+"""Adaptive (AIMD) concurrency limit for upstream model calls"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Permit:
+    """One admitted call; report how it went before leaving the limiter"""
+
+    __slots__ = ("limiter", "started")
+
+    def __init__(self, limiter: "AdaptiveLimiter"):
+        self.limiter = limiter
+        self.started = time.monotonic()
+
+    def sent(self) -> None:
+        """Mark the moment the call goes out (after any other waiting)"""
+        self.started = time.monotonic()
+
+    def succeeded(self, latency: float) -> None:
+        """The call completed; latency in seconds, normalized for its size by the caller"""
+        self.limiter._on_success(self, latency)
+
+    def overloaded(self) -> None:
+        """The call was rejected for overload (429) or timed out"""
+        self.limiter._on_overload(self, "rejected")
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts like TCP congestion control (AIMD)
+
+    Calls wait for one of limit slots. Every successful call at healthy
+    latency raises the limit by increase/limit, about +increase per round
+    trip of a full window, but only while the window is actually used. A
+    429 or a latency above latency_tolerance times the baseline cuts the
+    limit multiplicatively. A cut only counts once per round trip: calls
+    sent before the last cut carry no news about the new limit.
+
+    The baseline is the lowest latency seen, allowed to drift up slowly so
+    the limiter follows a model that got slower for good.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        backoff_ratio: float = 0.5,
+        latency_backoff_ratio: float = 0.8,
+        latency_tolerance: float = 1.5,
+        baseline_drift: float = 0.01
+    ):
+        """
+        Initialize limiter
+
+        Args:
+            name: Metric suffix, e.g. "interactive"
+            initial_limit: Starting limit
+            min_limit: Lowest limit
+            max_limit: Highest limit
+            increase: Slots added per window of healthy calls
+            backoff_ratio: Limit multiplier on a 429
+            latency_backoff_ratio: Limit multiplier on a latency blowup
+            latency_tolerance: Latency over baseline counted as a blowup
+            baseline_drift: Share the baseline may rise per call
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.baseline_drift = baseline_drift
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._publish()
+
+    @property
+    def adaptive(self) -> bool:
+        """Whether the limit can change at all"""
+        return self.min_limit < self.max_limit
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Hold one slot for a call; yields its Permit"""
+        await self._acquire()
+        try:
+            yield Permit(self)
+        finally:
+            self._release()
+
+    async def _acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation
+                self._release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        """Give free slots to waiters, first come first served"""
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _on_success(self, permit: Permit, latency: float) -> None:
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline *= 1 + self.baseline_drift
+        if not self.adaptive:
+            return
+        if latency > self.latency_tolerance * self.baseline:
+            self._decrease(permit, self.latency_backoff_ratio, "latency")
+            return
+        # Only grow a window that is in use: idle slots say nothing about capacity
+        if self.in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._publish()
+            self._hand_over()
+
+    def _on_overload(self, permit: Permit, reason: str) -> None:
+        if self.adaptive:
+            self._decrease(permit, self.backoff_ratio, reason)
+
+    def _decrease(self, permit: Permit, ratio: float, reason: str) -> None:
+        if permit.started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        previous = self.limit
+        self.limit = max(float(self.min_limit), self.limit * ratio)
+        metrics.incr(f"openai.concurrency.{self.name}.decreases")
+        self._publish()
+        logger.info("Model concurrency limit of %s lane cut from %.1f to %.1f (%s)", self.name, previous, self.limit, reason)
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"openai.concurrency.{self.name}.limit", round(self.limit, 2))
@@ -0,0 +1,117 @@
+"""Compact wire format for extraction output"""
+
+from typing import Any, Dict, List, Optional, Type, get_args, get_origin
+
+from pydantic import BaseModel
+
+
+class CompactOutputFormat:
+    """
+    Table layout for repeated rows in the model's JSON output
+
+    Arrays of objects (test_results, medications) make the model repeat the
+    same keys, e.g. "reference_range", for every row. In compact format
+    such arrays are written as a header row of column names followed by
+    value rows:
+
+        "test_results": [["test_name", "result_value", "unit"], ["Гемоглобин", "145", "г/л"]]
+
+    Everything else stays plain JSON, so a compact response is still valid
+    JSON and can be continued after truncation. expand() turns the tables
+    back into lists of objects before schema validation.
+    """
+
+    _table_fields: Dict[Type[BaseModel], Dict[str, List[str]]] = {}
+
+    @classmethod
+    def table_fields(cls, schema_class: Type[BaseModel]) -> Dict[str, List[str]]:
+        """
+        Get the list-of-object fields of a schema and their columns
+
+        Args:
+            schema_class: Document schema
+
+        Returns:
+            Mapping of field name to column names in schema order
+        """
+        cached = cls._table_fields.get(schema_class)
+        if cached is not None:
+            return cached
+
+        tables = {}
+        for name, info in schema_class.model_fields.items():
+            for arg in (info.annotation, *get_args(info.annotation)):
+                if get_origin(arg) not in (list, List):
+                    continue
+                item_args = get_args(arg)
+                if item_args and isinstance(item_args[0], type) and issubclass(item_args[0], BaseModel):
+                    # Columns filled after extraction are not asked of the model
+                    tables[name] = [
+                        column for column, column_info in item_args[0].model_fields.items()
+                        if not (column_info.json_schema_extra or {}).get("computed")
+                    ]
+                    break
+        cls._table_fields[schema_class] = tables
+        return tables
+
+    @classmethod
+    def instructions(cls, schema_class: Type[BaseModel], fields: Optional[List[str]] = None) -> str:
+        """
+        Get the prompt addition describing the compact layout
+
+        Args:
+            schema_class: Document schema
+            fields: Fields being extracted (None = all)
+
+        Returns:
+            Prompt text, empty if the extraction has no table fields
+        """
+        tables = {
+            name: columns for name, columns in cls.table_fields(schema_class).items()
+            if not fields or name in fields
+        }
+        if not tables:
+            return ""
+
+        lines = [
+            "",
+            "КОМПАКТНЫЙ ФОРМАТ: массивы объектов записывайте таблицей - массивом массивов. "
+            "Первая строка - названия столбцов, далее по одной строке значений на каждый элемент, "
+            "в том же порядке столбцов. Отсутствующие значения - null. Столбцы:",
+        ]
+        for name, columns in tables.items():
+            lines.append(f"- {name}: {columns}".replace("'", '"'))
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def expand(cls, raw_data: Any, schema_class: Type[BaseModel]) -> Any:
+        """
+        Turn compact tables back into lists of objects
+
+        Rows already written as objects are kept, so a response that ignored
+        the compact instructions still validates.
+
+        Args:
+            raw_data: Parsed model output
+            schema_class: Document schema
+
+        Returns:
+            Data in the schema's regular structure
+        """
+        if not isinstance(raw_data, dict):
+            return raw_data
+
+        for name, columns in cls.table_fields(schema_class).items():
+            rows = raw_data.get(name)
+            if not isinstance(rows, list) or not rows or not isinstance(rows[0], list):
+                continue
+
+            header = columns
+            if all(isinstance(value, str) for value in rows[0]) and set(rows[0]) <= set(columns):
+                header, rows = rows[0], rows[1:]
+
+            raw_data[name] = [
+                dict(zip(header, row)) if isinstance(row, list) else row
+                for row in rows
+            ]
+        return raw_data
@@ -4,6 +4,8 @@ import logging
 from typing import Tuple
 from app.schemas.base import DocumentType
 from app.services.openai_service import OpenAIService
+from app.services.rate_limiter import PRIORITY_INTERACTIVE
+from app.services import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -20,19 +22,31 @@ class DocumentClassifier:
         """
         self.openai_service = openai_service
     
-    async def classify(self, base64_image: str) -> Tuple[DocumentType, float]:
+    @tracing.traced("classify")
+    async def classify(
+        self,
+        base64_image: str,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> Tuple[DocumentType, float]:
         """
         Classify document type from image
         
         Args:
             base64_image: Base64 encoded image
+            tenant: Tenant or API key the request is made for
+            priority: "interactive" or "batch"
             
         Returns:
             Tuple of (document_type, confidence)
         """
         try:
             # Call OpenAI to classify
-            result = await self.openai_service.classify_document(base64_image)
+            result = await self.openai_service.classify_document(
+                base64_image,
+                tenant=tenant,
+                priority=priority
+            )
             
             # Extract document type and confidence
             doc_type_str = result.get("document_type", "unknown").lower()
@@ -42,16 +56,17 @@ class DocumentClassifier:
             try:
                 document_type = DocumentType(doc_type_str)
             except ValueError:
-                logger.warning(f"Unknown document type returned: {doc_type_str}")
+                logger.warning("Unknown document type returned: %s", doc_type_str)
                 document_type = DocumentType.UNKNOWN
                 confidence = 0.0
             
-            logger.info(f"Classified document as {document_type.value} with confidence {confidence}")
+            tracing.set_attributes({"document.type": document_type, "document.confidence": confidence})
+            logger.info("Classified document as %s with confidence %s", document_type.value, confidence)
             
             return document_type, confidence
             
         except Exception as e:
-            logger.error(f"Error classifying document: {str(e)}")
+            logger.error("Error classifying document: %s", e)
             # Return unknown on error
             return DocumentType.UNKNOWN, 0.0
 
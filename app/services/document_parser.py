@@ -1,7 +1,9 @@
 """Document parsing service"""
 
 import logging
-from typing import Dict, Any, Optional
+import re
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Type, get_args, get_origin
+from app.config import settings
 from app.schemas.base import DocumentType
 from app.schemas import (
     PrescriptionSchema,
@@ -9,8 +11,13 @@ from app.schemas import (
     DoctorVisitSchema,
     DiagnosticResultsSchema
 )
-from app.services.openai_service import OpenAIService
-from pydantic import ValidationError
+from app.services.compact_output import CompactOutputFormat
+from app.services.openai_service import OpenAIService, track_usage
+from app.services.output_budget import OutputTokenEstimator
+from app.services.rate_limiter import PRIORITY_INTERACTIVE
+from app.services import tracing
+from app.utils.logging_utils import capped
+from pydantic import BaseModel, ValidationError, create_model
 
 logger = logging.getLogger(__name__)
 
@@ -60,12 +67,11 @@ class DocumentParser:
   - result_value (обязательно): Значение результата теста
   - unit (необязательно): Единица измерения (например, "г/л", "10^9/л")
   - reference_range (необязательно): Референсный диапазон нормы (например, "120-160")
-  - status (необязательно): Статус - используйте "normal", "abnormal", или "critical"
   
   Пример структуры test_results:
   [
-    {"test_name": "Гемоглобин", "result_value": "145", "unit": "г/л", "reference_range": "120-160", "status": "normal"},
-    {"test_name": "Эритроциты", "result_value": "4.5", "unit": "10^12/л", "reference_range": "4.0-5.5", "status": "normal"}
+    {"test_name": "Гемоглобин", "result_value": "145", "unit": "г/л", "reference_range": "120-160"},
+    {"test_name": "Эритроциты", "result_value": "4.5", "unit": "10^12/л", "reference_range": "4.0-5.5"}
   ]
   
 - notes (необязательно): Любые дополнительные заметки или комментарии
@@ -125,6 +131,16 @@ class DocumentParser:
         DocumentType.DIAGNOSTIC_RESULTS: DiagnosticResultsSchema,
     }
     
+    # Smallest output budget for an extraction
+    MIN_OUTPUT_TOKENS = 300
+    
+    # Top-level field line in SCHEMA_DESCRIPTIONS, e.g. "- patient_name (обязательно): ..."
+    _FIELD_LINE = re.compile(r"^- (\w+) \(")
+    
+    # Caches for field-subset extraction
+    _field_blocks: Dict[DocumentType, Tuple[str, Dict[str, str]]] = {}
+    _partial_schemas: Dict[Tuple[DocumentType, Tuple[str, ...]], Type[BaseModel]] = {}
+    
     def __init__(self, openai_service: OpenAIService):
         """
         Initialize parser
@@ -133,11 +149,139 @@ class DocumentParser:
             openai_service: OpenAI service instance
         """
         self.openai_service = openai_service
+        self.output_estimator = OutputTokenEstimator(
+            min_tokens=self.MIN_OUTPUT_TOKENS,
+            max_tokens=settings.extraction_max_output_tokens
+        )
+    
+    @classmethod
+    def all_field_names(cls) -> List[str]:
+        """Get the names of all top-level fields across document types"""
+        names = []
+        for schema_class in cls.SCHEMA_CLASSES.values():
+            names.extend(name for name in schema_class.model_fields if name not in names)
+        return names
+    
+    @classmethod
+    def select_fields(cls, document_type: DocumentType, fields: Iterable[str]) -> List[str]:
+        """
+        Get the requested fields that exist for a document type, in schema order
+        
+        Args:
+            document_type: Document type
+            fields: Requested field names
+            
+        Returns:
+            Field names present in the document type's schema
+        """
+        schema_class = cls.SCHEMA_CLASSES.get(document_type)
+        if schema_class is None:
+            return []
+        requested = set(fields)
+        return [name for name in schema_class.model_fields if name in requested]
     
+    @classmethod
+    def _split_description(cls, document_type: DocumentType) -> Tuple[str, Dict[str, str]]:
+        """Split a schema description into its header and per-field blocks"""
+        cached = cls._field_blocks.get(document_type)
+        if cached is not None:
+            return cached
+        
+        header_lines: List[str] = []
+        blocks: Dict[str, List[str]] = {}
+        current: Optional[str] = None
+        for line in cls.SCHEMA_DESCRIPTIONS[document_type].strip("\n").splitlines():
+            match = cls._FIELD_LINE.match(line)
+            if match:
+                current = match.group(1)
+                blocks[current] = []
+            if current is None:
+                header_lines.append(line)
+            else:
+                blocks[current].append(line)
+        
+        result = ("\n".join(header_lines), {name: "\n".join(lines) for name, lines in blocks.items()})
+        cls._field_blocks[document_type] = result
+        return result
+    
+    @classmethod
+    def build_schema_description(cls, document_type: DocumentType, fields: Optional[List[str]] = None) -> str:
+        """
+        Build the prompt's field list, optionally reduced to a subset of fields
+        
+        Args:
+            document_type: Document type
+            fields: Fields to extract (None = all)
+            
+        Returns:
+            Schema description for the extraction prompt
+        """
+        if not fields:
+            return cls.SCHEMA_DESCRIPTIONS[document_type]
+        header, blocks = cls._split_description(document_type)
+        selected = [blocks[name] for name in fields if name in blocks]
+        return "\n" + "\n".join([header, *selected]) + "\n"
+    
+    @classmethod
+    def partial_schema(cls, document_type: DocumentType, fields: List[str]) -> Type[BaseModel]:
+        """
+        Get a Pydantic model with only the given fields of a document schema
+        
+        Args:
+            document_type: Document type
+            fields: Fields to keep (required/optional status is preserved)
+            
+        Returns:
+            Pydantic model class
+        """
+        key = (document_type, tuple(fields))
+        model = cls._partial_schemas.get(key)
+        if model is None:
+            schema_class = cls.SCHEMA_CLASSES[document_type]
+            model = create_model(
+                f"{schema_class.__name__}Partial",
+                **{name: (schema_class.model_fields[name].annotation, schema_class.model_fields[name]) for name in fields}
+            )
+            cls._partial_schemas[key] = model
+        return model
+    
+    @staticmethod
+    def _output_weight(annotation: Any) -> int:
+        """Relative output size of a field: lists dominate, nested objects next"""
+        for arg in (annotation, *get_args(annotation)):
+            if get_origin(arg) in (list, List):
+                return 12
+            if isinstance(arg, type) and issubclass(arg, BaseModel):
+                return 3
+        return 1
+    
+    @classmethod
+    def output_fraction(cls, document_type: DocumentType, fields: Optional[List[str]] = None) -> float:
+        """
+        Get the share of a full extraction's output the requested fields make up
+        
+        Args:
+            document_type: Document type
+            fields: Fields to extract (None = all)
+            
+        Returns:
+            Fraction between 0 and 1
+        """
+        if not fields:
+            return 1.0
+        model_fields = cls.SCHEMA_CLASSES[document_type].model_fields
+        total = sum(cls._output_weight(info.annotation) for info in model_fields.values())
+        selected = sum(cls._output_weight(model_fields[name].annotation) for name in fields)
+        return selected / total
+    
+    @tracing.traced("parse")
     async def parse(
         self,
         base64_image: str,
-        document_type: DocumentType
+        document_type: DocumentType,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE,
+        fields: Optional[List[str]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Parse document and extract structured data
@@ -145,6 +289,10 @@ class DocumentParser:
         Args:
             base64_image: Base64 encoded image
             document_type: Type of document to parse
+            tenant: Tenant or API key the request is made for
+            priority: "interactive" or "batch"
+            fields: Optional subset of top-level fields to extract (None = all).
+                Requested fields the document type doesn't have are ignored.
             
         Returns:
             Parsed data dictionary or None if parsing fails
@@ -155,32 +303,68 @@ class DocumentParser:
             return None
         
         # Get schema description
-        schema_description = self.SCHEMA_DESCRIPTIONS.get(document_type)
-        if not schema_description:
-            logger.error(f"No schema description found for {document_type}")
+        if not self.SCHEMA_DESCRIPTIONS.get(document_type):
+            logger.error("No schema description found for %s", document_type)
             return None
         
+        if fields is not None:
+            fields = self.select_fields(document_type, fields)
+            if not fields:
+                logger.info("None of the requested fields exist for %s, skipping extraction", document_type.value)
+                return None
+        
+        schema_description = self.build_schema_description(document_type, fields)
+        compact = settings.compact_output and document_type in self.SCHEMA_CLASSES
+        if compact:
+            schema_description += CompactOutputFormat.instructions(self.SCHEMA_CLASSES[document_type], fields)
+        # Size the output budget by document type and page content
+        image_bytes = len(base64_image) * 3 // 4
+        fraction = self.output_fraction(document_type, fields)
+        max_tokens = self.output_estimator.estimate(document_type, image_bytes, fraction)
+        tracing.set_attributes({
+            "document.type": document_type,
+            "parse.fields": len(fields) if fields else None,
+            "parse.compact": compact,
+            "parse.max_tokens": max_tokens,
+        })
+        
         try:
             # Extract structured data using OpenAI
-            logger.info(f"Starting extraction for {document_type.value} document")
-            raw_data = await self.openai_service.extract_structured_data(
-                base64_image=base64_image,
-                document_type=document_type.value,
-                schema_description=schema_description
-            )
+            logger.info("Starting extraction for %s document (max_tokens=%s)", document_type.value, max_tokens)
+            with track_usage() as usage:
+                raw_data = await self.openai_service.extract_structured_data(
+                    base64_image=base64_image,
+                    document_type=document_type.value,
+                    schema_description=schema_description,
+                    max_tokens=max_tokens,
+                    tenant=tenant,
+                    priority=priority
+                )
+            self.output_estimator.observe(document_type, image_bytes, usage["completion_tokens"], fraction)
+            tracing.set_attributes({
+                "llm.calls": usage["calls_completed"],
+                "llm.prompt_tokens": usage["prompt_tokens"],
+                "llm.completion_tokens": usage["completion_tokens"],
+            })
+            if compact:
+                raw_data = CompactOutputFormat.expand(raw_data, self.SCHEMA_CLASSES[document_type])
             
-            logger.info(f"Raw data extracted: {str(raw_data)[:200]}...")
+            logger.debug("Raw data extracted: %s", capped(raw_data, 200))
             
             # Validate data against Pydantic schema
             schema_class = self.SCHEMA_CLASSES.get(document_type)
+            if schema_class and fields:
+                schema_class = self.partial_schema(document_type, fields)
             if schema_class:
                 try:
-                    validated_data = schema_class(**raw_data)
-                    logger.info(f"Successfully parsed and validated {document_type.value} document")
+                    validated_data = schema_class.model_validate(raw_data)
+                    tracing.set_attributes({"parse.valid": True})
+                    logger.info("Successfully parsed and validated %s document", document_type.value)
                     return validated_data.model_dump()
                 except ValidationError as e:
-                    logger.error(f"Validation errors for {document_type.value}: {str(e)}")
-                    logger.error(f"Raw data that failed validation: {raw_data}")
+                    tracing.set_attributes({"parse.valid": False, "parse.validation_errors": e.error_count()})
+                    logger.error("Validation errors for %s: %s", document_type.value, e)
+                    logger.error("Raw data that failed validation: %s", capped(raw_data))
                     # Return raw data even if validation fails
                     logger.info("Returning raw data despite validation errors")
                     return raw_data
@@ -188,6 +372,6 @@ class DocumentParser:
                 return raw_data
             
         except Exception as e:
-            logger.error(f"Error parsing document: {str(e)}", exc_info=True)
+            logger.error("Error parsing document: %s", e, exc_info=True)
             return None
 
@@ -0,0 +1,320 @@
+"""Streaming export of stored extractions as NDJSON, CSV or Parquet"""
+
+import csv
+import datetime
+import decimal
+import io
+import logging
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from app.utils import json_utils
+
+logger = logging.getLogger(__name__)
+
+# Exportable datasets and the views of database_schema.sql they are read from
+DATASETS = {
+    "documents": ("v_all_documents", "processed_at"),
+    "lab_results": ("v_lab_report_details", "processed_at"),
+    "prescriptions": ("v_prescription_details", "processed_at"),
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _json_default(value: Any) -> Any:
+    """JSON value of types orjson doesn't handle (NUMERIC columns)"""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return str(value)
+
+
+# PostgreSQL type OIDs of timestamp and timestamptz columns
+TIMESTAMP_OIDS = {1114: None, 1184: "UTC"}
+
+
+class NdjsonEncoder:
+    """One JSON object per row"""
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def encode(self, rows: List[tuple]) -> bytes:
+        """Encode a batch of rows"""
+        columns = self.columns
+        return b"".join(
+            json_utils.dumps(dict(zip(columns, row)), default=_json_default) + b"\n" for row in rows
+        )
+
+    def finish(self) -> bytes:
+        """Trailing bytes after the last batch"""
+        return b""
+
+
+class CsvEncoder:
+    """Header row followed by one line per row; NULL is an empty cell"""
+
+    def __init__(self, columns: List[str], type_codes: Optional[Sequence[Optional[int]]] = None):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(columns)
+        # Timestamps are written as ISO 8601 like in NDJSON, not str()'s "2025-01-01 12:00:00"
+        self._timestamps = [index for index, code in enumerate(type_codes or ()) if code in TIMESTAMP_OIDS]
+
+    def _with_iso_timestamps(self, row: tuple) -> list:
+        row = list(row)
+        for index in self._timestamps:
+            if row[index] is not None:
+                row[index] = row[index].isoformat()
+        return row
+
+    def encode(self, rows: List[tuple]) -> bytes:
+        """Encode a batch of rows (the first call includes the header)"""
+        if self._timestamps:
+            rows = [self._with_iso_timestamps(row) for row in rows]
+        self._writer.writerows(rows)
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def finish(self) -> bytes:
+        """Header only, if there were no rows"""
+        return self.encode([])
+
+
+class _ChunkSink:
+    """Write-only file that hands out what was written since the last drain"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet column chunk offsets in the footer come from here, so it
+        # counts everything ever written, not what is still buffered
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """
+    One Parquet row group per batch
+
+    Column types come from the database column types, so a batch whose
+    first rows are NULL still gets the right schema. Every batch is written
+    as a row group and its bytes are returned right away; the footer comes
+    last, from finish(). Needs pyarrow.
+    """
+
+    # PostgreSQL type OIDs and their Arrow types (anything else is exported as text)
+    ARROW_TYPES = {
+        16: "bool_",
+        20: "int64", 21: "int32", 23: "int32",
+        700: "float32", 701: "float64", 1700: "float64",
+        1082: "date32",
+    }
+
+    def __init__(self, columns: List[str], type_codes: Optional[Sequence[Optional[int]]] = None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        fields = []
+        for index, name in enumerate(columns):
+            type_code = type_codes[index] if type_codes else None
+            if type_code in TIMESTAMP_OIDS:
+                arrow_type = pa.timestamp("us", tz=TIMESTAMP_OIDS[type_code])
+            elif type_code in self.ARROW_TYPES:
+                arrow_type = getattr(pa, self.ARROW_TYPES[type_code])()
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(name, arrow_type))
+        self._schema = pa.schema(fields)
+        self._text_columns = [index for index, field in enumerate(fields) if field.type == pa.string()]
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def encode(self, rows: List[tuple]) -> bytes:
+        """Encode a batch of rows as one row group"""
+        if not rows:
+            return b""
+        columns = [list(column) for column in zip(*rows)]
+        for index in self._text_columns:
+            columns[index] = [value if value is None or isinstance(value, str) else str(value) for value in columns[index]]
+        for index, field in enumerate(self._schema):
+            if field.type == self._pa.float64():
+                columns[index] = [None if value is None else float(value) for value in columns[index]]
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema
+        )
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        """Footer of the file"""
+        self._writer.close()
+        return self._sink.drain()
+
+
+def encoder_for(export_format: str, columns: List[str], type_codes: Optional[Sequence[Optional[int]]] = None):
+    """Create the encoder of a format"""
+    if export_format == "ndjson":
+        return NdjsonEncoder(columns)
+    if export_format == "csv":
+        return CsvEncoder(columns, type_codes)
+    if export_format == "parquet":
+        return ParquetEncoder(columns, type_codes)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+def encode_batches(
+    columns: List[str],
+    batches: Iterable[List[tuple]],
+    export_format: str,
+    type_codes: Optional[Sequence[Optional[int]]] = None
+) -> Iterator[bytes]:
+    """
+    Encode row batches as they arrive
+
+    Args:
+        columns: Column names
+        batches: Lists of rows
+        export_format: "ndjson", "csv" or "parquet"
+        type_codes: PostgreSQL type OIDs of the columns (Parquet column types)
+
+    Yields:
+        Encoded bytes, one chunk per batch plus a final chunk
+    """
+    encoder = encoder_for(export_format, columns, type_codes)
+    for rows in batches:
+        chunk = encoder.encode(rows)
+        if chunk:
+            yield chunk
+    chunk = encoder.finish()
+    if chunk:
+        yield chunk
+
+
+class Exporter:
+    """
+    Read export datasets from PostgreSQL with a server-side cursor
+
+    Rows are fetched batch_size at a time from a named cursor, so the
+    database streams the result and neither side holds the whole dataset;
+    each batch is encoded and handed on before the next one is fetched.
+    Needs psycopg (and pyarrow for Parquet).
+    """
+
+    def __init__(self, dsn: str, batch_size: int = 10_000):
+        """
+        Initialize exporter
+
+        Args:
+            dsn: PostgreSQL connection string
+            batch_size: Rows per fetch (and per Parquet row group)
+        """
+        self.dsn = dsn
+        self.batch_size = batch_size
+
+    @staticmethod
+    def check_format(export_format: str) -> None:
+        """
+        Check that a format is known and its library is installed
+
+        Raises:
+            ValueError: Unknown format
+            RuntimeError: psycopg or pyarrow is missing
+        """
+        if export_format not in FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        try:
+            import psycopg  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Export needs psycopg: pip install 'psycopg[binary]'")
+        if export_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+
+    def stream(
+        self,
+        dataset: str,
+        export_format: str,
+        since: Optional[datetime.datetime] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Iterator[bytes]:
+        """
+        Export a dataset
+
+        Args:
+            dataset: Key of DATASETS
+            export_format: "ndjson", "csv" or "parquet"
+            since: Only documents processed at or after this time
+            progress: Called with the number of rows read so far after every batch
+
+        Yields:
+            Encoded bytes
+        """
+        import psycopg
+        from psycopg import sql
+
+        view, time_column = DATASETS[dataset]
+        query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(view))
+        params: List[Any] = []
+        if since is not None:
+            query = sql.SQL("{} WHERE {} >= %s").format(query, sql.Identifier(time_column))
+            params.append(since)
+
+        exported = 0
+        with psycopg.connect(self.dsn) as conn:
+            # Named cursors are server-side and need a transaction; it is read-only
+            conn.read_only = True
+            with conn.cursor(name=f"export_{dataset}") as cursor:
+                cursor.itersize = self.batch_size
+                cursor.execute(query, params)
+                columns = [column.name for column in cursor.description]
+                type_codes = [column.type_code for column in cursor.description]
+
+                def batches() -> Iterator[List[tuple]]:
+                    nonlocal exported
+                    while True:
+                        rows = cursor.fetchmany(self.batch_size)
+                        if not rows:
+                            return
+                        exported += len(rows)
+                        if progress is not None:
+                            progress(exported)
+                        yield rows
+
+                yield from encode_batches(columns, batches(), export_format, type_codes)
+        logger.info("Exported %s rows of %s as %s", exported, dataset, export_format)
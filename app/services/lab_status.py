@@ -0,0 +1,192 @@
+"""Lab result status from reference ranges"""
+
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+NORMAL = "normal"
+ABNORMAL = "abnormal"
+CRITICAL = "critical"
+
+_NUM = r"([-+]?\d+(?:[.,]\d+)?)"
+_VALUE = re.compile(r"^\s*[<>≤≥]?\s*=?\s*" + _NUM + r"(?![\d.,]|\s*[-–—:/]\s*\d)")
+_BETWEEN = re.compile(r"^\s*(?:от\s*)?" + _NUM + r"\s*(?:[-–—]|\.\.\.?|до)\s*" + _NUM)
+_AT_MOST = re.compile(r"^\s*(?:<\s*=?|≤|до|менее|меньше|не\s+более|ниже)\s*" + _NUM)
+_AT_LEAST = re.compile(r"^\s*(?:>\s*=?|≥|от|более|больше|не\s+менее|выше)\s*" + _NUM)
+_NON_WORD = re.compile(r"[\W_]+")
+_SPACE = re.compile(r"\s+")
+
+# Critical limits: {(test_code, unit): (low, high)}, a missing side infinite
+CriticalLimits = Dict[Tuple[str, str], Tuple[float, float]]
+
+# Qualitative results and ranges ("отрицательно" vs "обнаружено")
+_NEGATIVE = frozenset({
+    "отрицательно", "отрицательный", "отр", "не обнаружено", "не обнаружен", "не обнаружены", "отсутствует",
+    "отсутствуют", "нет", "negative", "neg", "not detected",
+})
+_POSITIVE = frozenset({
+    "положительно", "положительный", "полож", "обнаружено", "обнаружен", "обнаружены", "positive", "pos", "detected",
+})
+
+
+def _number(text: str) -> float:
+    """Float of a number with a decimal point or comma"""
+    return float(text.replace(",", "."))
+
+
+def parse_value(result_value: Any) -> Optional[float]:
+    """
+    Numeric value of a result ("145", "14,5", "<0.5", "5.4 ммоль/л")
+
+    Returns:
+        Value, or None for qualitative results, ranges ("2-3") and
+        ratios such as titers ("1:160")
+    """
+    parsed = parse_value_and_unit(result_value)
+    return parsed[0] if parsed else None
+
+
+def parse_value_and_unit(result_value: Any) -> Optional[Tuple[float, str]]:
+    """
+    Numeric value of a result and the text written after it ("5.4 ммоль/л")
+
+    Returns:
+        Tuple of (value, text after the number), or None like parse_value()
+    """
+    if isinstance(result_value, (int, float)) and not isinstance(result_value, bool):
+        return float(result_value), ""
+    text = str(result_value or "")
+    match = _VALUE.match(text)
+    return (_number(match.group(1)), text[match.end():].strip()) if match else None
+
+
+def parse_range(reference_range: Any) -> Optional[Tuple[float, float]]:
+    """
+    Bounds of a reference range, inclusive
+
+    Understands "120-160", "4,0 – 5,5", "от 3.5 до 5.5", "<5.0", "до 10",
+    "менее 10", ">60" and "более 60"; a missing side is infinite.
+
+    Returns:
+        Tuple of (low, high), or None if the range can't be parsed
+    """
+    text = str(reference_range or "").lower()
+    match = _BETWEEN.match(text)
+    if match:
+        low, high = _number(match.group(1)), _number(match.group(2))
+        return (low, high) if low <= high else None
+    match = _AT_MOST.match(text)
+    if match:
+        return -math.inf, _number(match.group(1))
+    match = _AT_LEAST.match(text)
+    if match:
+        return _number(match.group(1)), math.inf
+    return None
+
+
+def _qualitative_status(result_value: Any, reference_range: Any) -> Optional[str]:
+    """Status of a qualitative result against a qualitative norm, if both are recognized"""
+    value = _NON_WORD.sub(" ", str(result_value or "").lower()).strip()
+    norm = _NON_WORD.sub(" ", str(reference_range or "").lower()).strip()
+    if not value or not norm:
+        return None
+    if value == norm:
+        return NORMAL
+    if norm in _NEGATIVE and value in _POSITIVE or norm in _POSITIVE and value in _NEGATIVE:
+        return ABNORMAL
+    return None
+
+
+def _unit_key(unit: Any) -> str:
+    """Unit compared case- and space-insensitively ("ммоль/л", "Ммоль / л")"""
+    return _SPACE.sub("", str(unit or "").lower())
+
+
+def load_critical_limits(path: str) -> CriticalLimits:
+    """
+    Read critical limits from a JSON file
+
+    Critical values are clinically defined per test and unit by the
+    laboratory, so they come from configuration, e.g.
+    {"K": [{"unit": "ммоль/л", "low": 2.5, "high": 6.5}]}.
+
+    Args:
+        path: JSON file of limits per test code
+
+    Returns:
+        Limits by (test code, unit)
+    """
+    with open(path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    limits: CriticalLimits = {}
+    for code, entries in data.items():
+        for entry in entries:
+            low = entry.get("low")
+            high = entry.get("high")
+            limits[(code, _unit_key(entry.get("unit")))] = (
+                -math.inf if low is None else float(low),
+                math.inf if high is None else float(high),
+            )
+    return limits
+
+
+def compute_statuses(results: Optional[List[Dict[str, Any]]], critical_limits: Optional[CriticalLimits] = None) -> int:
+    """
+    Set the status of lab results from their value and reference range
+
+    Values and bounds of all parseable rows are compared at once as
+    arrays. A result outside its range is abnormal, inside it normal.
+    It is critical only beyond an explicit critical limit for its
+    test_code and unit. The model isn't asked for a status, so rows
+    whose value or range can't be parsed are left without one.
+
+    Args:
+        results: test_results of a lab report (updated in place)
+        critical_limits: Critical limits by (test code, unit), see load_critical_limits()
+
+    Returns:
+        Number of statuses computed
+    """
+    rows: List[Dict[str, Any]] = []
+    values: List[float] = []
+    lows: List[float] = []
+    highs: List[float] = []
+    critical_lows: List[float] = []
+    critical_highs: List[float] = []
+    computed = 0
+    for result in results or []:
+        if not isinstance(result, dict):
+            continue
+        value = parse_value(result.get("result_value"))
+        bounds = parse_range(result.get("reference_range"))
+        if value is None or bounds is None:
+            status = _qualitative_status(result.get("result_value"), result.get("reference_range"))
+            if status is not None:
+                result["status"] = status
+                computed += 1
+            continue
+        critical = (critical_limits or {}).get(
+            (result.get("test_code"), _unit_key(result.get("unit"))), (-math.inf, math.inf)
+        )
+        rows.append(result)
+        values.append(value)
+        lows.append(bounds[0])
+        highs.append(bounds[1])
+        critical_lows.append(critical[0])
+        critical_highs.append(critical[1])
+
+    if not rows:
+        return computed
+
+    import numpy as np
+
+    value_array = np.array(values)
+    outside = (value_array < np.array(lows)) | (value_array > np.array(highs))
+    beyond_limits = (value_array < np.array(critical_lows)) | (value_array > np.array(critical_highs))
+    codes = np.where(beyond_limits, 2, np.where(outside, 1, 0))
+
+    names = (NORMAL, ABNORMAL, CRITICAL)
+    for result, code in zip(rows, codes.tolist()):
+        result["status"] = names[code]
+    return computed + len(rows)
@@ -0,0 +1,154 @@
+"""Event-loop lag sampling and load shedding"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Sample how late the event loop runs scheduled callbacks
+
+    A task sleeps for interval seconds and measures how much later than
+    that it wakes up; any blocking work on the loop (image decoding, JSON
+    of big responses, synchronous I/O) shows up as lag. Also publishes the
+    in-flight and queued request counts of the lanes as gauges.
+    """
+
+    def __init__(self, interval: float = 0.1, window_seconds: float = 2.0, lanes: Optional[List[Any]] = None):
+        """
+        Initialize monitor
+
+        Args:
+            interval: Seconds between samples
+            window_seconds: Span of the recent maximum lag
+            lanes: Lanes whose in_flight and waiting counts are published
+        """
+        self.interval = interval
+        self.window_seconds = window_seconds
+        self.lanes = lanes or []
+        self.lag_ms = 0.0
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start sampling on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record((loop.time() - scheduled - self.interval) * 1000)
+
+    def record(self, lag_ms: float) -> None:
+        """Add a lag sample and update the gauges"""
+        now = time.monotonic()
+        self.lag_ms = max(0.0, lag_ms)
+        self._samples.append((now, self.lag_ms))
+        while self._samples[0][0] < now - self.window_seconds:
+            self._samples.popleft()
+        metrics.set_gauge("loop.lag_ms", self.lag_ms)
+        metrics.set_gauge("loop.lag_max_ms", self.max_lag_ms)
+        metrics.set_gauge("requests.in_flight", self.in_flight)
+        metrics.set_gauge("requests.queued", self.queued)
+
+    @property
+    def max_lag_ms(self) -> float:
+        """Largest lag of the recent window"""
+        return max((lag for _, lag in self._samples), default=0.0)
+
+    @property
+    def in_flight(self) -> int:
+        """Requests holding a lane slot"""
+        return sum(lane.in_flight for lane in self.lanes)
+
+    @property
+    def queued(self) -> int:
+        """Requests waiting for a lane slot"""
+        return sum(lane.waiting for lane in self.lanes)
+
+
+class AdmissionController:
+    """
+    Reject new work while the worker is already behind
+
+    A worker is overloaded when the recent event-loop lag or the number
+    of queued requests is above its threshold (0 disables a threshold).
+    New analyze requests then get 503 with Retry-After, and the health
+    endpoint reports not ready, so the load balancer sends traffic to
+    other workers instead of queueing it behind a stalled loop.
+    """
+
+    def __init__(self, monitor: LoopLagMonitor, max_lag_ms: float = 0.0, max_queued: int = 0, retry_after: int = 2):
+        """
+        Initialize controller
+
+        Args:
+            monitor: Source of lag and queue depth
+            max_lag_ms: Recent loop lag above which requests are shed
+            max_queued: Queued requests above which requests are shed
+            retry_after: Seconds clients are told to wait
+        """
+        self.monitor = monitor
+        self.max_lag_ms = max_lag_ms
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+
+    def overload_reason(self) -> Optional[str]:
+        """Why the worker is overloaded, or None if it can take work"""
+        lag_ms = self.monitor.max_lag_ms
+        if self.max_lag_ms > 0 and lag_ms > self.max_lag_ms:
+            return f"Event loop lag {lag_ms:.0f} ms is above {self.max_lag_ms:.0f} ms"
+        queued = self.monitor.queued
+        if self.max_queued > 0 and queued > self.max_queued:
+            return f"{queued} requests are queued, more than {self.max_queued}"
+        return None
+
+    def admit(self) -> Optional[str]:
+        """
+        Decide on a new request
+
+        Returns:
+            None to admit it, or the reason to shed it
+        """
+        reason = self.overload_reason()
+        if reason is not None:
+            metrics.incr("admission.shed")
+        return reason
+
+    def retry_after_seconds(self) -> int:
+        """Retry-After for shed requests: at least the time the lag takes to leave the window"""
+        if self.max_lag_ms > 0 and self.monitor.max_lag_ms > self.max_lag_ms:
+            return max(self.retry_after, math.ceil(self.monitor.window_seconds))
+        return self.retry_after
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness and the load figures behind it"""
+        reason = self.overload_reason()
+        return {
+            "ready": reason is None,
+            "reason": reason,
+            "loop_lag_ms": round(self.monitor.max_lag_ms, 1),
+            "in_flight": self.monitor.in_flight,
+            "queued": self.monitor.queued,
+        }
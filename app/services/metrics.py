@@ -0,0 +1,74 @@
+"""In-process metrics registry"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, Any
+
+
+class Metrics:
+    """
+    Minimal counters, gauges and summaries for the current worker process
+
+    Values are exposed as a JSON snapshot on the metrics endpoint. Names are
+    dotted paths, e.g. "speculation.hits" or "openai.tokens.total".
+    """
+
+    def __init__(self):
+        """Initialize empty registry"""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1.0) -> None:
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation in a summary (count, sum, min, max)"""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "sum": value, "min": value, "max": value}
+                return
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+
+    def get(self, name: str) -> float:
+        """Get a counter or gauge value (0 if never recorded)"""
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name, 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of all metrics"""
+        with self._lock:
+            summaries = {
+                name: {**summary, "avg": summary["sum"] / summary["count"]}
+                for name, summary in self._summaries.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries,
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+# Global metrics registry
+metrics = Metrics()
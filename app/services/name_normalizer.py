@@ -0,0 +1,423 @@
+"""Canonical codes for lab test and medication names"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.base import DocumentType
+
+logger = logging.getLogger(__name__)
+
+# Bundled synonym dictionary: {"lab_tests": {code: [names]}, "medications": {code: [names]}}
+DEFAULT_DICTIONARY_PATH = Path(__file__).resolve().parent.parent / "data" / "name_synonyms.json"
+
+LAB_TESTS = "lab_tests"
+MEDICATIONS = "medications"
+
+_WORD = re.compile(r"[0-9a-zа-яё]+")
+# Words written in capitals are abbreviations: "ЛПОНП" is not a misspelled "ЛПНП"
+_ABBREVIATION = re.compile(r"\b[0-9A-ZА-ЯЁ]{2,6}\b")
+
+# Words that qualify a name without changing what it refers to
+_NOISE_WORDS = {
+    LAB_TESTS: frozenset({
+        "в", "на", "крови", "кровь", "сыворотке", "сыворотки", "плазме", "плазмы",
+        "общий", "общая", "общее", "уровень", "концентрация", "анализ", "blood", "serum", "total",
+    }),
+    MEDICATIONS: frozenset({
+        "мг", "мкг", "г", "мл", "ме", "ед", "mg", "mcg", "ml", "таб", "табл", "таблетки", "таблетка",
+        "капс", "капсулы", "капсула", "р", "ра", "раствор", "сироп", "суспензия", "мазь", "гель", "спрей",
+        "порошок", "солютаб", "ретард", "форте", "tab", "caps",
+    }),
+}
+
+
+# Words that tell analytes apart; never corrected and never a correction
+_QUALIFIERS = {
+    LAB_TESTS: frozenset({
+        "прямой", "непрямой", "связанный", "несвязанный", "свободный", "свободная", "свободные",
+        "direct", "indirect", "free", "bound",
+    }),
+    MEDICATIONS: frozenset(),
+}
+
+
+class _Pattern:
+    """A name prepared for edit distance computations against many others"""
+
+    __slots__ = ("length", "masks")
+
+    def __init__(self, name: str):
+        self.length = len(name)
+        # Bit i of masks[char] is set if name[i] == char
+        self.masks: Dict[str, int] = {}
+        for index, char in enumerate(name):
+            self.masks[char] = self.masks.get(char, 0) | (1 << index)
+
+    def distance(self, text: str) -> int:
+        """
+        Levenshtein distance to text
+
+        Bit-parallel algorithm (Myers 1999, Hyyrö 2001): one column of the
+        edit distance matrix is kept as bit vectors of +1/-1 differences, so
+        a character of text costs a dozen integer operations instead of a
+        loop over the pattern.
+        """
+        length = self.length
+        if length == 0:
+            return len(text)
+        mask = (1 << length) - 1
+        last = 1 << (length - 1)
+        positive, negative, score = mask, 0, length
+        for char in text:
+            equal = self.masks.get(char, 0)
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            horizontal_positive = (negative | ~(horizontal | positive)) & mask
+            horizontal_negative = positive & horizontal
+            if horizontal_positive & last:
+                score += 1
+            elif horizontal_negative & last:
+                score -= 1
+            horizontal_positive = ((horizontal_positive << 1) | 1) & mask
+            horizontal_negative = (horizontal_negative << 1) & mask
+            positive = (horizontal_negative | ~(vertical | horizontal_positive)) & mask
+            negative = horizontal_positive & vertical
+        return score
+
+
+class _BKTree:
+    """BK-trees of strings for nearest-match search under edit distance"""
+
+    def __init__(self):
+        # One tree per string length, so a search only visits strings that
+        # can be close enough. Node: [text, value, {distance: child}]
+        self._roots: Dict[int, list] = {}
+
+    def add(self, text: str, value: Optional[str]) -> None:
+        """Add a string with its value"""
+        node = self._roots.get(len(text))
+        if node is None:
+            self._roots[len(text)] = [text, value, {}]
+            return
+        pattern = _Pattern(text)
+        while True:
+            distance = pattern.distance(node[0])
+            if distance == 0:
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [text, value, {}]
+                return
+            node = child
+
+    def search(self, text: str, max_distance: int, min_length: int = 0) -> List[Tuple[int, Optional[str]]]:
+        """Get (distance, value) of every string of at least min_length within max_distance"""
+        matches = []
+        pattern = _Pattern(text)
+        stack = [
+            self._roots[length]
+            for length in range(max(len(text) - max_distance, min_length), len(text) + max_distance + 1)
+            if length in self._roots
+        ]
+        while stack:
+            node = stack.pop()
+            distance = pattern.distance(node[0])
+            if distance <= max_distance:
+                matches.append((distance, node[1]))
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return matches
+
+    # No typos in abbreviations: "ALT" and "AST" are one letter apart, and
+    # "ЛПОНП" is not a misspelled "ЛПНП"
+    MIN_LENGTH = 5
+
+    @classmethod
+    def tolerance(cls, text: str) -> int:
+        """Typos allowed in a string of text's length"""
+        if len(text) < cls.MIN_LENGTH:
+            return 0
+        return 1 if len(text) <= 8 else 2
+
+    def nearest(self, text: str) -> Optional[str]:
+        """Value of the single closest string within the typo tolerance for text's length"""
+        tolerance = self.tolerance(text)
+        if not tolerance:
+            return None
+        matches = self.search(text, tolerance, self.MIN_LENGTH)
+        if not matches:
+            return None
+        best = min(distance for distance, _ in matches)
+        values = {value for distance, value in matches if distance == best}
+        return values.pop() if len(values) == 1 else None
+
+
+class _NameIndex:
+    """Word trie and BK-trees over the synonyms of one kind of name"""
+
+    # Sentinel key of the code stored at the end of a trie path
+    _CODE = ""
+
+    def __init__(self, noise_words: frozenset, qualifiers: frozenset = frozenset()):
+        self.noise_words = noise_words
+        self.qualifiers = qualifiers
+        self.trie: Dict[str, Any] = {}
+        self.words = _BKTree()
+        self.vocabulary = set()
+        # Codes of the synonyms each dictionary word appears in
+        self.word_codes: Dict[str, set] = {}
+        self.names = _BKTree()
+        self.count = 0
+        for word in noise_words:
+            # Misspelled qualifiers are dropped like correct ones
+            self.words.add(word, self._CODE)
+
+    def tokens(self, name: str) -> List[str]:
+        """Lowercase words of a name without qualifiers (and, for medications, doses)"""
+        words = _WORD.findall(name.lower().replace("ё", "е"))
+        kept = [word for word in words if word not in self.noise_words]
+        if self.noise_words is _NOISE_WORDS[MEDICATIONS]:
+            # "500", "500мг" and "875/125" are doses; "d3" and "b12" are part of the name
+            kept = [word for word in kept if not word[0].isdigit()]
+        return kept
+
+    def _insert(self, tokens: List[str], code: str, overwrite: bool) -> None:
+        node = self.trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        existing = node.get(self._CODE, code)
+        if existing != code and overwrite:
+            logger.warning("Name %r maps to both %s and %s; leaving it unmapped", " ".join(tokens), existing, code)
+            code = None
+        if overwrite or self._CODE not in node:
+            node[self._CODE] = code
+
+    def add(self, name: str, code: str) -> None:
+        """Add a synonym"""
+        tokens = self.tokens(name)
+        if not tokens:
+            return
+        self._insert(tokens, code, overwrite=True)
+        self.names.add(" ".join(tokens), code)
+        for token in tokens:
+            if token not in self.vocabulary:
+                self.vocabulary.add(token)
+                self.words.add(token, token)
+            self.word_codes.setdefault(token, set()).add(code)
+        self.count += 1
+
+    def finish(self) -> None:
+        """Also index every synonym with sorted words, so word order doesn't matter"""
+        def walk(node, path):
+            for token, child in list(node.items()):
+                if token == self._CODE:
+                    if child is not None and len(path) > 1:
+                        yield sorted(path), child
+                else:
+                    yield from walk(child, path + [token])
+        for tokens, code in list(walk(self.trie, [])):
+            self._insert(tokens, code, overwrite=False)
+
+    def _correct(self, token: str) -> Optional[str]:
+        """
+        Dictionary word a misspelled word stands for ("" for a qualifier), or None
+
+        Only unambiguous typos are corrected: the closest word must be the
+        only one within tolerance, apart from other forms of itself
+        ("гемоглобина") and words of the same names.
+        """
+        word = self.words.nearest(token)
+        if word is None or word in self.qualifiers:
+            return None
+        if word == self._CODE:
+            return word
+        for _, other in self.words.search(token, self.words.tolerance(token), self.words.MIN_LENGTH):
+            if other in (word, self._CODE) or self.word_codes[other] & self.word_codes[word]:
+                continue
+            # Inflected forms share all but their endings
+            stem = min(len(word), len(other)) - 2
+            if stem < 5 or word[:stem] != other[:stem]:
+                return None
+        return word
+
+    def _match(self, tokens: List[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Match words against the trie: (found, code)
+
+        Tries the whole sequence in given and sorted order, then a split
+        into consecutive synonyms ("Гемоглобин (HGB)") that all name the
+        same thing.
+        """
+        for candidate in (tokens, sorted(tokens)):
+            node = self.trie
+            for token in candidate:
+                node = node.get(token)
+                if node is None:
+                    break
+            else:
+                if self._CODE in node:
+                    return True, node[self._CODE]
+
+        codes = set()
+        start = 0
+        while start < len(tokens):
+            node, end, code = self.trie, start, None
+            for index in range(start, len(tokens)):
+                node = node.get(tokens[index])
+                if node is None:
+                    break
+                if self._CODE in node:
+                    end, code = index + 1, node[self._CODE]
+            if end == start or code is None:
+                return False, None
+            codes.add(code)
+            start = end
+        return (True, codes.pop()) if len(codes) == 1 else (False, None)
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Map a name to its code, or None if it is unknown or ambiguous"""
+        tokens = self.tokens(name)
+        if not tokens:
+            return None
+        found, code = self._match(tokens)
+        if found:
+            return code
+
+        # Correct misspelled words to the closest dictionary word and drop misspelled
+        # qualifiers; abbreviations and words that tell analytes apart stay as written
+        abbreviations = {word.lower().replace("ё", "е") for word in _ABBREVIATION.findall(name)}
+        corrected = []
+        for token in tokens:
+            if token in self.vocabulary or token in abbreviations or token in self.qualifiers:
+                corrected.append(token)
+                continue
+            word = self._correct(token)
+            if word is None:
+                corrected.append(token)
+            elif word != self._CODE:
+                corrected.append(word)
+        if corrected != tokens and corrected:
+            found, code = self._match(corrected)
+            if found:
+                return code
+
+        # Closest whole synonym of a one-word name: words merged ("ношпа") or a
+        # misspelling as close to two spellings of one name ("hamoglobin").
+        # Longer names differ by a word that matters ("непрямой", "ЛПОНП")
+        if len(tokens) > 1 or tokens[0] in abbreviations:
+            return None
+        return self.names.nearest(tokens[0])
+
+
+class NameNormalizer:
+    """
+    Map extracted lab test and medication names to canonical codes
+
+    "Гемоглобин", "HGB", "Hb" and "Гемоглобин (HGB)" all become "HGB";
+    "Нурофен 200 мг" and "Ибупрофен" become "ibuprofen". Names are reduced
+    to their words without qualifiers ("в крови", doses, dosage forms) and
+    looked up in a word trie of the synonym dictionary, either whole or as
+    a sequence of synonyms that agree. Misspelled words are corrected to the
+    closest dictionary word found in a BK-tree under edit distance, unless
+    the typo is ambiguous or the word is an abbreviation or a qualifier
+    that tells analytes apart ("прямой", "ЛПОНП"). Results are cached, so
+    repeated names cost a dictionary lookup.
+    """
+
+    CACHE_SIZE = 100_000
+
+    def __init__(self, dictionary: Dict[str, Dict[str, List[str]]]):
+        """
+        Initialize normalizer
+
+        Args:
+            dictionary: {"lab_tests": {code: [names]}, "medications": {code: [names]}}
+        """
+        self._indexes: Dict[str, _NameIndex] = {}
+        for kind in (LAB_TESTS, MEDICATIONS):
+            index = _NameIndex(_NOISE_WORDS[kind], _QUALIFIERS[kind])
+            for code, names in dictionary.get(kind, {}).items():
+                # The code itself is a synonym too ("HGB", "ibuprofen")
+                for name in (code, *names):
+                    index.add(name, code)
+            index.finish()
+            self._indexes[kind] = index
+        self._cache: Dict[Tuple[str, str], Optional[str]] = {}
+
+    @classmethod
+    def load(cls, extra_path: Optional[str] = None) -> "NameNormalizer":
+        """
+        Build a normalizer from the bundled dictionary and an optional extra one
+
+        Codes in the extra dictionary get its synonyms added; new codes are added.
+
+        Args:
+            extra_path: JSON file in the bundled dictionary's format
+
+        Returns:
+            Normalizer
+        """
+        with open(DEFAULT_DICTIONARY_PATH, encoding="utf-8") as handle:
+            dictionary = json.load(handle)
+        if extra_path:
+            with open(extra_path, encoding="utf-8") as handle:
+                extra = json.load(handle)
+            for kind, codes in extra.items():
+                for code, names in codes.items():
+                    dictionary.setdefault(kind, {}).setdefault(code, []).extend(names)
+        normalizer = cls(dictionary)
+        logger.info(
+            "Loaded name dictionary: %s lab test and %s medication names",
+            normalizer._indexes[LAB_TESTS].count,
+            normalizer._indexes[MEDICATIONS].count
+        )
+        return normalizer
+
+    def lookup(self, kind: str, name: str) -> Optional[str]:
+        """
+        Get the canonical code of a name
+
+        Args:
+            kind: "lab_tests" or "medications"
+            name: Name as extracted
+
+        Returns:
+            Code, or None if the name is unknown or ambiguous
+        """
+        key = (kind, name)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        code = self._indexes[kind].lookup(name)
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = code
+        return code
+
+    def annotate(self, document_type: DocumentType, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fill test_code of lab results and code of medications in parsed data
+
+        Args:
+            document_type: Document type
+            data: Parsed document data (updated in place)
+
+        Returns:
+            The same data
+        """
+        if document_type == DocumentType.LAB_REPORT:
+            items, kind, name_key, code_key = data.get("test_results"), LAB_TESTS, "test_name", "test_code"
+        elif document_type in (DocumentType.PRESCRIPTION, DocumentType.DOCTOR_VISIT):
+            items, kind, name_key, code_key = data.get("medications"), MEDICATIONS, "name", "code"
+        else:
+            return data
+
+        for item in items or []:
+            if isinstance(item, dict) and isinstance(item.get(name_key), str):
+                item[code_key] = self.lookup(kind, item[name_key])
+        return data
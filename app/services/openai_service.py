@@ -1,28 +1,121 @@
 """OpenAI API service"""
 
+import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional
-from openai import OpenAI
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional, Tuple
 from app.config import settings
+from app.services.adaptive_limiter import AdaptiveLimiter
+from app.services.metrics import metrics
+from app.services import tracing
+from app.utils.logging_utils import capped
+from app.services.rate_limiter import (
+    TokenBudgetScheduler,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BATCH,
+    estimate_base64_image_tokens,
+    estimate_text_tokens,
+)
 
 logger = logging.getLogger(__name__)
 
+# Per-task token accounting, see track_usage()
+_usage_sinks: ContextVar[Tuple[Dict[str, int], ...]] = ContextVar("openai_usage_sinks", default=())
+
+
+@contextmanager
+def track_usage() -> Iterator[Dict[str, int]]:
+    """
+    Collect token usage of all model calls made in the current task
+
+    Tasks created inside the block inherit the collector, so usage of work
+    that is later cancelled or discarded can still be accounted for. Blocks
+    can be nested; calls are counted in every enclosing collector.
+
+    Yields:
+        Dictionary with calls_sent, calls_completed, prompt_tokens_estimated,
+        prompt_tokens, completion_tokens and total_tokens
+    """
+    usage = {
+        "calls_sent": 0,
+        "calls_completed": 0,
+        "prompt_tokens_estimated": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+    }
+    token = _usage_sinks.set(_usage_sinks.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _usage_sinks.reset(token)
+
 
 class OpenAIService:
     """Service for interacting with OpenAI API"""
     
-    def __init__(self):
-        """Initialize OpenAI client"""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+    CONTINUATION_PROMPT = (
+        "Ответ был обрезан. Продолжите JSON ровно с того символа, на котором он оборвался, "
+        "без повторов, без пояснений и без markdown."
+    )
+    
+    def __init__(self, shared_store=None):
+        """
+        Initialize OpenAI client
+        
+        Args:
+            shared_store: Optional SharedStore so rate-limit budgets are shared by all workers
+        """
+        # The SDK is slow to import, so it is loaded with the first service
+        from openai import AsyncOpenAI
+        
+        if not settings.openai_api_key:
+            raise ValueError("OPENAI_API_KEY is not set")
+        
+        # Retries go through _create_completion so 429s also pause the scheduler
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
         self.model = settings.openai_model
+        self.scheduler = TokenBudgetScheduler(
+            requests_per_minute=settings.openai_requests_per_minute,
+            tokens_per_minute=settings.openai_tokens_per_minute,
+            shared_store=shared_store
+        )
+        # Separate upstream concurrency pools per priority lane, each adapting
+        # its limit to the model API's latency and 429s
+        self._model_slots = {
+            priority: self._model_limiter(priority, max_concurrency)
+            for priority, max_concurrency in (
+                (PRIORITY_INTERACTIVE, settings.interactive_model_concurrency),
+                (PRIORITY_BATCH, settings.batch_model_concurrency),
+            )
+        }
+    
+    @staticmethod
+    def _model_limiter(priority: str, max_concurrency: int) -> AdaptiveLimiter:
+        """Concurrency limiter of a lane (fixed at max_concurrency if adaptation is off)"""
+        if not settings.adaptive_model_concurrency:
+            return AdaptiveLimiter(
+                priority, initial_limit=max_concurrency, min_limit=max_concurrency, max_limit=max_concurrency
+            )
+        return AdaptiveLimiter(
+            priority,
+            initial_limit=settings.model_concurrency_initial,
+            min_limit=min(settings.model_concurrency_min, max_concurrency),
+            max_limit=max_concurrency,
+            latency_tolerance=settings.model_latency_tolerance
+        )
     
     async def analyze_image_with_prompt(
         self,
         base64_image: str,
         prompt: str,
         response_format: Optional[Dict[str, Any]] = None,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE
     ) -> str:
         """
         Analyze image with a custom prompt
@@ -32,10 +125,51 @@ class OpenAIService:
             prompt: Prompt for analysis
             response_format: Optional JSON schema for structured output
             max_tokens: Maximum tokens in response
+            tenant: Tenant or API key the call is made for (fair queuing)
+            priority: "interactive" or "batch"
             
         Returns:
             Response text from OpenAI
         """
+        text, _, _ = await self._analyze_with_continuation(
+            base64_image,
+            prompt,
+            response_format=response_format,
+            max_tokens=max_tokens,
+            tenant=tenant,
+            priority=priority
+        )
+        return text
+    
+    async def _analyze_with_continuation(
+        self,
+        base64_image: str,
+        prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+        max_tokens: int = 2000,
+        max_continuations: int = 0,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> Tuple[str, str, int]:
+        """
+        Analyze image, continuing generation if the output hits max_tokens
+        
+        Instead of re-running a truncated call, the partial answer is sent back
+        as an assistant message and the model is asked to continue it. Only
+        the prompt is paid for again; already generated output is kept.
+        
+        Args:
+            base64_image: Base64 encoded image
+            prompt: Prompt for analysis
+            response_format: Optional JSON schema for structured output
+            max_tokens: Maximum tokens in the first response
+            max_continuations: How many continuation calls are allowed
+            tenant: Tenant or API key the call is made for
+            priority: "interactive" or "batch"
+            
+        Returns:
+            Tuple of (response text, last finish_reason, continuations used)
+        """
         try:
             messages = [
                 {
@@ -66,24 +200,176 @@ class OpenAIService:
             if response_format:
                 api_params["response_format"] = response_format
             
-            # Make API call
-            response = self.client.chat.completions.create(**api_params)
+            estimated_prompt_tokens = estimate_base64_image_tokens(base64_image) + estimate_text_tokens(prompt)
             
-            result = response.choices[0].message.content
-            logger.info(f"OpenAI API call successful. Tokens used: {response.usage.total_tokens}")
+            response = await self._create_completion(api_params, estimated_prompt_tokens, tenant, priority)
+            result = response.choices[0].message.content or ""
+            finish_reason = response.choices[0].finish_reason
             
-            return result
+            continuations = 0
+            while finish_reason == "length" and continuations < max_continuations:
+                continuations += 1
+                logger.warning("Response truncated at %s tokens, continuing (%s/%s)", api_params['max_tokens'], continuations, max_continuations)
+                api_params["messages"] = messages + [
+                    {"role": "assistant", "content": result},
+                    {"role": "user", "content": self.CONTINUATION_PROMPT},
+                ]
+                response = await self._create_completion(
+                    api_params,
+                    estimated_prompt_tokens + estimate_text_tokens(result),
+                    tenant,
+                    priority
+                )
+                result = self._join_continuation(result, response.choices[0].message.content or "")
+                finish_reason = response.choices[0].finish_reason
+            
+            return result, finish_reason, continuations
             
         except Exception as e:
-            logger.error(f"Error calling OpenAI API: {str(e)}")
+            logger.error("Error calling OpenAI API: %s", e)
             raise Exception(f"OpenAI API error: {str(e)}")
     
-    async def classify_document(self, base64_image: str) -> Dict[str, Any]:
+    @tracing.traced("openai.chat_completion")
+    async def _create_completion(
+        self,
+        api_params: Dict[str, Any],
+        estimated_prompt_tokens: int,
+        tenant: str,
+        priority: str
+    ):
+        """
+        Make one chat completion call within the rate-limit budget
+        
+        Args:
+            api_params: Parameters for chat.completions.create
+            estimated_prompt_tokens: Estimated prompt tokens (image + text)
+            tenant: Tenant or API key the call is made for
+            priority: "interactive" or "batch"
+            
+        Returns:
+            Chat completion response
+        """
+        from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+        
+        # Rate limits count max_tokens towards the token budget
+        estimated_tokens = estimated_prompt_tokens + api_params["max_tokens"]
+        usage_sinks = _usage_sinks.get()
+        tracing.set_attributes({
+            "llm.model": api_params["model"],
+            "llm.max_tokens": api_params["max_tokens"],
+            "llm.prompt_tokens_estimated": estimated_prompt_tokens,
+            "llm.priority": priority,
+        })
+        
+        # Make API call, waiting for budget instead of failing on rate limits
+        model_slot = self._model_slots.get(priority, self._model_slots[PRIORITY_BATCH])
+        attempt = 0
+        while True:
+            async with model_slot.acquire() as permit:
+                await self.scheduler.acquire(estimated_tokens, tenant=tenant, priority=priority)
+                for usage_sink in usage_sinks:
+                    usage_sink["calls_sent"] += 1
+                    usage_sink["prompt_tokens_estimated"] += estimated_prompt_tokens
+                try:
+                    permit.sent()
+                    response = await self.client.chat.completions.create(**api_params)
+                    # Output length dominates latency; compare time per ~100 output tokens
+                    permit.succeeded(
+                        (time.monotonic() - permit.started) / (1 + response.usage.completion_tokens / 100)
+                    )
+                    break
+                except RateLimitError as e:
+                    permit.overloaded()
+                    metrics.incr("openai.rate_limited")
+                    self.scheduler.record_usage(0, estimated_tokens)
+                    attempt += 1
+                    if attempt > settings.openai_max_retries:
+                        raise
+                    delay = self._retry_after(e, attempt)
+                    self.scheduler.pause(delay)
+                    reason = "rate_limited"
+                except (APIConnectionError, InternalServerError) as e:
+                    # Timeouts and 5xx are the same overload signal as a 429,
+                    # but only this call is retried; the budget is not paused
+                    if isinstance(e, (APITimeoutError, InternalServerError)):
+                        permit.overloaded()
+                    metrics.incr("openai.transient_errors")
+                    self.scheduler.record_usage(0, estimated_tokens)
+                    attempt += 1
+                    if attempt > settings.openai_max_retries:
+                        raise
+                    delay = self._retry_after(e, attempt)
+                    reason = "transient_error"
+                except Exception:
+                    # A rejected call uses none of the tokens reserved for it
+                    self.scheduler.record_usage(0, estimated_tokens)
+                    raise
+                tracing.add_event(reason, {"attempt": attempt, "retry_in_seconds": delay})
+            logger.warning("OpenAI call failed (%s, attempt %s), retrying in %.1fs", reason, attempt, delay)
+            await asyncio.sleep(delay)
+        
+        self.scheduler.record_usage(response.usage.total_tokens, estimated_tokens)
+        metrics.incr("openai.calls")
+        metrics.incr("openai.tokens.prompt", response.usage.prompt_tokens)
+        metrics.incr("openai.tokens.completion", response.usage.completion_tokens)
+        for usage_sink in usage_sinks:
+            usage_sink["calls_completed"] += 1
+            usage_sink["prompt_tokens"] += response.usage.prompt_tokens
+            usage_sink["completion_tokens"] += response.usage.completion_tokens
+            usage_sink["total_tokens"] += response.usage.total_tokens
+        tracing.set_attributes({
+            "llm.prompt_tokens": response.usage.prompt_tokens,
+            "llm.completion_tokens": response.usage.completion_tokens,
+            "llm.retries": attempt,
+            "llm.finish_reason": response.choices[0].finish_reason,
+        })
+        
+        logger.info("OpenAI API call successful. Tokens used: %s", response.usage.total_tokens)
+        return response
+    
+    @staticmethod
+    def _join_continuation(head: str, tail: str, max_overlap: int = 200) -> str:
+        """
+        Append a continuation to a truncated response
+        
+        Drops code fences the model may open again and any text it repeated
+        from the end of the truncated part.
+        """
+        tail = tail.lstrip()
+        if tail.startswith("```json"):
+            tail = tail[7:].lstrip()
+        elif tail.startswith("```"):
+            tail = tail[3:].lstrip()
+        
+        for size in range(min(len(head), len(tail), max_overlap), 7, -1):
+            if head.endswith(tail[:size]):
+                return head + tail[size:]
+        return head + tail
+    
+    @staticmethod
+    def _retry_after(error: Exception, attempt: int) -> float:
+        """Get seconds to wait before a retry (Retry-After header or exponential backoff)"""
+        try:
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after is not None:
+                return max(0.1, float(retry_after))
+        except (AttributeError, ValueError):
+            pass
+        return min(60.0, 2.0 ** attempt)
+    
+    async def classify_document(
+        self,
+        base64_image: str,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> Dict[str, Any]:
         """
         Classify medical document type
         
         Args:
             base64_image: Base64 encoded image
+            tenant: Tenant or API key the call is made for
+            priority: "interactive" or "batch"
             
         Returns:
             Dictionary with document_type and confidence
@@ -108,7 +394,9 @@ class OpenAIService:
             response = await self.analyze_image_with_prompt(
                 base64_image=base64_image,
                 prompt=prompt,
-                max_tokens=200
+                max_tokens=200,
+                tenant=tenant,
+                priority=priority
             )
             
             # Clean the response - remove markdown code fences if present
@@ -133,22 +421,25 @@ class OpenAIService:
             return result
             
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse classification response: {str(e)}")
-            logger.error(f"Response was: {response}")
+            logger.error("Failed to parse classification response: %s", e)
+            logger.error("Response was: %s", capped(response))
             return {
                 "document_type": "unknown",
                 "confidence": 0.0,
                 "reasoning": "Failed to parse response"
             }
         except Exception as e:
-            logger.error(f"Error classifying document: {str(e)}")
+            logger.error("Error classifying document: %s", e)
             raise
     
     async def extract_structured_data(
         self,
         base64_image: str,
         document_type: str,
-        schema_description: str
+        schema_description: str,
+        max_tokens: int = 2000,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE
     ) -> Dict[str, Any]:
         """
         Extract structured data from document based on its type
@@ -157,6 +448,9 @@ class OpenAIService:
             base64_image: Base64 encoded image
             document_type: Type of document
             schema_description: Description of expected schema
+            max_tokens: Output token budget
+            tenant: Tenant or API key the call is made for
+            priority: "interactive" or "batch"
             
         Returns:
             Extracted structured data
@@ -170,11 +464,21 @@ class OpenAIService:
 Формат ответа: Чистый JSON объект без дополнительного текста или объяснений. Названия полей (ключи) должны оставаться на английском, а значения - на русском."""
         
         try:
-            response = await self.analyze_image_with_prompt(
-                base64_image=base64_image,
-                prompt=prompt,
-                max_tokens=2000
-            )
+            with track_usage() as usage:
+                response, finish_reason, continuations = await self._analyze_with_continuation(
+                    base64_image=base64_image,
+                    prompt=prompt,
+                    max_tokens=max_tokens,
+                    max_continuations=settings.extraction_max_continuations,
+                    tenant=tenant,
+                    priority=priority
+                )
+            path = "continued" if continuations else "single"
+            metrics.incr(f"extraction.{path}")
+            metrics.incr(f"extraction.{path}.tokens.prompt", usage["prompt_tokens"])
+            metrics.incr(f"extraction.{path}.tokens.completion", usage["completion_tokens"])
+            if finish_reason == "length":
+                metrics.incr("extraction.truncated")
             
             # Clean the response - remove markdown code fences if present
             cleaned_response = response.strip()
@@ -194,11 +498,21 @@ class OpenAIService:
             return result
             
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse extraction response: {str(e)}")
-            logger.error(f"Response was: {response}")
-            logger.error(f"Cleaned response was: {cleaned_response}")
+            metrics.incr(f"extraction.{path}.failed")
+            logger.error("Failed to parse extraction response: %s", e)
+            logger.error("Response was: %s", capped(response))
+            logger.error("Cleaned response was: %s", capped(cleaned_response))
             raise ValueError(f"Failed to parse structured data: {str(e)}")
         except Exception as e:
-            logger.error(f"Error extracting structured data: {str(e)}")
+            logger.error("Error extracting structured data: %s", e)
             raise
-
+        finally:
+            self._update_extraction_failure_rates()
+    
+    @staticmethod
+    def _update_extraction_failure_rates() -> None:
+        """Refresh the extraction.<path>.failure_rate gauges"""
+        for path in ("single", "continued"):
+            total = metrics.get(f"extraction.{path}")
+            if total:
+                metrics.set_gauge(f"extraction.{path}.failure_rate", metrics.get(f"extraction.{path}.failed") / total)
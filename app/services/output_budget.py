@@ -0,0 +1,101 @@
+"""Output token budgeting for extraction calls"""
+
+import threading
+from typing import Dict
+
+from app.schemas.base import DocumentType
+from app.services.metrics import metrics
+
+
+class OutputTokenEstimator:
+    """
+    Predict how many output tokens an extraction will need
+
+    The estimate is tokens-per-KB of the page image (a dense lab table
+    compresses worse than a short prescription) times the image size,
+    learned per document type with an exponentially weighted average of
+    observed completion tokens. Until enough documents are seen the
+    per-type priors dominate. A headroom factor keeps most responses from
+    being cut off; the rest are finished with continuation calls.
+    """
+
+    # Typical completion tokens of a full extraction per document type
+    PRIOR_TOKENS = {
+        DocumentType.PRESCRIPTION: 700,
+        DocumentType.LAB_REPORT: 1800,
+        DocumentType.DOCTOR_VISIT: 1200,
+        DocumentType.DIAGNOSTIC_RESULTS: 1000,
+    }
+    DEFAULT_PRIOR_TOKENS = 1200
+
+    # Size of a typical page after encode_image_to_base64 (2048px JPEG, q85)
+    REFERENCE_IMAGE_KB = 300.0
+
+    def __init__(
+        self,
+        min_tokens: int = 300,
+        max_tokens: int = 4096,
+        headroom: float = 1.3,
+        smoothing: float = 0.2
+    ):
+        """
+        Initialize estimator
+
+        Args:
+            min_tokens: Lower bound of a budget
+            max_tokens: Upper bound of a budget
+            headroom: Multiplier applied to the expected output size
+            smoothing: Weight of a new observation in the running average
+        """
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._tokens_per_kb: Dict[DocumentType, float] = {}
+
+    def _rate(self, document_type: DocumentType) -> float:
+        """Current tokens-per-KB estimate for a document type"""
+        rate = self._tokens_per_kb.get(document_type)
+        if rate is None:
+            prior = self.PRIOR_TOKENS.get(document_type, self.DEFAULT_PRIOR_TOKENS)
+            rate = prior / self.REFERENCE_IMAGE_KB
+        return rate
+
+    def estimate(self, document_type: DocumentType, image_bytes: int, fraction: float = 1.0) -> int:
+        """
+        Get max_tokens for an extraction
+
+        Args:
+            document_type: Document type
+            image_bytes: Size of the encoded page image
+            fraction: Share of the full output requested (field subsets)
+
+        Returns:
+            Output token budget
+        """
+        # Very small or very large images say little about the amount of text
+        image_kb = min(max(image_bytes / 1024, self.REFERENCE_IMAGE_KB / 4), self.REFERENCE_IMAGE_KB * 3)
+        with self._lock:
+            expected = self._rate(document_type) * image_kb * fraction
+        budget = int(expected * self.headroom)
+        return max(self.min_tokens, min(self.max_tokens, budget))
+
+    def observe(self, document_type: DocumentType, image_bytes: int, completion_tokens: int, fraction: float = 1.0) -> None:
+        """
+        Learn from a finished extraction
+
+        Args:
+            document_type: Document type
+            image_bytes: Size of the encoded page image
+            completion_tokens: Output tokens the extraction used (all continuations)
+            fraction: Share of the full output that was requested
+        """
+        if completion_tokens <= 0 or fraction <= 0:
+            return
+        image_kb = min(max(image_bytes / 1024, self.REFERENCE_IMAGE_KB / 4), self.REFERENCE_IMAGE_KB * 3)
+        observed = completion_tokens / fraction / image_kb
+        with self._lock:
+            rate = self._rate(document_type)
+            self._tokens_per_kb[document_type] = rate + self.smoothing * (observed - rate)
+        metrics.observe(f"extraction.output_tokens.{document_type.value}", completion_tokens)
@@ -0,0 +1,162 @@
+"""Priority lanes separating interactive and bulk traffic"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from app.services.profiler import in_active_profile
+from app.services.rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITIES
+
+logger = logging.getLogger(__name__)
+
+
+class LaneFullError(Exception):
+    """Raised when a lane's wait queue is already at its limit"""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"The {lane} lane is at capacity")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    One traffic lane with its own concurrency pool, queue depth and deadline
+
+    Each lane also owns a thread pool for CPU-bound image preparation, so a
+    backfill decoding large PDFs can't delay interactive uploads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        deadline_seconds: float,
+        image_workers: int
+    ):
+        """
+        Initialize lane
+
+        Args:
+            name: Lane name ("interactive" or "batch")
+            max_concurrency: Requests processed at the same time
+            max_queue: Requests allowed to wait for a slot (beyond that: rejected)
+            deadline_seconds: Total time budget per request, including queueing
+            image_workers: Threads for image decoding and encoding
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline_seconds = deadline_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=image_workers,
+            thread_name_prefix=f"image-{name}"
+        )
+        self.waiting = 0
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None):
+        """
+        Hold one of the lane's concurrency slots
+
+        Args:
+            timeout: Longest wait for a slot in seconds, usually what is left of the deadline
+
+        Raises:
+            LaneFullError: If the wait queue is full
+            asyncio.TimeoutError: If no slot was free within timeout
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise LaneFullError(self.name, retry_after=max(1, int(self.deadline_seconds / 10)))
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def remaining(self, start_time: float) -> float:
+        """Get seconds left before the request's deadline"""
+        return max(0.0, self.deadline_seconds - (time.time() - start_time))
+
+    async def run_in_executor(self, func: Callable[..., Any], *args) -> Any:
+        """Run a CPU-bound function on the lane's thread pool, in the caller's context (trace spans, profile)"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, context.run, in_active_profile(func), *args)
+
+    def shutdown(self) -> None:
+        """Stop the lane's thread pool"""
+        self._executor.shutdown(wait=False)
+
+
+class PriorityLanes:
+    """Registry of traffic lanes keyed by priority"""
+
+    def __init__(self, settings, batch_tenants: Optional[str] = None):
+        """
+        Initialize lanes from settings
+
+        Args:
+            settings: Application settings
+            batch_tenants: Comma-separated tenants always routed to the batch lane
+        """
+        self.lanes: Dict[str, Lane] = {
+            PRIORITY_INTERACTIVE: Lane(
+                PRIORITY_INTERACTIVE,
+                max_concurrency=settings.interactive_max_concurrency,
+                max_queue=settings.interactive_max_queue,
+                deadline_seconds=settings.interactive_deadline_seconds,
+                image_workers=settings.interactive_image_workers
+            ),
+            PRIORITY_BATCH: Lane(
+                PRIORITY_BATCH,
+                max_concurrency=settings.batch_max_concurrency,
+                max_queue=settings.batch_max_queue,
+                deadline_seconds=settings.batch_deadline_seconds,
+                image_workers=settings.batch_image_workers
+            ),
+        }
+        batch_tenants = batch_tenants if batch_tenants is not None else settings.batch_tenants
+        self.batch_tenants = {t.strip() for t in batch_tenants.split(",") if t.strip()}
+
+    def resolve(self, priority: Optional[str], tenant: str) -> str:
+        """
+        Resolve the effective priority of a request
+
+        Tenants configured as batch can't opt into the interactive lane.
+
+        Args:
+            priority: Requested priority (X-Priority header), if any
+            tenant: Tenant identifier
+
+        Returns:
+            "interactive" or "batch"
+        """
+        if tenant in self.batch_tenants:
+            return PRIORITY_BATCH
+        priority = (priority or PRIORITY_INTERACTIVE).strip().lower()
+        return priority if priority in PRIORITIES else PRIORITY_INTERACTIVE
+
+    def get(self, priority: str) -> Lane:
+        """Get the lane for a priority"""
+        return self.lanes.get(priority, self.lanes[PRIORITY_BATCH])
+
+    def shutdown(self) -> None:
+        """Stop all lane thread pools"""
+        for lane in self.lanes.values():
+            lane.shutdown()
@@ -0,0 +1,268 @@
+"""On-demand profiling of single requests"""
+
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Profiler engines and the extension of the files they write
+ENGINES = {
+    "cprofile": ".pstats",
+    "pyinstrument": ".html",
+}
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+# Profile of the request being handled, if it is profiled
+_active: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Profile of one request: its event loop time plus its thread pool calls
+
+    pyinstrument, and cProfile before Python 3.12, only see the thread they
+    are started on, so CPU work handed to the lane thread pools is profiled
+    call by call on the worker thread and merged into the result. From 3.12
+    cProfile hooks sys.monitoring, which sees every thread and allows one
+    profiler at a time, so worker calls simply run under the request's one.
+    """
+
+    def __init__(self, engine: str, interval: float, label: str):
+        self.engine = engine
+        self.interval = interval
+        self.label = label
+        self.started = time.time()
+        self.duration = 0.0
+        self._thread_results: List[Any] = []
+        self._lock = threading.Lock()
+        self._profiler = self._new_profiler(async_mode="enabled")
+
+    def _new_profiler(self, async_mode: str = "disabled"):
+        if self.engine == "pyinstrument":
+            from pyinstrument import Profiler
+
+            return Profiler(interval=self.interval, async_mode=async_mode)
+        import cProfile
+
+        return cProfile.Profile()
+
+    def start(self) -> None:
+        """Start profiling the current thread"""
+        if self.engine == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        """Stop profiling the current thread"""
+        if self.engine == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def run_call(self, func: Callable[..., Any], *args) -> Any:
+        """Run a function on a worker thread under its own profiler"""
+        profiler = self._new_profiler()
+        if self.engine == "pyinstrument":
+            profiler.start()
+            try:
+                return func(*args)
+            finally:
+                session = profiler.stop()
+                with self._lock:
+                    self._thread_results.append(session)
+        if _cprofile_active():
+            return func(*args)
+        try:
+            return profiler.runcall(func, *args)
+        finally:
+            with self._lock:
+                self._thread_results.append(profiler)
+
+    def write(self, path: Path) -> None:
+        """Write the merged profile: pstats for cProfile, an HTML flame graph for pyinstrument"""
+        with self._lock:
+            thread_results = list(self._thread_results)
+        if self.engine == "pyinstrument":
+            from pyinstrument.renderers import HTMLRenderer
+            from pyinstrument.session import Session
+
+            session = self._profiler.last_session
+            for thread_session in thread_results:
+                session = Session.combine(session, thread_session)
+            path.write_text(HTMLRenderer().render(session), encoding="utf-8")
+            return
+        import pstats
+
+        stats = pstats.Stats(self._profiler)
+        for thread_profiler in thread_results:
+            stats.add(thread_profiler)
+        stats.dump_stats(str(path))
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and keeps their profiles on disk
+
+    A request is profiled when it carries the admin token or is picked by
+    the sampling rate. One request per worker is profiled at a time: the
+    profilers hook the whole event loop thread, so concurrent profiles
+    would see each other's work; other picks are skipped. Only the newest
+    max_profiles files are kept.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        token: str = "",
+        sample_rate: float = 0.0,
+        engine: str = "cprofile",
+        interval: float = 0.001,
+        max_profiles: int = 50
+    ):
+        """
+        Initialize profiler
+
+        Args:
+            directory: Directory the profiles are written to
+            token: Admin token that requests a profile (empty: no on-demand profiles)
+            sample_rate: Share of requests profiled without the token (0..1)
+            engine: "cprofile" or "pyinstrument"
+            interval: Sampling interval of pyinstrument in seconds
+            max_profiles: Profiles kept in the directory
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown profiler engine: {engine}")
+        if engine == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                logger.warning("pyinstrument is not installed, profiling with cProfile")
+                engine = "cprofile"
+        self.directory = Path(directory)
+        self.token = token
+        self.sample_rate = sample_rate
+        self.engine = engine
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._busy = False
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Check an admin token (constant time)"""
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def begin(self, token: Optional[str], label: str) -> Optional[RequestProfile]:
+        """
+        Start profiling the current request if it is picked
+
+        Args:
+            token: Admin token sent with the request
+            label: Name of the request in the profile's file name
+
+        Returns:
+            Started profile, or None if the request isn't profiled
+        """
+        if not self.authorized(token) and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return None
+        if self._busy:
+            metrics.incr("profiling.skipped")
+            return None
+        profile = RequestProfile(self.engine, self.interval, label)
+        try:
+            profile.start()
+        except ValueError as e:
+            # Python 3.12+: another profiler (e.g. a debugger) holds sys.monitoring
+            logger.warning("Not profiling %s: %s", label, e)
+            metrics.incr("profiling.skipped")
+            return None
+        self._busy = True
+        _active.set(profile)
+        return profile
+
+    def end(self, profile: RequestProfile) -> None:
+        """Stop a profile (on the thread that started it)"""
+        profile.stop()
+        profile.duration = time.time() - profile.started
+        _active.set(None)
+
+    def save(self, profile: RequestProfile) -> Optional[str]:
+        """
+        Write a stopped profile to the directory (slow; meant for a worker thread)
+
+        Returns:
+            File name of the profile, or None if it couldn't be written
+        """
+        try:
+            duration_ms = int(profile.duration * 1000)
+            name = (
+                f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(profile.started))}-{os.getpid()}-"
+                f"{duration_ms}ms-{_UNSAFE.sub('_', profile.label)[:60]}{ENGINES[profile.engine]}"
+            )
+            self.directory.mkdir(parents=True, exist_ok=True)
+            profile.write(self.directory / name)
+            self._prune()
+            metrics.incr("profiling.profiles")
+            logger.info("Wrote profile %s", name)
+            return name
+        except Exception as e:
+            logger.error("Failed to write profile: %s", e)
+            return None
+        finally:
+            self._busy = False
+
+    def _prune(self) -> None:
+        """Delete the oldest profiles beyond max_profiles"""
+        files = sorted(self._files(), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in files[self.max_profiles:]:
+            path.unlink(missing_ok=True)
+
+    def _files(self) -> List[Path]:
+        if not self.directory.is_dir():
+            return []
+        return [path for path in self.directory.iterdir() if path.suffix in ENGINES.values() and path.is_file()]
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Stored profiles, newest first"""
+        stats = sorted(((path, path.stat()) for path in self._files()), key=lambda item: item[1].st_mtime, reverse=True)
+        return [
+            {
+                "name": path.name,
+                "format": "pstats" if path.suffix == ".pstats" else "html",
+                "size_bytes": stat.st_size,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(stat.st_mtime)),
+            }
+            for path, stat in stats
+        ]
+
+    def path_of(self, name: str) -> Optional[Path]:
+        """Path of a stored profile, or None for unknown names"""
+        if name != Path(name).name:
+            return None
+        path = self.directory / name
+        return path if path.suffix in ENGINES.values() and path.is_file() else None
+
+
+def _cprofile_active() -> bool:
+    """Check whether a cProfile is enabled process-wide (Python 3.12+)"""
+    monitoring = getattr(sys, "monitoring", None)
+    return monitoring is not None and monitoring.get_tool(monitoring.PROFILER_ID) is not None
+
+
+def in_active_profile(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a function about to run on a thread pool so it joins the current request's profile"""
+    profile = _active.get()
+    if profile is None:
+        return func
+    return lambda *args: profile.run_call(func, *args)
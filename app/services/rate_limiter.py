@@ -0,0 +1,395 @@
+"""Client-side request and token budget scheduling for the model API"""
+
+import asyncio
+import base64
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from io import BytesIO
+from typing import Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Request priorities, highest first
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    Estimate prompt tokens for an image sent with detail=high/auto
+
+    Follows the published vision pricing rule: fit into 2048x2048, scale the
+    shortest side down to 768, then charge 170 tokens per 512px tile plus 85.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        Estimated prompt tokens for the image
+    """
+    if width <= 0 or height <= 0:
+        return 85
+
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def estimate_base64_image_tokens(base64_image: str) -> int:
+    """
+    Estimate prompt tokens for a base64 encoded image
+
+    Args:
+        base64_image: Base64 encoded image
+
+    Returns:
+        Estimated prompt tokens (worst case if the image can't be read)
+    """
+    from PIL import Image
+    
+    try:
+        with Image.open(BytesIO(base64.b64decode(base64_image))) as image:
+            return estimate_image_tokens(*image.size)
+    except Exception:
+        # 2048x2048 worst case
+        return estimate_image_tokens(2048, 2048)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Estimate tokens for prompt text (Cyrillic averages ~2.5 chars per token)"""
+    return max(1, int(len(text) / 2.5))
+
+
+class TokenBudgetScheduler:
+    """
+    Requests-per-minute and tokens-per-minute budget scheduler
+
+    Callers reserve budget with acquire() before each model call and report
+    the real usage with record_usage() afterwards. When the budget is spent,
+    callers wait in a queue instead of hitting upstream 429s:
+
+    - interactive requests are always served before batch requests
+    - within a priority, tenants are served round-robin so one backfill
+      can't starve everyone else
+    - within a tenant, requests are served in arrival order
+
+    When a SharedStore is given, usage is counted in fixed one-minute windows
+    shared by all worker processes; otherwise a per-process sliding window
+    is used. Shared counters live in SQLite, so they are never touched on
+    the event loop: local usage is added up and exchanged with the store in
+    the default executor, at most one exchange at a time, and grants wait
+    for a fresh exchange once the last one is SYNC_INTERVAL_SECONDS old.
+    """
+
+    WINDOW_SECONDS = 60
+    SYNC_INTERVAL_SECONDS = 1.0
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        shared_store=None,
+        counter_prefix: str = "openai"
+    ):
+        """
+        Initialize scheduler
+
+        Args:
+            requests_per_minute: Request budget per minute (0 = unlimited)
+            tokens_per_minute: Token budget per minute (0 = unlimited)
+            shared_store: Optional SharedStore for cross-worker counters
+            counter_prefix: Prefix for shared counter names
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.shared_store = shared_store
+        self._rpm_key = f"{counter_prefix}:rpm"
+        self._tpm_key = f"{counter_prefix}:tpm"
+
+        # Local sliding window of (timestamp, requests, tokens)
+        self._window: Deque[Tuple[float, int, int]] = deque()
+        self._window_requests = 0
+        self._window_tokens = 0
+
+        # Shared window: last counters read from the store, usage being
+        # written by the running exchange, and usage not yet written
+        self._shared_window = -1
+        self._shared_synced_at = 0.0
+        self._shared_requests = 0
+        self._shared_tokens = 0
+        self._flushing_requests = 0
+        self._flushing_tokens = 0
+        self._pending_requests = 0
+        self._pending_tokens = 0
+        self._sync: Optional[asyncio.Task] = None
+
+        # priority -> tenant -> queue of (estimated_tokens, future)
+        self._queues: Dict[str, "OrderedDict[str, Deque[Tuple[int, asyncio.Future]]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for budget"""
+        return sum(
+            len(waiters)
+            for tenants in self._queues.values()
+            for waiters in tenants.values()
+        )
+
+    async def acquire(
+        self,
+        estimated_tokens: int,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> None:
+        """
+        Wait until the call fits into the request and token budgets
+
+        Args:
+            estimated_tokens: Estimated prompt + completion tokens
+            tenant: Tenant or API key the call is made for
+            priority: "interactive" or "batch"
+        """
+        if priority not in self._queues:
+            priority = PRIORITY_BATCH
+
+        if self.tokens_per_minute:
+            # A single call larger than the whole budget could never run
+            estimated_tokens = min(estimated_tokens, self.tokens_per_minute)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(tenant, deque()).append((estimated_tokens, future))
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._remove_waiter(priority, tenant, future)
+            if future.done() and not future.cancelled():
+                # Budget was granted but the caller went away: give it back
+                self.record_usage(0, estimated_tokens)
+            raise
+
+    def record_usage(self, actual_tokens: int, estimated_tokens: int) -> None:
+        """
+        Correct the token budget once the real usage is known
+
+        Args:
+            actual_tokens: Tokens reported by the API
+            estimated_tokens: Tokens reserved in acquire()
+        """
+        delta = actual_tokens - estimated_tokens
+        if delta == 0:
+            return
+
+        if self.shared_store is not None:
+            self._pending_tokens += delta
+            self._request_sync()
+        else:
+            self._window.append((time.monotonic(), 0, delta))
+            self._window_tokens += delta
+
+        if delta < 0:
+            self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop granting budget for a while (e.g. after an upstream 429)
+
+        Args:
+            seconds: How long to hold all waiters
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning("Model API rate limited, pausing dispatch for %.1fs", seconds)
+        self._schedule_wakeup(seconds)
+
+    def _usage(self) -> Tuple[int, int]:
+        """Get (requests, tokens) used in the current window"""
+        if self.shared_store is not None:
+            shared_requests, shared_tokens = self._shared_requests, self._shared_tokens
+            if self._shared_window != self._current_window():
+                shared_requests = shared_tokens = 0
+            return (
+                shared_requests + self._flushing_requests + self._pending_requests,
+                shared_tokens + self._flushing_tokens + self._pending_tokens
+            )
+
+        cutoff = time.monotonic() - self.WINDOW_SECONDS
+        while self._window and self._window[0][0] <= cutoff:
+            _, requests, tokens = self._window.popleft()
+            self._window_requests -= requests
+            self._window_tokens -= tokens
+        return self._window_requests, self._window_tokens
+
+    def _consume(self, tokens: int) -> None:
+        """Record a granted call in the window"""
+        if self.shared_store is not None:
+            self._pending_requests += 1
+            self._pending_tokens += tokens
+            self._request_sync()
+        else:
+            self._window.append((time.monotonic(), 1, tokens))
+            self._window_requests += 1
+            self._window_tokens += tokens
+
+    def _current_window(self) -> int:
+        """Get the start of the current shared window (as SharedStore counts it)"""
+        return int(time.time() // self.WINDOW_SECONDS) * self.WINDOW_SECONDS
+
+    def _shared_fresh(self) -> bool:
+        """Check whether the shared counters were read recently enough to grant on"""
+        return (
+            self._shared_window == self._current_window()
+            and time.monotonic() - self._shared_synced_at < self.SYNC_INTERVAL_SECONDS
+        )
+
+    def _request_sync(self) -> None:
+        """Start an exchange with the shared store unless one is running"""
+        if self._sync is None or self._sync.done():
+            self._sync = asyncio.get_running_loop().create_task(self._sync_shared())
+
+    async def _sync_shared(self) -> None:
+        """Write local usage to the shared counters and read the totals back"""
+        self._flushing_requests, self._pending_requests = self._pending_requests, 0
+        self._flushing_tokens, self._pending_tokens = self._pending_tokens, 0
+        try:
+            window, requests_used, tokens_used = await asyncio.get_running_loop().run_in_executor(
+                None, self._exchange, self._flushing_requests, self._flushing_tokens
+            )
+        except Exception as e:
+            logger.error("Failed to sync model API budget with the shared store: %s", e)
+            self._pending_requests += self._flushing_requests
+            self._pending_tokens += self._flushing_tokens
+            self._flushing_requests = self._flushing_tokens = 0
+            await asyncio.sleep(self.SYNC_INTERVAL_SECONDS)
+            # Keep granting on the last known counters rather than stalling every waiter
+            if self._shared_window != self._current_window():
+                self._shared_window = self._current_window()
+                self._shared_requests = self._shared_tokens = 0
+            self._shared_synced_at = time.monotonic()
+        else:
+            self._shared_window = window
+            self._shared_synced_at = time.monotonic()
+            self._shared_requests, self._shared_tokens = requests_used, tokens_used
+            self._flushing_requests = self._flushing_tokens = 0
+        finally:
+            self._sync = None
+
+        if self._pending_requests or self._pending_tokens:
+            self._request_sync()
+        self._dispatch()
+
+    def _exchange(self, requests: int, tokens: int) -> Tuple[int, int, int]:
+        """Add usage to the shared counters (blocking); returns (window, requests, tokens)"""
+        window = self._current_window()
+        store = self.shared_store
+        if requests:
+            requests_used = store.incr_counter(self._rpm_key, requests, self.WINDOW_SECONDS)
+        else:
+            requests_used = store.get_counter(self._rpm_key, self.WINDOW_SECONDS)
+        if tokens:
+            tokens_used = store.incr_counter(self._tpm_key, tokens, self.WINDOW_SECONDS)
+        else:
+            tokens_used = store.get_counter(self._tpm_key, self.WINDOW_SECONDS)
+        return window, requests_used, tokens_used
+
+    def _retry_delay(self) -> float:
+        """Get seconds until budget is expected to free up"""
+        if self.shared_store is not None:
+            return self.WINDOW_SECONDS - (time.time() % self.WINDOW_SECONDS) + 0.01
+        if not self._window:
+            return 0.05
+        return max(0.05, self._window[0][0] + self.WINDOW_SECONDS - time.monotonic())
+
+    def _next_waiter(self) -> Optional[Tuple[str, str]]:
+        """Get (priority, tenant) of the next waiter to serve"""
+        for priority in PRIORITIES:
+            tenants = self._queues[priority]
+            for tenant, waiters in tenants.items():
+                if waiters:
+                    return priority, tenant
+        return None
+
+    def _dispatch(self) -> None:
+        """Grant budget to as many waiters as currently fit"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            self._schedule_wakeup(self._paused_until - now)
+            return
+
+        while True:
+            nxt = self._next_waiter()
+            if nxt is None:
+                return
+            priority, tenant = nxt
+            waiters = self._queues[priority][tenant]
+            tokens, future = waiters[0]
+
+            if future.done():
+                waiters.popleft()
+                self._rotate(priority, tenant)
+                continue
+
+            if self.shared_store is not None and not self._shared_fresh():
+                # Dispatch runs again when the exchange is done
+                self._request_sync()
+                return
+
+            requests_used, tokens_used = self._usage()
+            over_rpm = self.requests_per_minute and requests_used + 1 > self.requests_per_minute
+            over_tpm = self.tokens_per_minute and tokens_used + tokens > self.tokens_per_minute
+            if over_rpm or over_tpm:
+                self._schedule_wakeup(self._retry_delay())
+                return
+
+            waiters.popleft()
+            self._consume(tokens)
+            future.set_result(None)
+            self._rotate(priority, tenant)
+
+    def _rotate(self, priority: str, tenant: str) -> None:
+        """Move a tenant to the back of its priority queue (round-robin)"""
+        tenants = self._queues[priority]
+        if tenants[tenant]:
+            tenants.move_to_end(tenant)
+        else:
+            del tenants[tenant]
+
+    def _remove_waiter(self, priority: str, tenant: str, future: asyncio.Future) -> None:
+        """Drop a cancelled waiter from its queue"""
+        waiters = self._queues[priority].get(tenant)
+        if not waiters:
+            return
+        for item in list(waiters):
+            if item[1] is future:
+                waiters.remove(item)
+        if not waiters:
+            del self._queues[priority][tenant]
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        """Re-run dispatch after a delay (keeps only the earliest timer)"""
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._wakeup is not None and not self._wakeup.cancelled():
+            if self._wakeup.when() <= when:
+                return
+            self._wakeup.cancel()
+        self._wakeup = loop.call_at(when, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        """Timer callback"""
+        self._wakeup = None
+        self._dispatch()
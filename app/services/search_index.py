@@ -0,0 +1,311 @@
+"""Full-text search over extracted documents, backed by SQLite FTS5"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.utils.russian_stemmer import stem_tokens, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class SearchIndex:
+    """
+    Ranked full-text index of extracted document fields
+
+    SQLite's tokenizers know nothing about Russian morphology, so text is
+    stemmed in Python and FTS5 indexes the stems: "ферритина" and
+    "ферритином" are both stored as "ферритин", and a query is stemmed the
+    same way. The FTS table is contentless (only the inverted index is
+    stored); the original field text is kept in the documents table for
+    result snippets and for removing a document's old terms when it is
+    re-indexed. Like SharedStore, the file is opened lazily per process and
+    thread in WAL mode, so every worker can index and search concurrently.
+    """
+
+    # Indexed fields: FTS column -> extracted fields it is built from
+    FIELDS = {
+        "summary": ("summary",),
+        "diagnosis": ("diagnosis",),
+        "findings": ("findings_summary",),
+        "tests": ("test_results.test_name",),
+        "raw_text": ("raw_text",),
+    }
+
+    # bm25 weight per FTS column (patient name and type only filter, they don't rank)
+    WEIGHTS = {
+        "summary": 1.0, "diagnosis": 2.0, "findings": 1.0, "tests": 2.0, "raw_text": 0.5,
+        "patient": 0.0, "document_type": 0.0,
+    }
+
+    # Matches ranked per query: scoring costs ~2us per match, so a term found in
+    # most documents is ranked among its most recently indexed matches only
+    RANKED_CANDIDATES = 5000
+
+    # Fields tried in order for the document date
+    DATE_FIELDS = ("report_date", "study_date", "prescription_date", "visit_date", "collection_date")
+
+    SNIPPET_CHARS = 160
+
+    SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    document_id TEXT NOT NULL UNIQUE,
+    document_type TEXT NOT NULL,
+    patient_name TEXT,
+    document_date TEXT,
+    filename TEXT,
+    indexed_at REAL NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    summary, diagnosis, findings, tests, raw_text, patient, document_type,
+    content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+    def __init__(self, path: str):
+        """
+        Initialize search index
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        self._columns = list(self.FIELDS) + ["patient", "document_type"]
+        self._search_columns = "{" + " ".join(self.FIELDS) + "}"
+        self._rank = "bm25(documents_fts, " + ", ".join(str(self.WEIGHTS[column]) for column in self._columns) + ")"
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get a connection owned by the current process and thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(self.SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        logger.info("Opened search index at %s (pid=%s)", self.path, os.getpid())
+        return conn
+
+    @classmethod
+    def extract_fields(cls, data: Dict[str, Any], raw_text: Optional[str] = None) -> Dict[str, str]:
+        """
+        Collect the searchable text of an extraction
+
+        Args:
+            data: Parsed document data
+            raw_text: Recognized text of the document, if available
+
+        Returns:
+            Text per FTS column (empty columns omitted)
+        """
+        source = dict(data, raw_text=raw_text) if raw_text else data
+        fields = {}
+        for column, names in cls.FIELDS.items():
+            parts = []
+            for name in names:
+                if "." in name:
+                    list_name, item_key = name.split(".", 1)
+                    items = [
+                        str(item[item_key]) for item in source.get(list_name) or []
+                        if isinstance(item, dict) and item.get(item_key)
+                    ]
+                    if items:
+                        parts.append(", ".join(items))
+                elif source.get(name):
+                    parts.append(str(source[name]))
+            if parts:
+                fields[column] = "\n".join(parts)
+        return fields
+
+    def _fts_values(self, fields: Dict[str, str], patient_name: Optional[str], document_type: str) -> List[str]:
+        """Stemmed column values for the FTS table"""
+        values = [" ".join(stem_tokens(fields.get(column, ""))) for column in self.FIELDS]
+        values.append(" ".join(tokenize(patient_name or "")))
+        values.append(document_type)
+        return values
+
+    def add(
+        self,
+        document_id: str,
+        document_type: str,
+        data: Dict[str, Any],
+        filename: Optional[str] = None,
+        raw_text: Optional[str] = None
+    ) -> None:
+        """
+        Index a document, replacing an earlier version with the same id
+
+        Args:
+            document_id: Stable document identifier (e.g. content hash)
+            document_type: Document type value
+            data: Parsed document data
+            filename: Original filename
+            raw_text: Recognized text of the document, if available
+        """
+        fields = self.extract_fields(data, raw_text)
+        patient_name = data.get("patient_name")
+        document_date = next((str(data[name]) for name in self.DATE_FIELDS if data.get(name)), None)
+        values = self._fts_values(fields, patient_name, document_type)
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._remove(conn, document_id)
+            cursor = conn.execute(
+                "INSERT INTO documents (document_id, document_type, patient_name, document_date, filename, indexed_at, fields) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    document_id, document_type, patient_name, document_date, filename, time.time(),
+                    json.dumps(fields, ensure_ascii=False),
+                )
+            )
+            conn.execute(
+                f"INSERT INTO documents_fts (rowid, {', '.join(self._columns)}) VALUES (?, {', '.join('?' * len(values))})",
+                (cursor.lastrowid, *values)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _remove(self, conn: sqlite3.Connection, document_id: str) -> bool:
+        """Delete a document and its terms inside the caller's transaction"""
+        row = conn.execute(
+            "SELECT id, patient_name, fields, document_type FROM documents WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        # A contentless FTS table forgets terms only when given the values that were indexed
+        values = self._fts_values(json.loads(row[2]), row[1], row[3])
+        conn.execute(
+            f"INSERT INTO documents_fts (documents_fts, rowid, {', '.join(self._columns)}) "
+            f"VALUES ('delete', ?, {', '.join('?' * len(values))})",
+            (row[0], *values)
+        )
+        conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+        return True
+
+    def remove(self, document_id: str) -> bool:
+        """
+        Remove a document from the index
+
+        Returns:
+            Whether the document was indexed
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = self._remove(conn, document_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def count(self) -> int:
+        """Number of indexed documents"""
+        return self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    @staticmethod
+    def _match_all(terms: Sequence[str]) -> str:
+        """FTS5 expression requiring every term (quoted, so user input can't inject syntax)"""
+        return " AND ".join('"' + term.replace('"', '""') + '"' for term in dict.fromkeys(terms))
+
+    def search(
+        self,
+        query: str,
+        patient: Optional[str] = None,
+        document_type: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Find documents containing every word of a query, best matches first
+
+        Queries matching more than RANKED_CANDIDATES documents are ranked
+        among their most recently indexed matches.
+
+        Args:
+            query: Search words in any inflected form
+            patient: Only documents whose patient name contains these words
+            document_type: Only documents of this type
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            Hits with document metadata, bm25 score (higher is better) and a snippet
+        """
+        terms = stem_tokens(query)
+        if not terms:
+            return []
+
+        expression = f"{self._search_columns} : ({self._match_all(terms)})"
+        patient_terms = tokenize(patient or "")
+        if patient_terms:
+            expression += f" AND patient : ({self._match_all(patient_terms)})"
+        if document_type:
+            expression += f" AND document_type : {self._match_all([document_type])}"
+
+        # Rank inside the FTS table, bounded to the newest candidates, and join only the page of hits
+        sql = f"""
+SELECT d.document_id, d.document_type, d.patient_name, d.document_date, d.filename, d.indexed_at, d.fields, f.score
+FROM (
+    SELECT rowid, {self._rank} AS score FROM documents_fts
+    WHERE documents_fts MATCH :expression AND rowid >= (
+        SELECT COALESCE(MIN(rowid), 0) FROM (
+            SELECT rowid FROM documents_fts WHERE documents_fts MATCH :expression
+            ORDER BY rowid DESC LIMIT :candidates
+        )
+    )
+    ORDER BY score LIMIT :limit OFFSET :offset
+) f JOIN documents d ON d.id = f.rowid
+ORDER BY f.score
+"""
+        params = {
+            "expression": expression,
+            "candidates": max(self.RANKED_CANDIDATES, limit + offset),
+            "limit": limit,
+            "offset": offset,
+        }
+
+        term_set = set(terms)
+        hits = []
+        for row in self._connection().execute(sql, params):
+            hits.append({
+                "document_id": row[0],
+                "document_type": row[1],
+                "patient_name": row[2],
+                "document_date": row[3],
+                "filename": row[4],
+                "indexed_at": row[5],
+                # bm25() is lower for better matches
+                "score": round(-row[7], 4),
+                "snippet": self._snippet(json.loads(row[6]), term_set),
+            })
+        return hits
+
+    def _snippet(self, fields: Dict[str, str], terms: set) -> Optional[str]:
+        """Text around the first query word found, from the highest-weighted field that has one"""
+        for column in sorted(fields, key=lambda name: -self.WEIGHTS[name]):
+            text = fields[column]
+            lowered = text.lower().replace("ё", "е")
+            for word in tokenize(text):
+                if stem_tokens(word)[0] not in terms:
+                    continue
+                position = lowered.find(word)
+                start = max(position - self.SNIPPET_CHARS // 3, 0)
+                end = min(start + self.SNIPPET_CHARS, len(text))
+                snippet = " ".join(text[start:end].split())
+                return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+        return None
@@ -0,0 +1,214 @@
+"""Cross-worker shared state backed by SQLite in WAL mode"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SharedStore:
+    """
+    Local state shared by all worker processes on one host
+
+    Holds the result cache, windowed rate-limit counters and expiring
+    locks. SQLite in WAL mode lets readers and a writer
+    work concurrently, so every worker can hit the same file. Connections
+    are opened lazily per process (and per thread), which keeps the store
+    safe to create before gunicorn forks its workers.
+    """
+
+    # Expired cache entries are deleted by cache_set at most this often
+    PURGE_INTERVAL_SECONDS = 300
+
+    SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT NOT NULL,
+    window_start INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (key, window_start)
+);
+CREATE TABLE IF NOT EXISTS locks (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+    def __init__(self, path: str):
+        """
+        Initialize shared store
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get a connection owned by the current process and thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            return conn
+
+        # Cached results hold patient data: create the file for the owner only
+        # (SQLite gives the -wal and -shm files the same permissions)
+        os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(self.SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        logger.info("Opened shared state store at %s (pid=%s)", self.path, os.getpid())
+        return conn
+
+    # ------------------------------------------------------------------
+    # Result cache
+    # ------------------------------------------------------------------
+
+    def cache_get(self, key: str) -> Optional[bytes]:
+        """
+        Get a cached value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached bytes or None if missing or expired
+        """
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def cache_set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        """
+        Store a value in the cache
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Time to live in seconds
+        """
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl_seconds)
+        )
+        # Expired entries are never read again; drop them so the table stays bounded
+        if now - self._last_purge >= self.PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            self.cache_purge_expired()
+
+    def cache_purge_expired(self) -> int:
+        """Delete expired cache entries and return how many were removed"""
+        cursor = self._connection().execute(
+            "DELETE FROM cache WHERE expires_at < ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+    # ------------------------------------------------------------------
+    # Windowed counters (rate limiting)
+    # ------------------------------------------------------------------
+
+    def incr_counter(self, key: str, amount: int = 1, window_seconds: int = 60) -> int:
+        """
+        Add to a fixed-window counter shared by all workers
+
+        Args:
+            key: Counter name
+            amount: Amount to add
+            window_seconds: Window length in seconds
+
+        Returns:
+            Counter value for the current window after the increment
+        """
+        window_start = int(time.time() // window_seconds) * window_seconds
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO counters (key, window_start, value) VALUES (?, ?, ?) "
+            "ON CONFLICT(key, window_start) DO UPDATE SET value = value + excluded.value",
+            (key, window_start, amount)
+        )
+        # Old windows are never read again
+        conn.execute(
+            "DELETE FROM counters WHERE key = ? AND window_start < ?",
+            (key, window_start)
+        )
+        return self.get_counter(key, window_seconds)
+
+    def get_counter(self, key: str, window_seconds: int = 60) -> int:
+        """
+        Get the value of a fixed-window counter for the current window
+
+        Args:
+            key: Counter name
+            window_seconds: Window length in seconds
+
+        Returns:
+            Counter value (0 if nothing was recorded in this window)
+        """
+        window_start = int(time.time() // window_seconds) * window_seconds
+        row = self._connection().execute(
+            "SELECT value FROM counters WHERE key = ? AND window_start = ?",
+            (key, window_start)
+        ).fetchone()
+        return row[0] if row else 0
+
+    # ------------------------------------------------------------------
+    # Locks
+    # ------------------------------------------------------------------
+
+    def acquire_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Try to take an expiring lock
+
+        Args:
+            name: Lock name
+            owner: Unique owner token
+            ttl_seconds: Lock expires after this many seconds (protects against crashed owners)
+
+        Returns:
+            True if the lock is now held by owner
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM locks WHERE name = ? AND expires_at < ?", (name, now))
+            conn.execute(
+                "INSERT OR IGNORE INTO locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl_seconds)
+            )
+            row = conn.execute("SELECT owner FROM locks WHERE name = ?", (name,)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row is not None and row[0] == owner
+
+    def release_lock(self, name: str, owner: str) -> None:
+        """Release a lock if it is still held by owner"""
+        self._connection().execute(
+            "DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner)
+        )
+
+    def lock_held(self, name: str) -> bool:
+        """Check whether an unexpired lock exists"""
+        row = self._connection().execute(
+            "SELECT 1 FROM locks WHERE name = ? AND expires_at >= ?", (name, time.time())
+        ).fetchone()
+        return row is not None
@@ -0,0 +1,129 @@
+"""Single-flight coalescing of identical concurrent work"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Run one pipeline per key and share its result with concurrent callers
+
+    Within a worker, callers with the same key await the same task. The task
+    is shielded, so a caller that times out or disconnects doesn't cancel the
+    work for the others.
+
+    With a SharedStore, the first worker to take the key's lock runs the
+    pipeline and publishes the encoded result in the shared cache; other
+    workers poll for it while the lock is held and fall back to running the
+    pipeline themselves if the owner goes away without a result. Store calls
+    wait on SQLite locks, so they run in the default executor.
+    """
+
+    def __init__(
+        self,
+        shared_store=None,
+        lock_ttl_seconds: float = 180.0,
+        result_ttl_seconds: int = 60,
+        poll_interval: float = 0.25
+    ):
+        """
+        Initialize single-flight group
+
+        Args:
+            shared_store: Optional SharedStore for cross-worker coalescing
+            lock_ttl_seconds: Cross-worker lock lifetime (longest expected pipeline)
+            result_ttl_seconds: How long a published result stays readable
+            poll_interval: Seconds between result checks while another worker runs
+        """
+        self.shared_store = shared_store
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.poll_interval = poll_interval
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._owner_prefix = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct pipelines currently running in this worker"""
+        return len(self._in_flight)
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        encode: Optional[Callable[[Any], bytes]] = None,
+        decode: Optional[Callable[[bytes], Any]] = None
+    ) -> Any:
+        """
+        Run func once for all concurrent callers with the same key
+
+        Args:
+            key: Coalescing key (e.g. normalized image hash + options)
+            func: Coroutine factory producing the result
+            encode: Result -> bytes, required for cross-worker sharing
+            decode: bytes -> result, required for cross-worker sharing
+
+        Returns:
+            Result of func (shared between callers)
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            metrics.incr("single_flight.coalesced")
+            logger.info("Coalescing request onto in-flight pipeline %s", key[:12])
+        else:
+            cross_worker = self.shared_store is not None and encode is not None and decode is not None
+            runner = self._run_shared(key, func, encode, decode) if cross_worker else func()
+            task = asyncio.create_task(runner)
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def _run_shared(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], bytes],
+        decode: Callable[[bytes], Any]
+    ) -> Any:
+        """Coalesce with other workers through the shared store"""
+        lock_name = f"single_flight:{key}"
+        result_key = f"single_flight_result:{key}"
+        owner = f"{self._owner_prefix}:{key}"
+
+        while True:
+            published = await self._store(self.shared_store.cache_get, result_key)
+            if published is not None:
+                metrics.incr("single_flight.coalesced_cross_worker")
+                return decode(published)
+
+            if await self._store(self.shared_store.acquire_lock, lock_name, owner, self.lock_ttl_seconds):
+                break
+
+            # Another worker is running this pipeline: wait for its result
+            while await self._store(self.shared_store.lock_held, lock_name):
+                await asyncio.sleep(self.poll_interval)
+                published = await self._store(self.shared_store.cache_get, result_key)
+                if published is not None:
+                    metrics.incr("single_flight.coalesced_cross_worker")
+                    logger.info("Using result of pipeline %s from another worker", key[:12])
+                    return decode(published)
+
+        try:
+            result = await func()
+            await self._store(self.shared_store.cache_set, result_key, encode(result), self.result_ttl_seconds)
+            return result
+        finally:
+            await self._store(self.shared_store.release_lock, lock_name, owner)
+
+    @staticmethod
+    async def _store(method: Callable[..., Any], *args) -> Any:
+        """Call a SharedStore method off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
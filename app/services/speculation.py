@@ -0,0 +1,226 @@
+"""Speculative extraction running in parallel with classification"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.base import DocumentType
+from app.services.document_classifier import DocumentClassifier
+from app.services.document_parser import DocumentParser
+from app.services.metrics import metrics
+from app.services.openai_service import track_usage
+from app.services.rate_limiter import PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Word boundaries for filenames, where "_" and digits also separate words
+_WORD_START = r"(?<![^\W\d_])"
+_WORD_END = r"(?![^\W\d_])"
+
+
+class TypePredictor:
+    """
+    Guess a document's type before the classifier answers
+
+    Uses a local pre-signal (keywords in the filename) first and falls back
+    to the tenant's historical type distribution.
+    """
+
+    # Filename keywords (Russian and English, transliterated) per document type.
+    # Short keywords must stand alone: "кт" is also in "доктор", "lab" in "label"
+    FILENAME_HINTS = {
+        DocumentType.PRESCRIPTION: re.compile(
+            rf"рецепт|recept|prescri|{_WORD_START}rx{_WORD_END}", re.IGNORECASE
+        ),
+        DocumentType.LAB_REPORT: re.compile(
+            rf"анализ|analiz|{_WORD_START}lab(?:s|orator\w*)?{_WORD_END}|кровь|krov|blood|моча|urine",
+            re.IGNORECASE
+        ),
+        DocumentType.DOCTOR_VISIT: re.compile(r"прием|приём|priem|осмотр|заключение|visit|consult", re.IGNORECASE),
+        DocumentType.DIAGNOSTIC_RESULTS: re.compile(
+            rf"{_WORD_START}(?:узи|uzi|мрт|mrt|mri|кт|ct){_WORD_END}|рентген|xray|x-ray|ultrasound",
+            re.IGNORECASE
+        ),
+    }
+
+    def __init__(self, min_samples: int = 5, min_probability: float = 0.6):
+        """
+        Initialize predictor
+
+        Args:
+            min_samples: Documents seen for a tenant before its history is trusted
+            min_probability: Share the most common type must reach to be predicted
+        """
+        self.min_samples = min_samples
+        self.min_probability = min_probability
+        self._history: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, tenant: str, document_type: DocumentType) -> None:
+        """Record a classified document for a tenant"""
+        if document_type != DocumentType.UNKNOWN:
+            self._history[tenant][document_type] += 1
+
+    def predict(self, tenant: str, filename: str = "") -> Optional[DocumentType]:
+        """
+        Predict the most likely document type
+
+        Args:
+            tenant: Tenant identifier
+            filename: Original upload filename
+
+        Returns:
+            Predicted document type or None if there is no confident guess
+        """
+        matches = [
+            doc_type for doc_type, pattern in self.FILENAME_HINTS.items()
+            if filename and pattern.search(filename)
+        ]
+        if len(matches) == 1:
+            return matches[0]
+
+        history = self._history.get(tenant)
+        if not history:
+            return None
+        total = sum(history.values())
+        doc_type, count = history.most_common(1)[0]
+        if total >= self.min_samples and count / total >= self.min_probability:
+            return doc_type
+        return None
+
+
+class SpeculativeAnalyzer:
+    """
+    Start extraction for the predicted type while classification runs
+
+    If the classifier agrees with the prediction the speculative result is
+    used, saving roughly min(classify, extract) latency. Otherwise the
+    speculative call is cancelled (or its result discarded) and extraction
+    runs for the real type. Hit rate, latency saved and tokens wasted are
+    recorded under the "speculation.*" metrics.
+    """
+
+    def __init__(
+        self,
+        classifier: DocumentClassifier,
+        parser: DocumentParser,
+        predictor: TypePredictor
+    ):
+        """
+        Initialize speculative analyzer
+
+        Args:
+            classifier: Document classifier
+            parser: Document parser
+            predictor: Type predictor
+        """
+        self.classifier = classifier
+        self.parser = parser
+        self.predictor = predictor
+
+    async def _timed_parse(
+        self,
+        base64_image: str,
+        document_type: DocumentType,
+        tenant: str,
+        priority: str,
+        fields: Optional[List[str]]
+    ) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Run the parser and return (parsed_data, seconds)"""
+        started = time.perf_counter()
+        parsed_data = await self.parser.parse(
+            base64_image, document_type, tenant=tenant, priority=priority, fields=fields
+        )
+        return parsed_data, time.perf_counter() - started
+
+    async def analyze(
+        self,
+        base64_image: str,
+        filename: str = "",
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[DocumentType, float, Optional[Dict[str, Any]]]:
+        """
+        Classify and parse a document, speculating on its type when possible
+
+        Args:
+            base64_image: Base64 encoded image
+            filename: Original upload filename (used as a pre-signal)
+            tenant: Tenant identifier
+            priority: "interactive" or "batch"
+            fields: Optional subset of fields to extract
+
+        Returns:
+            Tuple of (document_type, confidence, parsed_data)
+        """
+        predicted = self.predictor.predict(tenant, filename)
+        if predicted is None:
+            metrics.incr("speculation.skipped")
+            document_type, confidence = await self.classifier.classify(base64_image, tenant=tenant, priority=priority)
+            self.predictor.record(tenant, document_type)
+            parsed_data = None
+            if document_type != DocumentType.UNKNOWN:
+                parsed_data = await self.parser.parse(
+                    base64_image, document_type, tenant=tenant, priority=priority, fields=fields
+                )
+            return document_type, confidence, parsed_data
+
+        logger.info("Speculatively extracting as %s while classifying", predicted.value)
+        with track_usage() as speculative_usage:
+            speculative = asyncio.create_task(
+                self._timed_parse(base64_image, predicted, tenant, priority, fields)
+            )
+
+        try:
+            classify_started = time.perf_counter()
+            document_type, confidence = await self.classifier.classify(base64_image, tenant=tenant, priority=priority)
+            classify_seconds = time.perf_counter() - classify_started
+        except BaseException:
+            speculative.cancel()
+            raise
+        self.predictor.record(tenant, document_type)
+        metrics.incr("speculation.attempts")
+
+        if document_type == predicted:
+            parsed_data, parse_seconds = await speculative
+            saved_ms = min(classify_seconds, parse_seconds) * 1000
+            metrics.incr("speculation.hits")
+            metrics.incr("speculation.latency_saved_ms", saved_ms)
+            self._update_hit_rate()
+            logger.info("Speculation hit for %s, saved ~%.0fms", predicted.value, saved_ms)
+            return document_type, confidence, parsed_data
+
+        # Wrong guess: drop the speculative call and extract for the real type
+        speculative.cancel()
+        try:
+            await speculative
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning("Discarded speculative extraction failed: %s", e)
+
+        # Completed calls are billed in full; cancelled in-flight calls still pay for the prompt
+        wasted = speculative_usage["total_tokens"] + (
+            speculative_usage["prompt_tokens_estimated"] if speculative_usage["calls_sent"] > speculative_usage["calls_completed"] else 0
+        )
+        metrics.incr("speculation.misses")
+        metrics.incr("speculation.tokens_wasted", wasted)
+        self._update_hit_rate()
+        logger.info("Speculation miss: predicted %s, got %s, ~%s tokens wasted", predicted.value, document_type.value, wasted)
+
+        parsed_data = None
+        if document_type != DocumentType.UNKNOWN:
+            parsed_data = await self.parser.parse(
+                base64_image, document_type, tenant=tenant, priority=priority, fields=fields
+            )
+        return document_type, confidence, parsed_data
+
+    @staticmethod
+    def _update_hit_rate() -> None:
+        """Refresh the speculation.hit_rate gauge"""
+        attempts = metrics.get("speculation.attempts")
+        if attempts:
+            metrics.set_gauge("speculation.hit_rate", metrics.get("speculation.hits") / attempts)
@@ -0,0 +1,185 @@
+"""Tiled high-resolution extraction for dense pages"""
+
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.schemas.base import DocumentType
+from app.services.document_parser import DocumentParser
+from app.services.metrics import metrics
+from app.services.rate_limiter import PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+
+class TiledExtractor:
+    """
+    Extract dense tables from high-resolution strips of a page
+
+    The table field (test_results) is extracted from every strip
+    concurrently, while the remaining fields come from one call on the
+    whole page running at the same time, so latency stays close to a single
+    extraction. Rows repeated in the overlap between strips are merged.
+    """
+
+    # Fields extracted per strip, by document type
+    TILE_FIELDS = {
+        DocumentType.LAB_REPORT: "test_results",
+    }
+
+    # Rows near a strip edge that may repeat in the neighbouring strip
+    OVERLAP_ROWS = 8
+
+    _NON_WORD = re.compile(r"[\W_]+")
+
+    def __init__(self, parser: DocumentParser):
+        """
+        Initialize tiled extractor
+
+        Args:
+            parser: Document parser used for every call
+        """
+        self.parser = parser
+
+    @classmethod
+    def supports(cls, document_type: DocumentType, fields: Optional[List[str]] = None) -> bool:
+        """Check whether tiling applies to a document type and field selection"""
+        tile_field = cls.TILE_FIELDS.get(document_type)
+        return tile_field is not None and (not fields or tile_field in fields)
+
+    async def parse(
+        self,
+        base64_image: str,
+        tiles: List[str],
+        document_type: DocumentType,
+        tenant: str = "default",
+        priority: str = PRIORITY_INTERACTIVE,
+        fields: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Parse a document using high-resolution strips for its table field
+
+        Args:
+            base64_image: Base64 encoded whole page
+            tiles: Base64 encoded strips from top to bottom
+            document_type: Type of document to parse
+            tenant: Tenant identifier
+            priority: "interactive" or "batch"
+            fields: Optional subset of top-level fields to extract
+
+        Returns:
+            Parsed data dictionary or None if every strip fails; if only
+            the page fields fail, they are left empty
+        """
+        if len(tiles) < 2 or not self.supports(document_type, fields):
+            return await self.parser.parse(
+                base64_image, document_type, tenant=tenant, priority=priority, fields=fields
+            )
+
+        tile_field = self.TILE_FIELDS[document_type]
+        schema_class = self.parser.SCHEMA_CLASSES[document_type]
+        requested = self.parser.select_fields(document_type, fields) if fields else list(schema_class.model_fields)
+        page_fields = [name for name in requested if name != tile_field]
+
+        calls = [
+            self.parser.parse(tile, document_type, tenant=tenant, priority=priority, fields=[tile_field])
+            for tile in tiles
+        ]
+        if page_fields:
+            calls.append(
+                self.parser.parse(base64_image, document_type, tenant=tenant, priority=priority, fields=page_fields)
+            )
+
+        logger.info("Extracting %s from %s strips", tile_field, len(tiles))
+        results = await asyncio.gather(*calls)
+        metrics.incr("tiled.extractions")
+        metrics.incr("tiled.tiles", len(tiles))
+
+        tile_results = results[:len(tiles)]
+        page_data = results[len(tiles)] if page_fields else {}
+        if all(result is None for result in tile_results):
+            return None
+        if page_data is None:
+            # The table is what tiling is for; keep it without the page fields
+            logger.warning("Page fields of tiled %s failed, returning the table only", document_type.value)
+            metrics.incr("tiled.page_fields_failed")
+            page_data = {}
+
+        row_lists = [(result or {}).get(tile_field) or [] for result in tile_results]
+        merged = self.merge_rows(row_lists)
+        metrics.incr("tiled.rows_deduplicated", sum(len(rows) for rows in row_lists) - len(merged))
+
+        raw_data = {**page_data, tile_field: merged}
+        raw_data = {name: raw_data.get(name) for name in requested}
+
+        # Validate the combined result against the (partial) schema
+        if fields:
+            schema_class = self.parser.partial_schema(document_type, requested)
+        try:
+            return schema_class.model_validate(raw_data).model_dump()
+        except ValidationError as e:
+            logger.error("Validation errors for merged %s: %s", document_type.value, e)
+            return raw_data
+
+    @classmethod
+    def _row_key(cls, row: Dict[str, Any]) -> Tuple[str, str, str]:
+        """Normalized name, result value and unit of a row ("" where missing)"""
+        name = row.get("test_name") or row.get("name")
+        value = row.get("result_value") or row.get("dosage")
+        return tuple(cls._NON_WORD.sub(" ", str(text or "")).strip().lower() for text in (name, value, row.get("unit")))
+
+    @staticmethod
+    def _same_row(key: Tuple[str, str, str], other: Tuple[str, str, str]) -> bool:
+        """
+        Whether two rows are one row seen twice: same name, and no value or
+        unit that both have differs (a row cut at a strip edge may lack them).
+        Same-name rows with other values are different rows, e.g.
+        "Нейтрофилы" in % and in 10^9/л.
+        """
+        return key[0] == other[0] and all(
+            not mine or not theirs or mine == theirs for mine, theirs in zip(key[1:], other[1:])
+        )
+
+    @classmethod
+    def merge_rows(cls, row_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Concatenate per-strip rows, merging rows repeated in strip overlaps
+
+        A row at the start of a strip that matches one of the last rows taken
+        from the previous strips in name, value and unit is the same row seen
+        twice; the copy with more filled-in values wins.
+
+        Args:
+            row_lists: Rows of each strip, top to bottom
+
+        Returns:
+            Rows of the whole page
+        """
+        merged: List[Dict[str, Any]] = []
+        keys: List[Tuple[str, str, str]] = []
+        for rows in row_lists:
+            # Only rows of earlier strips can be repeats
+            window_end = len(merged)
+            window_start = max(window_end - cls.OVERLAP_ROWS, 0)
+            for index, row in enumerate(rows):
+                key = cls._row_key(row)
+                match = None
+                if index < cls.OVERLAP_ROWS and key[0]:
+                    match = next(
+                        (position for position in range(window_start, window_end) if cls._same_row(keys[position], key)),
+                        None
+                    )
+                if match is None:
+                    merged.append(row)
+                    keys.append(key)
+                    continue
+                # Later rows of this strip can only match after this position
+                window_start = match + 1
+                filled = sum(value is not None for value in row.values())
+                if filled > sum(value is not None for value in merged[match].values()):
+                    merged[match] = row
+                    keys[match] = key
+        return merged
@@ -0,0 +1,175 @@
+"""OpenTelemetry tracing of the analysis pipeline, a no-op unless configured"""
+
+import functools
+import inspect
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tracer and trace API module once configure_tracing() succeeded
+_tracer = None
+_trace = None
+_provider = None
+
+
+class _NoopSpan:
+    """Span stand-in while tracing is off; every call does nothing"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[dict] = None) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _clean(attributes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Attributes OpenTelemetry accepts: None dropped, enums by value"""
+    return {
+        key: getattr(value, "value", value)
+        for key, value in (attributes or {}).items()
+        if value is not None
+    }
+
+
+def configure_tracing(
+    exporter: str,
+    service_name: str = "medical-documents-ocr",
+    file_path: str = "",
+    otlp_endpoint: str = ""
+) -> bool:
+    """
+    Start exporting spans
+
+    Args:
+        exporter: "file" (one JSON span per line), "otlp" (OTLP over HTTP) or "" (off)
+        service_name: service.name resource attribute
+        file_path: File the "file" exporter appends to
+        otlp_endpoint: Traces URL of the collector (default: OTEL_EXPORTER_OTLP_* variables)
+
+    Returns:
+        True if tracing is on
+    """
+    if not exporter or exporter == "none":
+        return False
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("Tracing needs opentelemetry-sdk: pip install opentelemetry-sdk; tracing is off")
+        return False
+
+    if exporter == "file":
+        output = open(file_path, "a", encoding="utf-8")
+        span_exporter = ConsoleSpanExporter(out=output, formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning(
+                "OTLP export needs opentelemetry-exporter-otlp-proto-http: "
+                "pip install opentelemetry-exporter-otlp-proto-http; tracing is off"
+            )
+            return False
+        span_exporter = OTLPSpanExporter(endpoint=otlp_endpoint or None)
+    else:
+        raise ValueError(f"Unknown tracing exporter: {exporter}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    # Spans are exported from a background thread in batches, off the request path
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    use_provider(provider)
+    logger.info("Tracing spans to %s exporter", exporter)
+    return True
+
+
+def use_provider(provider) -> None:
+    """Record spans with an already set-up TracerProvider (also used by tests)"""
+    global _tracer, _trace, _provider
+    from opentelemetry import trace
+
+    _provider = provider
+    _trace = trace
+    _tracer = provider.get_tracer("app")
+
+
+def shutdown_tracing() -> None:
+    """Export the spans still buffered and stop tracing"""
+    global _tracer, _trace, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _trace = _provider = None
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Context manager of a span, the child of the current one
+
+    Args:
+        name: Span name
+        attributes: Span attributes (None values are left out)
+
+    Returns:
+        Span context manager; a shared no-op span while tracing is off
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_as_current_span(name, attributes=_clean(attributes))
+
+
+def set_attributes(attributes: Dict[str, Any]) -> None:
+    """Add attributes to the current span"""
+    if _tracer is None:
+        return
+    _trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def add_event(name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+    """Add an event (e.g. a retry) to the current span"""
+    if _tracer is None:
+        return
+    _trace.get_current_span().add_event(name, _clean(attributes))
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator running a function, sync or async, in a span
+
+    The function can add attributes to it with set_attributes(). While
+    tracing is off the call goes straight through.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await func(*args, **kwargs)
+                with _tracer.start_as_current_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,290 @@
+"""Per-patient lab test time series derived from extracted lab reports"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.lab_status import parse_value_and_unit
+
+logger = logging.getLogger(__name__)
+
+
+class TrendStore:
+    """
+    Lab values per patient and test, stored as compact arrays
+
+    Numeric values and units are parsed once, when a lab report is
+    analyzed. Every (patient, test, unit) series is one row holding two
+    packed arrays in native byte order (days since 0001-01-01 as int32 and
+    values as float64, sorted by date) next to precomputed count, min, max
+    and last value, so a patient's trends are one indexed range read with
+    no joins or string parsing. Values in different units go to separate
+    series rather than being mixed on one chart. Like SharedStore, the file
+    is opened lazily per process and thread in WAL mode.
+    """
+
+    SCHEMA = """
+CREATE TABLE IF NOT EXISTS lab_series (
+    patient_key TEXT NOT NULL,
+    test_key TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    test_name TEXT NOT NULL,
+    days BLOB NOT NULL,
+    vals BLOB NOT NULL,
+    count INTEGER NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    last_value REAL NOT NULL,
+    last_day INTEGER NOT NULL,
+    PRIMARY KEY (patient_key, test_key, unit)
+) WITHOUT ROWID;
+"""
+
+    # Fields tried in order for the date of a lab value
+    DATE_FIELDS = ("collection_date", "report_date", "visit_date")
+
+    _DATE = re.compile(r"^\s*(\d{4})-(\d{1,2})-(\d{1,2})")
+    _NON_WORD = re.compile(r"[\W_]+")
+
+    def __init__(self, path: str):
+        """
+        Initialize trend store
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get a connection owned by the current process and thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(self.SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        logger.info("Opened trend store at %s (pid=%s)", self.path, os.getpid())
+        return conn
+
+    # ------------------------------------------------------------------
+    # Parsing
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def normalize_key(cls, text: str) -> str:
+        """Lowercase words of a name or identifier, for matching"""
+        return cls._NON_WORD.sub(" ", text.lower().replace("ё", "е")).strip()
+
+    @classmethod
+    def patient_key(cls, data: Dict[str, Any]) -> Optional[str]:
+        """Patient identifier of a report (its patient_id; names aren't unique)"""
+        return cls.normalize_key(str(data.get("patient_id") or "")) or None
+
+    @classmethod
+    def parse_value(cls, result_value: Any, unit: Optional[str] = None) -> Optional[Tuple[float, str]]:
+        """
+        Parse a numeric lab value
+
+        Uses the value parser of the status computation, so ranges ("2-3")
+        and ratios ("1:160") are not values. Units written after the number
+        ("145 г/л") are used when no unit was extracted.
+
+        Args:
+            result_value: Extracted result_value
+            unit: Extracted unit, if any
+
+        Returns:
+            Tuple of (value, normalized unit) or None for non-numeric results
+        """
+        parsed = parse_value_and_unit(result_value)
+        if parsed is None:
+            return None
+        return parsed[0], cls._normalize_unit(unit or parsed[1])
+
+    @staticmethod
+    def _normalize_unit(unit: str) -> str:
+        """Unit without spaces and case differences ("Г/Л" and "г / л" are one unit)"""
+        return "".join(unit.lower().split())
+
+    @classmethod
+    def parse_day(cls, value: Any) -> Optional[int]:
+        """Day number of a YYYY-MM-DD date, or None"""
+        match = cls._DATE.match(str(value or ""))
+        if match is None:
+            return None
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3))).toordinal()
+        except ValueError:
+            return None
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def add_report(self, data: Dict[str, Any]) -> int:
+        """
+        Add the numeric results of a lab report to its patient's series
+
+        A value already recorded for the same day is not added again, so
+        analyzing a report twice doesn't duplicate points. Reports without
+        a patient_id are skipped: patients who share a name would be merged.
+
+        Args:
+            data: Parsed lab report
+
+        Returns:
+            Number of points added
+        """
+        patient = self.patient_key(data)
+        days = (self.parse_day(data.get(name)) for name in self.DATE_FIELDS)
+        day = next((day for day in days if day is not None), None)
+        if patient is None or day is None:
+            return 0
+
+        points = []
+        for result in data.get("test_results") or []:
+            if not isinstance(result, dict) or not result.get("test_name"):
+                continue
+            parsed = self.parse_value(result.get("result_value"), result.get("unit"))
+            # Recognized tests are keyed by code, so "Hb" and "Гемоглобин" share a series
+            test_key = self.normalize_key(str(result.get("test_code") or result["test_name"]))
+            if parsed is not None and test_key:
+                points.append((test_key, parsed[1], str(result["test_name"]).strip(), parsed[0]))
+        if not points:
+            return 0
+
+        added = 0
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for test_key, unit, test_name, value in points:
+                added += self._add_point(conn, patient, test_key, unit, test_name, day, value)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def _add_point(
+        self,
+        conn: sqlite3.Connection,
+        patient: str,
+        test_key: str,
+        unit: str,
+        test_name: str,
+        day: int,
+        value: float
+    ) -> bool:
+        """Insert one value into its series in date order and refresh the aggregates"""
+        row = conn.execute(
+            "SELECT days, vals FROM lab_series WHERE patient_key = ? AND test_key = ? AND unit = ?",
+            (patient, test_key, unit)
+        ).fetchone()
+
+        days, vals = array("i"), array("d")
+        if row is not None:
+            days.frombytes(row[0])
+            vals.frombytes(row[1])
+
+        position = bisect_right(days, day)
+        # Same day and value already recorded (the report was analyzed before)
+        index = position - 1
+        while index >= 0 and days[index] == day:
+            if vals[index] == value:
+                return False
+            index -= 1
+
+        days.insert(position, day)
+        vals.insert(position, value)
+        conn.execute(
+            "INSERT OR REPLACE INTO lab_series "
+            "(patient_key, test_key, unit, test_name, days, vals, count, min_value, max_value, last_value, last_day) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                patient, test_key, unit, test_name, days.tobytes(), vals.tobytes(),
+                len(vals), min(vals), max(vals), vals[-1], days[-1],
+            )
+        )
+        return True
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def trends(
+        self,
+        patient: str,
+        test: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        include_points: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a patient's lab series
+
+        Aggregates always describe the whole series; since/until only limit
+        the returned points.
+
+        Args:
+            patient: Patient ID
+            test: Only series of this test code or name
+            since: First date of returned points (YYYY-MM-DD)
+            until: Last date of returned points (YYYY-MM-DD)
+            include_points: Return the points, not just aggregates
+
+        Returns:
+            Series ordered by test name
+
+        Raises:
+            ValueError: If since or until is not a YYYY-MM-DD date
+        """
+        sql = (
+            "SELECT test_key, unit, test_name, days, vals, count, min_value, max_value, last_value, last_day "
+            "FROM lab_series WHERE patient_key = ?"
+        )
+        params: List[Any] = [self.normalize_key(patient)]
+        if test:
+            sql += " AND test_key = ?"
+            params.append(self.normalize_key(test))
+        sql += " ORDER BY test_key, unit"
+
+        first_day = self.parse_day(since) if since else None
+        last_day = self.parse_day(until) if until else None
+        if since and first_day is None or until and last_day is None:
+            raise ValueError("since and until must be dates in YYYY-MM-DD format")
+
+        series = []
+        for row in self._connection().execute(sql, params):
+            entry = {
+                "test": row[0],
+                "test_name": row[2],
+                "unit": row[1] or None,
+                "count": row[5],
+                "min": row[6],
+                "max": row[7],
+                "last": {"date": date.fromordinal(row[9]).isoformat(), "value": row[8]},
+            }
+            if include_points:
+                days, vals = array("i"), array("d")
+                days.frombytes(row[3])
+                vals.frombytes(row[4])
+                start = bisect_right(days, first_day - 1) if first_day is not None else 0
+                end = bisect_right(days, last_day) if last_day is not None else len(days)
+                entry["points"] = [
+                    {"date": date.fromordinal(days[index]).isoformat(), "value": vals[index]}
+                    for index in range(start, end)
+                ]
+            series.append(entry)
+        return series
@@ -1,10 +1,24 @@
 """Utility functions"""
 
-from .image_utils import encode_image_to_base64, validate_image, get_file_extension
+from .image_utils import (
+    assess_image_quality,
+    encode_image_to_base64,
+    encode_image_tiles,
+    encode_document_regions,
+    find_document_regions,
+    validate_image,
+    get_file_extension,
+)
+from .json_utils import ORJSONResponse
 
 __all__ = [
+    "assess_image_quality",
     "encode_image_to_base64",
+    "encode_image_tiles",
+    "encode_document_regions",
+    "find_document_regions",
     "validate_image",
     "get_file_extension",
+    "ORJSONResponse",
 ]
 
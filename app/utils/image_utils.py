@@ -2,13 +2,22 @@
 
 import base64
 from io import BytesIO
-from PIL import Image
-from typing import Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional, TYPE_CHECKING
 import logging
-import fitz  # PyMuPDF
+
+from app.services import tracing
+
+# PIL and PyMuPDF are imported inside the functions that need them so that
+# importing the app (and answering health checks) doesn't pay for them
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# Longest side of the working copy used for orientation detection
+ORIENTATION_SIZE = 768
+
 
 def get_file_extension(filename: str) -> str:
     """
@@ -23,7 +32,15 @@ def get_file_extension(filename: str) -> str:
     return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
 
 
-def pdf_to_image(pdf_content: bytes, dpi: int = 150) -> Image.Image:
+def preload() -> None:
+    """Import the heavy image libraries ahead of the first request"""
+    import fitz  # noqa: F401  PyMuPDF
+    from PIL import Image  # noqa: F401
+    import numpy  # noqa: F401
+
+
+@tracing.traced("pdf_to_image")
+def pdf_to_image(pdf_content: bytes, dpi: int = 150) -> "Image.Image":
     """
     Convert PDF to PIL Image (first page only)
     
@@ -34,6 +51,9 @@ def pdf_to_image(pdf_content: bytes, dpi: int = 150) -> Image.Image:
     Returns:
         PIL Image object of the first page
     """
+    import fitz  # PyMuPDF
+    from PIL import Image
+    
     try:
         # Open PDF from bytes
         pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
@@ -43,6 +63,7 @@ def pdf_to_image(pdf_content: bytes, dpi: int = 150) -> Image.Image:
         
         # Get first page
         page = pdf_document[0]
+        tracing.set_attributes({"pdf.page_count": pdf_document.page_count, "pdf.dpi": dpi})
         
         # Render page to pixmap
         # zoom factor: 1.0 = 72 DPI, so dpi/72 gives us the desired DPI
@@ -57,11 +78,12 @@ def pdf_to_image(pdf_content: bytes, dpi: int = 150) -> Image.Image:
         # Close PDF
         pdf_document.close()
         
-        logger.info(f"Converted PDF to image: size={image.size}, mode={image.mode}")
+        tracing.set_attributes({"image.width": image.width, "image.height": image.height})
+        logger.info("Converted PDF to image: size=%s, mode=%s", image.size, image.mode)
         return image
         
     except Exception as e:
-        logger.error(f"Error converting PDF to image: {str(e)}")
+        logger.error("Error converting PDF to image: %s", e)
         raise ValueError(f"Failed to convert PDF to image: {str(e)}")
 
 
@@ -77,6 +99,8 @@ def validate_image(file_content: bytes, max_size_bytes: int, allowed_extensions:
     Returns:
         Tuple of (is_valid, error_message)
     """
+    from PIL import Image
+    
     try:
         # Check if file is empty
         if not file_content or len(file_content) == 0:
@@ -88,7 +112,7 @@ def validate_image(file_content: bytes, max_size_bytes: int, allowed_extensions:
             return False, f"File size exceeds maximum allowed size of {max_mb}MB"
         
         # Log file info for debugging
-        logger.info(f"Validating file: size={len(file_content)} bytes, first 10 bytes={file_content[:10].hex()}")
+        logger.info("Validating file: size=%s bytes, first 10 bytes=%s", len(file_content), file_content[:10].hex())
         
         # Check if it's a PDF file (PDF files start with %PDF)
         is_pdf = file_content[:4] == b'%PDF'
@@ -98,10 +122,10 @@ def validate_image(file_content: bytes, max_size_bytes: int, allowed_extensions:
             try:
                 # Try to convert PDF to image to validate it
                 image = pdf_to_image(file_content)
-                logger.info(f"PDF validated successfully: size={image.size}")
+                logger.info("PDF validated successfully: size=%s", image.size)
                 return True, ""
             except Exception as e:
-                logger.error(f"Failed to validate PDF: {str(e)}")
+                logger.error("Failed to validate PDF: %s", e)
                 return False, f"Invalid PDF file: {str(e)}. Please ensure you're uploading a valid PDF file."
         else:
             # Try to open as regular image
@@ -111,7 +135,7 @@ def validate_image(file_content: bytes, max_size_bytes: int, allowed_extensions:
                 # Get image format and size before verify
                 img_format = image.format
                 img_size = image.size
-                logger.info(f"Image opened successfully: format={img_format}, size={img_size}")
+                logger.info("Image opened successfully: format=%s, size=%s", img_format, img_size)
                 
                 # Verify image integrity
                 # Note: verify() consumes the image, so we do this last
@@ -122,59 +146,330 @@ def validate_image(file_content: bytes, max_size_bytes: int, allowed_extensions:
                 return True, ""
             except Exception as e:
                 # If it's not a valid image
-                logger.error(f"Failed to open image: {str(e)}, file size: {len(file_content)} bytes")
+                logger.error("Failed to open image: %s, file size: %s bytes", e, len(file_content))
                 return False, f"Invalid image file: {str(e)}. Please ensure you're uploading a valid image file (JPG, PNG, or PDF)."
             
     except Exception as e:
-        logger.error(f"Error validating file: {str(e)}")
+        logger.error("Error validating file: %s", e)
         return False, f"Error validating file: {str(e)}"
 
 
-def encode_image_to_base64(file_content: bytes, filename: str = "") -> str:
+def _load_rgb_image(file_content: bytes, pdf_dpi: int = 150) -> "Image.Image":
+    """
+    Open an uploaded image or PDF (first page) as an RGB image with EXIF orientation applied
+    
+    Args:
+        file_content: Binary content of the image or PDF
+        pdf_dpi: Resolution for rendering PDFs
+        
+    Returns:
+        PIL Image in RGB mode
+    """
+    from PIL import Image, ImageOps
+    
+    # Check if file content is empty
+    if not file_content or len(file_content) == 0:
+        raise ValueError("File content is empty")
+    
+    # Check if it's a PDF file
+    is_pdf = file_content[:4] == b'%PDF'
+    
+    if is_pdf:
+        # Convert PDF to image first
+        logger.info("Detected PDF file, converting to image")
+        image = pdf_to_image(file_content, dpi=pdf_dpi)
+    else:
+        # Open image
+        logger.info("Encoding image to base64: size=%s bytes", len(file_content))
+        image_stream = BytesIO(file_content)
+        image = Image.open(image_stream)
+    
+    # Get original format and size
+    logger.info("Opened image: format=%s, size=%s, mode=%s", image.format, image.size, image.mode)
+    
+    # Phone cameras store rotation in EXIF instead of rotating the pixels
+    image = ImageOps.exif_transpose(image)
+    
+    # Convert to RGB if necessary (for PNG with transparency, etc.)
+    if image.mode in _TRANSPARENT_MODES:
+        logger.info("Converting image from %s to RGB", image.mode)
+        image = _composite_on_white(image)
+    elif image.mode != 'RGB':
+        logger.info("Converting image from %s to RGB", image.mode)
+        image = image.convert('RGB')
+    
+    return image
+
+
+# Modes that may carry transparency
+_TRANSPARENT_MODES = ('RGBA', 'LA', 'P', 'PA')
+
+
+def _composite_on_white(image: "Image.Image") -> "Image.Image":
+    """Flatten a possibly transparent image onto white paper (transparent pixels would read as black)"""
+    from PIL import Image
+    
+    if image.mode in ('P', 'PA'):
+        image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+    return background
+
+
+def _ink_mask(gray: "np.ndarray") -> "np.ndarray":
+    """Pixels clearly darker than the paper (the bright end of the histogram)"""
+    import numpy as np
+    
+    pixels = gray.astype(np.uint8)
+    histogram = np.bincount(pixels.ravel(), minlength=256).cumsum()
+    paper_level = float(np.searchsorted(histogram, 0.9 * histogram[-1]))
+    return pixels < paper_level - 60
+
+
+def _profile_score(ys: "np.ndarray", xs: "np.ndarray", angle: float) -> float:
+    """Sharpness of the row profile of ink pixels after rotating by angle degrees"""
+    import numpy as np
+    
+    theta = np.deg2rad(angle)
+    rows = np.round(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64)
+    steps = np.diff(np.bincount(rows - rows.min()))
+    return float(np.dot(steps, steps)) / len(ys)
+
+
+def _best_skew(ink: "np.ndarray", max_skew: float, step: float) -> Tuple[float, float]:
+    """
+    Find the rotation that lines text up with the rows (projection profile)
+    
+    For every candidate angle the ink pixels are projected onto the rotated
+    vertical axis; text lines produce the sharpest profile (largest sum of
+    squared differences between neighbouring bins) when the rotation undoes
+    the skew. A 1-degree sweep is refined around its best angle.
+    
+    Returns:
+        Tuple of (angle in degrees, counter-clockwise as in Image.rotate; profile score)
+    """
+    import numpy as np
+    
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 50:
+        return 0.0, 0.0
+    
+    # Subsample large pages; the profile shape is what matters
+    stride = max(len(ys) // 20000, 1)
+    ys = ys[::stride] - ys.mean()
+    xs = xs[::stride] - xs.mean()
+    
+    coarse = max(step, 1.0)
+    candidates = np.arange(-max_skew, max_skew + coarse / 2, coarse)
+    scores = [_profile_score(ys, xs, angle) for angle in candidates]
+    best = int(np.argmax(scores))
+    best_angle, best_score = float(candidates[best]), scores[best]
+    
+    for angle in np.arange(best_angle - coarse + step, best_angle + coarse, step):
+        score = _profile_score(ys, xs, angle)
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle, best_score
+
+
+def _row_run_ratio(ink: "np.ndarray", gap: int = 6) -> float:
+    """
+    How much longer ink runs are along rows than along columns
+    
+    Gaps of up to gap pixels within a row are bridged first, so the letters
+    of upright words merge into long horizontal runs while lines stay
+    apart. On a sideways page the bridged runs stay as short as a glyph.
+    Unlike the projection profile this does not mistake aligned table
+    columns for text lines.
+    """
+    import numpy as np
+    
+    height, width = ink.shape
+    cumulative = np.zeros((height, width + 1), dtype=np.int32)
+    np.cumsum(ink, axis=1, out=cumulative[:, 1:])
+    columns = np.arange(width)
+    ink_left = cumulative[:, columns + 1] > cumulative[:, np.maximum(columns - gap, 0)]
+    ink_right = cumulative[:, np.minimum(columns + gap + 1, width)] > cumulative[:, columns]
+    bridged = ink_left & ink_right
+    
+    def mean_run(mask: "np.ndarray") -> float:
+        runs = int(mask[:, 0].sum()) + int((mask[:, 1:] & ~mask[:, :-1]).sum())
+        return float(mask.sum()) / max(runs, 1)
+    
+    return mean_run(bridged) / max(mean_run(bridged.T), 1e-6)
+
+
+def _is_upside_down(ink: "np.ndarray") -> Optional[bool]:
+    """
+    Guess whether an upright-or-180 page is upside down
+    
+    Text lines start at a common left margin and end raggedly, so on an
+    upright page the left ends of the lines vary less than the right ends.
+    Centered, justified and table pages have no such difference.
+    
+    Returns:
+        True or False when one margin is clearly more regular, None otherwise
+    """
+    import numpy as np
+    
+    row_ink = ink.mean(axis=1)
+    text_rows = row_ink > max(row_ink.max() * 0.1, 1e-3)
+    
+    # Group consecutive text rows into lines
+    edges = np.diff(text_rows.astype(np.int8))
+    starts = list(np.nonzero(edges == 1)[0] + 1)
+    ends = list(np.nonzero(edges == -1)[0] + 1)
+    if text_rows[0]:
+        starts.insert(0, 0)
+    if text_rows[-1]:
+        ends.append(len(text_rows))
+    
+    lefts, rights = [], []
+    for start, end in zip(starts, ends):
+        columns = np.nonzero(ink[start:end].any(axis=0))[0]
+        if len(columns):
+            lefts.append(columns[0])
+            rights.append(columns[-1])
+    if len(lefts) < 4:
+        return None
+    # A few pixels of spread is scanning noise, not a ragged margin
+    left_spread = float(np.std(lefts)) + 2.0
+    right_spread = float(np.std(rights)) + 2.0
+    if right_spread * 2 < left_spread:
+        return True
+    if left_spread * 2 < right_spread:
+        return False
+    return None
+
+
+def detect_orientation(image: "Image.Image", max_skew: float = 10.0, step: float = 0.5) -> Tuple[int, float]:
+    """
+    Detect how far a page is turned from upright
+    
+    Works on a grayscale copy scaled to 768px: compares the length of
+    bridged ink runs along rows and columns to spot sideways pages, finds
+    small skew within max_skew and checks line margins to tell upright
+    from upside down. A turn is only reported when the evidence for it is
+    clear; otherwise the page is left as it is (rotation 0), since turning
+    an upright page is worse than missing a turned one.
+    
+    Args:
+        image: Page image
+        max_skew: Largest skew angle searched, in degrees
+        step: Skew search step, in degrees
+        
+    Returns:
+        Tuple of (rotation in {0, 90, 180, 270}, skew angle), both counter-clockwise
+        degrees to pass to Image.rotate, rotation first
+    """
+    import numpy as np
+    from PIL import Image
+    
+    scale = ORIENTATION_SIZE / max(image.size)
+    small = image.convert("L").resize(
+        (max(round(image.size[0] * scale), 1), max(round(image.size[1] * scale), 1)), Image.Resampling.BOX
+    )
+    turned = small.transpose(Image.Transpose.ROTATE_90)
+    
+    upright_runs = _row_run_ratio(_ink_mask(np.asarray(small)))
+    turned_runs = _row_run_ratio(_ink_mask(np.asarray(turned)))
+    if turned_runs > upright_runs * 1.5:
+        rotation, small = 90, turned
+    elif upright_runs > turned_runs * 1.5:
+        rotation = 0
+    else:
+        # No clear text direction (photo, drawing, sparse page)
+        return 0, 0.0
+    
+    skew, _ = _best_skew(_ink_mask(np.asarray(small)), max_skew, step)
+    if abs(skew) >= step:
+        small = small.rotate(skew, expand=True, fillcolor=255)
+    upside_down = _is_upside_down(_ink_mask(np.asarray(small)))
+    if upside_down:
+        rotation = (rotation + 180) % 360
+    elif upside_down is None and rotation:
+        # Sideways, but which way is unclear: don't guess
+        return 0, 0.0
+    
+    return rotation, skew
+
+
+def normalize_orientation(image: "Image.Image", max_skew: float = 10.0, min_skew: float = 1.0) -> "Image.Image":
+    """
+    Turn a page upright: apply EXIF orientation, then fix 90/180 turns and small skew
+    
+    Args:
+        image: Page image
+        max_skew: Largest skew angle corrected, in degrees
+        min_skew: Smaller skew is left alone (resampling costs more than it helps)
+        
+    Returns:
+        Upright image (the same object if nothing had to change)
+    """
+    from PIL import Image, ImageOps
+    
+    # Phone cameras store rotation in EXIF instead of rotating the pixels
+    image = ImageOps.exif_transpose(image)
+    
+    rotation, skew = detect_orientation(image, max_skew=max_skew)
+    if abs(skew) < min_skew:
+        skew = 0.0
+    if not rotation and not skew:
+        return image
+    
+    if skew:
+        # One pass for turn and skew together. Nearest-neighbour leaves at most
+        # 1px steps, which vanish when the model scales the page down, and is
+        # ~10x cheaper than bilinear resampling
+        fill = 255 if image.mode == "L" else (255, 255, 255)
+        image = image.rotate(rotation + skew, resample=Image.Resampling.NEAREST, expand=True, fillcolor=fill)
+    else:
+        # Exact multiples of 90 degrees are lossless transposes
+        image = image.rotate(rotation, expand=True)
+    logger.info("Corrected page orientation: rotation=%s, skew=%.1f", rotation, skew)
+    return image
+
+
+def _encode_jpeg_base64(image: "Image.Image") -> str:
+    """Encode an RGB image as base64 JPEG (quality 85)"""
+    # Save to buffer
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    buffer.seek(0)
+    
+    # Encode to base64
+    encoded_bytes = buffer.read()
+    logger.info("JPEG buffer size: %s bytes", len(encoded_bytes))
+    encoded_string = base64.b64encode(encoded_bytes).decode('utf-8')
+    logger.info("Base64 encoded string length: %s", len(encoded_string))
+    
+    return encoded_string
+
+
+@tracing.traced("encode_image")
+def encode_image_to_base64(file_content: bytes, filename: str = "", auto_orient: bool = False) -> str:
     """
     Encode image to base64 string
     
     Args:
         file_content: Binary content of the image
         filename: Optional filename to determine format
+        auto_orient: Detect and fix 90/180-degree turns and skew before encoding
         
     Returns:
         Base64 encoded string
     """
+    from PIL import Image
+    
     try:
-        # Check if file content is empty
-        if not file_content or len(file_content) == 0:
-            raise ValueError("File content is empty")
-        
-        # Check if it's a PDF file
-        is_pdf = file_content[:4] == b'%PDF'
-        
-        if is_pdf:
-            # Convert PDF to image first
-            logger.info("Detected PDF file, converting to image")
-            image = pdf_to_image(file_content)
-        else:
-            # Open image
-            logger.info(f"Encoding image to base64: size={len(file_content)} bytes")
-            image_stream = BytesIO(file_content)
-            image = Image.open(image_stream)
-        
-        # Get original format and size
-        original_format = image.format
+        image = _load_rgb_image(file_content)
         original_size = image.size
-        logger.info(f"Opened image: format={original_format}, size={original_size}, mode={image.mode}")
-        
-        # Convert to RGB if necessary (for PNG with transparency, etc.)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            logger.info(f"Converting image from {image.mode} to RGB")
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
-            image = background
-        elif image.mode != 'RGB':
-            logger.info(f"Converting image from {image.mode} to RGB")
-            image = image.convert('RGB')
+        tracing.set_attributes({
+            "file.bytes": len(file_content),
+            "image.width": image.width,
+            "image.height": image.height,
+            "image.auto_orient": auto_orient,
+        })
         
         # Optimize image size if it's too large
         max_dimension = 2048
@@ -182,22 +477,355 @@ def encode_image_to_base64(file_content: bytes, filename: str = "") -> str:
             ratio = max_dimension / max(image.size)
             new_size = tuple(int(dim * ratio) for dim in image.size)
             image = image.resize(new_size, Image.Resampling.LANCZOS)
-            logger.info(f"Resized image from {original_size} to {new_size}")
+            logger.info("Resized image from %s to %s", original_size, new_size)
         
-        # Save to buffer
-        buffer = BytesIO()
-        image.save(buffer, format='JPEG', quality=85)
-        buffer.seek(0)
-        
-        # Encode to base64
-        encoded_bytes = buffer.read()
-        logger.info(f"JPEG buffer size: {len(encoded_bytes)} bytes")
-        encoded_string = base64.b64encode(encoded_bytes).decode('utf-8')
-        logger.info(f"Base64 encoded string length: {len(encoded_string)}")
+        # Straighten after resizing, rotating fewer pixels
+        if auto_orient:
+            image = normalize_orientation(image)
         
+        encoded_string = _encode_jpeg_base64(image)
+        tracing.set_attributes({
+            "image.encoded_width": image.width,
+            "image.encoded_height": image.height,
+            "image.base64_length": len(encoded_string),
+        })
         return encoded_string
         
     except Exception as e:
-        logger.error(f"Error encoding image to base64: {str(e)}", exc_info=True)
+        logger.error("Error encoding image to base64: %s", e, exc_info=True)
         raise ValueError(f"Failed to encode image: {str(e)}")
 
+
+def encode_image_tiles(
+    file_content: bytes,
+    max_width: int = 2048,
+    overlap: float = 0.15,
+    max_tiles: int = 6,
+    auto_orient: bool = False
+) -> List[str]:
+    """
+    Split a page into overlapping full-width horizontal strips
+    
+    The vision model scales every image so its shorter side is at most 768px,
+    which turns a whole page's small print into a few pixels per character.
+    Strips about twice as wide as they are tall keep close to max_width
+    pixels across, so table rows stay readable. Consecutive strips overlap,
+    so every row is fully visible in at least one of them.
+    
+    Args:
+        file_content: Binary content of the image or PDF
+        max_width: Maximum strip width in pixels
+        overlap: Share of a strip's height repeated in the next strip
+        max_tiles: Upper bound on strips (strips get taller instead)
+        auto_orient: Detect and fix 90/180-degree turns and skew first
+        
+    Returns:
+        Base64 encoded JPEG strips from top to bottom (one item for short pages)
+    """
+    from PIL import Image
+    
+    try:
+        # Render PDFs at print resolution, the regular path uses 150 DPI
+        image = _load_rgb_image(file_content, pdf_dpi=300)
+        if auto_orient:
+            image = normalize_orientation(image)
+        
+        width, height = image.size
+        if width > max_width:
+            ratio = max_width / width
+            image = image.resize((max_width, int(height * ratio)), Image.Resampling.LANCZOS)
+            width, height = image.size
+        
+        strip_height = max(width // 2, 256)
+        step = int(strip_height * (1 - overlap))
+        count = 1 if height <= strip_height else -(-(height - strip_height) // step) + 1
+        if count > max_tiles:
+            # Keep the tile budget: taller strips, same overlap ratio
+            count = max_tiles
+            strip_height = int(height / (count - (count - 1) * overlap))
+            step = int(strip_height * (1 - overlap))
+        
+        tiles = []
+        for index in range(count):
+            top = min(index * step, max(height - strip_height, 0))
+            tiles.append(_encode_jpeg_base64(image.crop((0, top, width, min(top + strip_height, height)))))
+        
+        logger.info("Split %sx%s page into %s strips of %spx", width, height, len(tiles), strip_height)
+        return tiles
+        
+    except Exception as e:
+        logger.error("Error splitting image into tiles: %s", e, exc_info=True)
+        raise ValueError(f"Failed to split image into tiles: {str(e)}")
+
+
+def assess_image_quality(
+    file_content: bytes,
+    min_ink_coverage: float = 0.002,
+    min_sharpness: float = 50.0,
+    min_text_likelihood: float = 0.3,
+    analysis_size: int = 512
+) -> Dict[str, Any]:
+    """
+    Score an upload for blankness, blur and how much it looks like a document
+    
+    Runs on a grayscale copy downsampled to roughly analysis_size (JPEGs are
+    decoded at reduced size directly) and cropped to the largest sheet of
+    paper in it, so it takes a few milliseconds:
+    - ink_coverage: share of pixels clearly darker than the paper
+    - sharpness: variance of the Laplacian (low = blurred or out of focus)
+    - text_likelihood: 0-1 estimate combining a bright paper background,
+      ink in a text-like amount and the alternating rows of text lines
+    
+    Args:
+        file_content: Binary content of the image or PDF
+        min_ink_coverage: Below this the page counts as blank
+        min_sharpness: Below this the image counts as blurry
+        min_text_likelihood: Below this the image doesn't look like a document
+        analysis_size: Approximate long edge of the grayscale copy the scores use
+        
+    Returns:
+        Dictionary with the three scores, "issues" (list of problems found)
+        and "acceptable" (True if there are none)
+    """
+    import numpy as np
+    from PIL import Image
+    
+    if file_content[:4] == b'%PDF':
+        image = pdf_to_image(file_content, dpi=72)
+    else:
+        image = Image.open(BytesIO(file_content))
+        # JPEG decoders can scale by 1/2..1/8 while decoding
+        image.draft("L", (analysis_size, analysis_size))
+    if image.mode in _TRANSPARENT_MODES:
+        image = _composite_on_white(image)
+    image = image.convert("L")
+    # Integer box reduction is far cheaper than resampling to an exact size
+    factor = max(image.size) // analysis_size
+    if factor > 1:
+        image = image.reduce(factor)
+    # Scores describe the page itself, not the table it was photographed on
+    pixels = _paper_region(np.asarray(image))
+    gray = pixels.astype(np.float32)
+    
+    # Paper is the bright end of the histogram; ink is clearly darker than it
+    histogram = np.bincount(pixels.ravel(), minlength=256).cumsum()
+    paper_level = float(np.searchsorted(histogram, 0.9 * histogram[-1]))
+    ink = gray < paper_level - 60
+    ink_coverage = float(ink.mean())
+    paper_fraction = float((gray > paper_level - 25).mean())
+    
+    # 4-neighbour Laplacian
+    laplacian = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+        - 4 * gray[1:-1, 1:-1]
+    )
+    sharpness = float(laplacian.var())
+    
+    # Text lines make the per-row ink share alternate between high and ~0
+    # (per column for pages photographed sideways)
+    line_contrast = max(
+        float(profile.std() / (profile.mean() + 1e-6))
+        for profile in (ink.mean(axis=1), ink.mean(axis=0))
+    )
+    text_likelihood = (
+        0.4 * min(max((paper_fraction - 0.3) / 0.4, 0.0), 1.0)
+        + 0.4 * min(line_contrast / 1.5, 1.0)
+        + 0.2 * (1.0 if 0.005 <= ink_coverage <= 0.35 else 0.0)
+    )
+    
+    issues = []
+    if ink_coverage < min_ink_coverage:
+        issues.append("blank")
+    elif sharpness < min_sharpness:
+        issues.append("blurry")
+    if ink_coverage >= min_ink_coverage and text_likelihood < min_text_likelihood:
+        issues.append("not_a_document")
+    
+    return {
+        "ink_coverage": round(ink_coverage, 4),
+        "sharpness": round(sharpness, 1),
+        "text_likelihood": round(text_likelihood, 3),
+        "issues": issues,
+        "acceptable": not issues,
+    }
+
+
+def _paper_components(gray: "np.ndarray", cell_size: int = 8) -> List[Tuple[int, int, int, int, int]]:
+    """
+    Find sheets of paper on a grid over a grayscale image
+    
+    Cells that are mostly brighter than the Otsu threshold count as paper
+    (text inside a sheet doesn't break it up); 4-connected groups of paper
+    cells are the sheets.
+    
+    Returns:
+        (cell count, top, left, bottom, right) per sheet, in grid cells
+    """
+    import numpy as np
+    
+    # Otsu threshold: maximize between-class variance over the histogram
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = histogram.cumsum()
+    mean = (histogram * levels).cumsum()
+    total_weight, total_mean = weight[-1], mean[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * weight - mean * total_weight) ** 2 / (weight * (total_weight - weight))
+    if np.all(np.isnan(between[:-1])):
+        return []
+    threshold = int(np.nanargmax(between[:-1]))
+    
+    rows, columns = gray.shape[0] // cell_size, gray.shape[1] // cell_size
+    bright = gray[:rows * cell_size, :columns * cell_size] > threshold
+    paper = bright.reshape(rows, cell_size, columns, cell_size).mean(axis=(1, 3)) > 0.5
+    
+    # 4-connected components of the (small) cell grid
+    labels = np.zeros(paper.shape, dtype=np.int32)
+    boxes = []
+    for start in zip(*(indices.tolist() for indices in np.nonzero(paper))):
+        if labels[start]:
+            continue
+        label = len(boxes) + 1
+        labels[start] = label
+        stack = [start]
+        top, left, bottom, right, count = start[0], start[1], start[0], start[1], 0
+        while stack:
+            row, column = stack.pop()
+            count += 1
+            top, bottom = min(top, row), max(bottom, row)
+            left, right = min(left, column), max(right, column)
+            for next_row, next_column in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1)):
+                if 0 <= next_row < rows and 0 <= next_column < columns and paper[next_row, next_column] and not labels[next_row, next_column]:
+                    labels[next_row, next_column] = label
+                    stack.append((next_row, next_column))
+        boxes.append((count, top, left, bottom, right))
+    return boxes
+
+
+def _paper_region(pixels: "np.ndarray", cell_size: int = 8, min_area: float = 0.15) -> "np.ndarray":
+    """
+    Crop a photo to its largest sheet of paper
+    
+    A page photographed on a table is surrounded by background that is
+    darker than the paper and would otherwise count as ink. Scans (paper
+    everywhere) and photos without a clear sheet are returned whole.
+    """
+    import numpy as np
+    
+    rows, columns = pixels.shape[0] // cell_size, pixels.shape[1] // cell_size
+    if rows < 4 or columns < 4:
+        return pixels
+    boxes = _paper_components(pixels, cell_size)
+    if not boxes:
+        return pixels
+    count, top, left, bottom, right = max(boxes)
+    if count < min_area * rows * columns:
+        return pixels
+    # Cells on the sheet's edge may still hold background; keep the inner ones
+    inner = pixels[(top + 1) * cell_size:bottom * cell_size, (left + 1) * cell_size:right * cell_size]
+    if not inner.size:
+        return pixels
+    # A sheet is mostly pixels at its paper level; the bright half of a photo is not
+    histogram = np.bincount(inner.ravel(), minlength=256).cumsum()
+    paper_level = float(np.searchsorted(histogram, 0.9 * histogram[-1]))
+    if (inner > paper_level - 25).mean() < 0.5:
+        return pixels
+    return inner
+
+
+def find_document_regions(
+    image: "Image.Image",
+    min_area: float = 0.03,
+    max_area: float = 0.6,
+    cell_size: int = 8
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Find separate sheets of paper in a photo (e.g. several slips on a table)
+    
+    Works on a grid over a ~512px grayscale copy: cells that are mostly
+    brighter than the Otsu threshold count as paper, and 4-connected groups
+    of paper cells are candidate documents. A photo whose paper is one
+    large area (a scan or a single page) yields no regions.
+    
+    Args:
+        image: Photo with EXIF orientation applied
+        min_area: Smallest region, as a share of the image area
+        max_area: A region this large means the photo shows a single document
+        cell_size: Grid cell size in pixels of the reduced copy
+        
+    Returns:
+        Bounding boxes (left, top, right, bottom) in image pixels in reading
+        order, or an empty list unless at least two documents were found
+    """
+    import numpy as np
+    
+    factor = max(max(image.size) // 512, 1)
+    small = (image.reduce(factor) if factor > 1 else image).convert("L")
+    gray = np.asarray(small)
+    
+    rows, columns = gray.shape[0] // cell_size, gray.shape[1] // cell_size
+    if rows < 4 or columns < 4:
+        return []
+    boxes = _paper_components(gray, cell_size)
+    
+    cells = rows * columns
+    documents = [box for box in boxes if box[0] >= min_area * cells]
+    if len(documents) < 2 or any(box[0] > max_area * cells for box in documents):
+        return []
+    
+    # Back to image pixels, one cell of margin
+    scale = cell_size * factor
+    width, height = image.size
+    regions = [
+        (
+            max((left - 1) * scale, 0),
+            max((top - 1) * scale, 0),
+            min((right + 2) * scale, width),
+            min((bottom + 2) * scale, height),
+        )
+        for _, top, left, bottom, right in documents
+    ]
+    
+    # Reading order: top to bottom in bands of a quarter page, then left to right
+    band = max(height // 4, 1)
+    return sorted(regions, key=lambda box: (box[1] // band, box[0]))
+
+
+def encode_document_regions(
+    file_content: bytes,
+    auto_orient: bool = False
+) -> List[Tuple[Tuple[int, int, int, int], bytes, str]]:
+    """
+    Split a photo of several documents into one encoded image per document
+    
+    Args:
+        file_content: Binary content of the image or PDF
+        auto_orient: Detect and fix 90/180-degree turns and skew of each crop
+        
+    Returns:
+        List of (bounding box, JPEG bytes, base64 string) per document, empty
+        if the photo shows a single document
+    """
+    from PIL import Image
+    
+    try:
+        image = _load_rgb_image(file_content)
+        regions = find_document_regions(image)
+        
+        documents = []
+        for box in regions:
+            crop = image.crop(box)
+            if max(crop.size) > 2048:
+                crop.thumbnail((2048, 2048), Image.Resampling.LANCZOS)
+            if auto_orient:
+                crop = normalize_orientation(crop)
+            encoded = _encode_jpeg_base64(crop)
+            documents.append((box, base64.b64decode(encoded), encoded))
+        
+        if documents:
+            logger.info("Found %s documents in one image: %s", len(documents), regions)
+        return documents
+        
+    except Exception as e:
+        logger.error("Error splitting image into documents: %s", e, exc_info=True)
+        raise ValueError(f"Failed to split image into documents: {str(e)}")
@@ -0,0 +1,54 @@
+"""Fast JSON serialization helpers"""
+
+import json
+from typing import Any, Callable, Optional
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def dumps(content: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Serialize content straight to UTF-8 JSON bytes
+
+    Uses orjson when available (Enum, datetime and dataclass values are
+    handled natively) and falls back to the standard library otherwise.
+
+    Args:
+        content: JSON-compatible content
+        default: Converts values of other types (default: error with orjson, str otherwise)
+
+    Returns:
+        Encoded JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=default or str).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """Deserialize JSON bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ORJSONResponse(Response):
+    """
+    JSON response rendered with orjson
+
+    Returning this from an endpoint bypasses FastAPI's response_model
+    re-validation and jsonable_encoder pass, so content must already be
+    validated. Pre-encoded bytes are sent as-is.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,195 @@
+"""Asynchronous JSON logging: records are queued on the caller's thread and written by a listener thread"""
+
+import atexit
+import copy
+import logging
+import os
+import queue
+import random
+import reprlib
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+JSON_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+# Bounded repr of logged payloads (parsed documents, model responses)
+_payload_repr = reprlib.Repr()
+_payload_repr.maxstring = 200
+_payload_repr.maxother = 200
+_payload_repr.maxlevel = 4
+_payload_repr.maxdict = 20
+_payload_repr.maxlist = 20
+
+
+class _Capped:
+    """Payload rendered only if the record is emitted, and at most limit characters long"""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = self.value if isinstance(self.value, str) else _payload_repr.repr(self.value)
+        if len(text) > self.limit:
+            return f"{text[:self.limit]}... ({len(text)} chars)"
+        return text
+
+    __repr__ = __str__
+
+
+def capped(value: Any, limit: int = 1000) -> _Capped:
+    """
+    Wrap a payload logged with %s so it is size-capped and only rendered when emitted
+
+    Example:
+        logger.debug("Raw data extracted: %s", capped(raw_data))
+    """
+    return _Capped(value, limit)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "app.utils.image_utils=0.1,app.services.openai_service=0.5" into logger rates"""
+    rates = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a share of the INFO and DEBUG records of chosen loggers
+
+    A rate applies to a logger and its children; the most specific name
+    wins. Warnings and errors always pass.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._by_logger: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class ProcessQueueHandler(QueueHandler):
+    """
+    Queue handler with a listener thread per process
+
+    The message is formatted on the caller's thread (arguments may change
+    after the call) and capped at max_message_length; JSON rendering and
+    writing happen on the listener thread. After a fork (gunicorn
+    preload_app) the child starts its own listener on first use.
+    """
+
+    def __init__(self, target: logging.Handler, max_message_length: int = 0):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self.max_message_length = max_message_length
+        self.listener: Optional[QueueListener] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def _start_listener(self) -> None:
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A queue inherited through fork has no reader; start over with a new one
+            self.queue = queue.SimpleQueue()
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write the queued records and stop the listener thread"""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if self.max_message_length and len(message) > self.max_message_length:
+            message = f"{message[:self.max_message_length]}... ({len(message)} chars)"
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames alive; render them now
+            record.exc_text = self.target.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._pid != os.getpid():
+            self._start_listener()
+        self.queue.put_nowait(record)
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    sample_rates: str = "",
+    max_message_length: int = 2000,
+    stream=None
+) -> ProcessQueueHandler:
+    """
+    Route all logging through a queue to a background writer
+
+    Args:
+        level: Root log level
+        log_format: "json" (one object per line) or "text"
+        sample_rates: Per-logger shares of INFO/DEBUG records to keep, e.g. "app.utils.image_utils=0.1"
+        max_message_length: Longest message written; longer ones are cut (0 = no limit)
+        stream: Output stream (default: stderr)
+
+    Returns:
+        The root logger's queue handler
+    """
+    target = logging.StreamHandler(stream or sys.stderr)
+    if log_format == "json":
+        from pythonjsonlogger.json import JsonFormatter
+
+        target.setFormatter(JsonFormatter(JSON_FORMAT))
+    else:
+        target.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    handler = ProcessQueueHandler(target, max_message_length)
+    rates = parse_sample_rates(sample_rates)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+        if isinstance(old_handler, ProcessQueueHandler):
+            old_handler.stop()
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level.upper()))
+    return handler
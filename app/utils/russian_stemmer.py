@@ -0,0 +1,137 @@
+"""Russian word stemming and tokenization for search"""
+
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Snowball Russian stemmer (https://snowballstem.org/algorithms/russian/stemmer.html)
+# without the verb step: in medical text "-ит" ends a noun (бронхит, гастрит)
+# far more often than a verb, and stripping it would stem "бронхит" to
+# "бронх" but "бронхита" to "бронхит"
+_VOWELS = frozenset("аеиоуыэюя")
+
+# Endings of the first group only count after "а" or "я"
+_PERFECTIVE_GERUND = (("в", "вши", "вшись"), ("ив", "ивши", "ившись", "ыв", "ывши", "ывшись"))
+_ADJECTIVE = ((), (
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+))
+_PARTICIPLE = (("ем", "нн", "вш", "ющ", "щ"), ("ивш", "ывш", "ующ"))
+_REFLEXIVE = ((), ("ся", "сь"))
+_NOUN = ((), (
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей", "ой", "ий", "й",
+    "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+))
+_SUPERLATIVE = ((), ("ейше", "ейш"))
+_DERIVATIONAL = ((), ("ость", "ост"))
+
+
+def _by_length(endings: Tuple[Tuple[str, ...], Tuple[str, ...]]) -> List[Tuple[str, bool]]:
+    """Flatten an ending class to (ending, needs "а"/"я" before it), longest first"""
+    flat = [(ending, True) for ending in endings[0]] + [(ending, False) for ending in endings[1]]
+    return sorted(flat, key=lambda item: -len(item[0]))
+
+
+_CLASSES = {
+    name: _by_length(endings) for name, endings in (
+        ("perfective_gerund", _PERFECTIVE_GERUND), ("adjective", _ADJECTIVE), ("participle", _PARTICIPLE),
+        ("reflexive", _REFLEXIVE), ("noun", _NOUN),
+        ("superlative", _SUPERLATIVE), ("derivational", _DERIVATIONAL),
+    )
+}
+
+
+def _strip(region: str, name: str) -> Optional[str]:
+    """Remove the longest ending of a class from a region, or None if the class doesn't match"""
+    for ending, after_a in _CLASSES[name]:
+        if region.endswith(ending):
+            rest = region[:-len(ending)]
+            if after_a and not rest.endswith(("а", "я")):
+                return None
+            return rest
+    return None
+
+
+def _region_start(word: str, start: int) -> int:
+    """Index after the first non-vowel that follows a vowel, from start"""
+    for index in range(start + 1, len(word)):
+        if word[index] not in _VOWELS and word[index - 1] in _VOWELS:
+            return index + 1
+    return len(word)
+
+
+@lru_cache(maxsize=100_000)
+def stem(word: str) -> str:
+    """
+    Reduce a lowercase Russian word to its stem (Snowball algorithm without the verb step)
+
+    "ферритина", "ферритином" and "ферритин" all become "ферритин", so
+    any inflected form of a term finds the others.
+
+    Args:
+        word: Lowercase word
+
+    Returns:
+        Stem (the word itself for non-Cyrillic or very short words)
+    """
+    word = word.replace("ё", "е")
+    rv = next((index + 1 for index, char in enumerate(word) if char in _VOWELS), len(word))
+    r2 = _region_start(word, _region_start(word, 0))
+    prefix, region = word[:rv], word[rv:]
+
+    # Step 1: a perfective gerund, or else reflexive + adjectival/noun endings
+    stripped = _strip(region, "perfective_gerund")
+    if stripped is not None:
+        region = stripped
+    else:
+        stripped = _strip(region, "reflexive")
+        if stripped is not None:
+            region = stripped
+        stripped = _strip(region, "adjective")
+        if stripped is not None:
+            participle = _strip(stripped, "participle")
+            region = participle if participle is not None else stripped
+        else:
+            stripped = _strip(region, "noun")
+            if stripped is not None:
+                region = stripped
+
+    # Step 2
+    if region.endswith("и"):
+        region = region[:-1]
+
+    # Step 3: derivational ending within R2
+    stripped = _strip(region, "derivational")
+    if stripped is not None and rv + len(stripped) >= r2:
+        region = stripped
+
+    # Step 4
+    if region.endswith("нн"):
+        region = region[:-1]
+    else:
+        stripped = _strip(region, "superlative")
+        if stripped is not None:
+            region = stripped[:-1] if stripped.endswith("нн") else stripped
+        elif region.endswith("ь"):
+            region = region[:-1]
+
+    return prefix + region
+
+
+_WORD = re.compile(r"[0-9a-zа-яё]+")
+_CYRILLIC = re.compile(r"[а-яё]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words with "ё" folded to "е" """
+    return _WORD.findall(text.lower().replace("ё", "е"))
+
+
+def stem_tokens(text: str) -> List[str]:
+    """
+    Tokenize text and stem its Russian words
+
+    Latin words and numbers are not stemmed, so lab codes such as
+    "HbA1c" or "TSH" match exactly.
+    """
+    return [stem(token) if _CYRILLIC.search(token) else token for token in tokenize(text)]
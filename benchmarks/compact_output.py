@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Output size benchmark: regular JSON vs compact table format
+
+For lab reports with a growing number of test results and prescriptions
+with a growing number of medications, compares the model output the
+extraction asks for in each format:
+- output tokens (tiktoken o200k_base if installed, else the service's
+  characters-per-token estimate)
+- generation time at a given decode speed (output tokens / tokens per second)
+- time to expand the compact output back into the schema structure
+
+The repository has no recorded model responses, so outputs are synthetic
+but shaped like real ones (Russian values, the schema's keys). Pass
+--samples DIR with saved regular-JSON responses (*.json, one extraction per
+file with a "test_results" or "medications" array) to measure those instead.
+
+Usage:
+    python benchmarks/compact_output.py [--sizes 5,20,50,100] [--tokens-per-second 60] [--samples DIR]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.schemas import LabReportSchema, PrescriptionSchema  # noqa: E402
+from app.services.compact_output import CompactOutputFormat  # noqa: E402
+from app.services.rate_limiter import estimate_text_tokens  # noqa: E402
+
+
+def token_counter():
+    """Get (name, count function) for output tokens"""
+    try:
+        import tiktoken
+    except ImportError:
+        return "estimate (len / 2.5)", estimate_text_tokens
+    encoding = tiktoken.get_encoding("o200k_base")
+    return "tiktoken o200k_base", lambda text: len(encoding.encode(text))
+
+
+def make_lab_report(test_count: int) -> dict:
+    """Build a regular-format lab report extraction with test_count results"""
+    return {
+        "summary": "Общий анализ крови и биохимия: большинство показателей в норме",
+        "patient_name": "Иванов Иван Иванович",
+        "patient_age": 45,
+        "patient_id": "P123456",
+        "visit_date": "2025-10-15",
+        "report_date": "2025-10-16",
+        "collection_date": "2025-10-15",
+        "lab_info": {"lab_name": "Городской диагностический центр", "lab_location": "ул. Ленина, 1", "lab_contact": None},
+        "doctor_name": "Петров П.П.",
+        "test_results": [
+            {
+                "test_name": f"Показатель {i}",
+                "result_value": f"{100 + i * 0.5:.1f}",
+                "unit": "г/л",
+                "reference_range": "120-160"
+            }
+            for i in range(test_count)
+        ],
+        "notes": None
+    }
+
+
+def make_prescription(medication_count: int) -> dict:
+    """Build a regular-format prescription extraction with medication_count medications"""
+    return {
+        "summary": "Рецепт на антибактериальную терапию",
+        "patient_name": "Иванов Иван Иванович",
+        "patient_age": 45,
+        "patient_contact": None,
+        "doctor_name": "Петров П.П.",
+        "doctor_specialty": "Терапевт",
+        "doctor_contact": None,
+        "visit_date": "2025-10-15",
+        "prescription_date": "2025-10-15",
+        "validity_date": None,
+        "medications": [
+            {
+                "name": f"Препарат {i}",
+                "dosage": "500 мг",
+                "frequency": "3 раза в день",
+                "duration": "7 дней",
+                "instructions": "после еды" if i % 2 else None
+            }
+            for i in range(medication_count)
+        ],
+        "diagnosis": "Острый бронхит",
+        "notes": None
+    }
+
+
+def to_compact(data: dict, schema_class) -> dict:
+    """Rewrite a regular extraction the way the model writes it in compact format"""
+    compact = dict(data)
+    for name, columns in CompactOutputFormat.table_fields(schema_class).items():
+        rows = data.get(name)
+        if rows:
+            compact[name] = [columns] + [[row.get(column) for column in columns] for row in rows]
+    return compact
+
+
+def measure(label: str, data: dict, schema_class, count_tokens, tokens_per_second: float) -> None:
+    """Print one comparison row"""
+    # The model writes compact JSON without indentation in both formats
+    regular_text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    compact_text = json.dumps(to_compact(data, schema_class), ensure_ascii=False, separators=(",", ":"))
+
+    expanded = CompactOutputFormat.expand(json.loads(compact_text), schema_class)
+    assert schema_class.model_validate(expanded).model_dump() == schema_class.model_validate(data).model_dump()
+
+    repeat = 200
+    start = time.perf_counter()
+    for _ in range(repeat):
+        CompactOutputFormat.expand(json.loads(compact_text), schema_class)
+    expand_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    regular = count_tokens(regular_text)
+    compact = count_tokens(compact_text)
+    print(
+        f"{label:<24} {regular:>8} {compact:>8} {1 - compact / regular:>7.0%} "
+        f"{regular / tokens_per_second:>9.1f} {compact / tokens_per_second:>9.1f} {expand_ms:>9.3f}"
+    )
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark compact extraction output")
+    parser.add_argument("--sizes", default="5,20,50,100", help="Comma-separated row counts")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Model decode speed")
+    parser.add_argument("--samples", help="Directory with recorded regular-JSON extractions")
+    args = parser.parse_args()
+
+    counter_name, count_tokens = token_counter()
+    print(f"Token counter: {counter_name}, decode speed: {args.tokens_per_second:.0f} tokens/s")
+    print(f"{'sample':<24} {'json tok':>8} {'cmp tok':>8} {'saved':>7} {'json s':>9} {'cmp s':>9} {'expand ms':>9}")
+
+    if args.samples:
+        for path in sorted(Path(args.samples).glob("*.json")):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            schema_class = LabReportSchema if "test_results" in data else PrescriptionSchema
+            measure(path.name[:24], data, schema_class, count_tokens, args.tokens_per_second)
+        return
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        measure(f"lab_report x{size}", make_lab_report(size), LabReportSchema, count_tokens, args.tokens_per_second)
+    for size in (int(s) for s in args.sizes.split(",")):
+        measure(f"prescription x{size}", make_prescription(size), PrescriptionSchema, count_tokens, args.tokens_per_second)
+
+
+if __name__ == "__main__":
+    main()
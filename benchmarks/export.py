@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Export throughput benchmark
+
+Encodes --rows synthetic rows shaped like v_lab_report_details (ids,
+patient names, dates, test names, values, ranges, statuses, timestamps)
+in batches of --batch-size, the way the exporter writes them, and reports
+rows/sec, output size and the process's peak RSS after each format. RSS
+stays flat as --rows grows because only one batch is held at a time.
+Formats whose library is missing are skipped.
+
+With --database-url the rows are read from a real database instead, so
+the numbers include the server-side cursor.
+
+Usage:
+    python benchmarks/export.py [--rows 1000000] [--batch-size 10000] [--database-url postgresql://...]
+"""
+
+import argparse
+import datetime
+import decimal
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.exporter import FORMATS, Exporter, encode_batches  # noqa: E402
+
+COLUMNS = [
+    "lab_report_id", "patient_name", "patient_age", "report_date", "lab_name", "test_name",
+    "result_value", "unit", "reference_range", "status", "processed_at", "confidence",
+]
+# PostgreSQL type OIDs of the view's columns
+TYPE_CODES = [23, 1043, 23, 1082, 1043, 1043, 1043, 1043, 1043, 1043, 1114, 1700]
+TESTS = [("Гемоглобин", "г/л", "120-160"), ("Глюкоза", "ммоль/л", "3.9-6.1"), ("Лейкоциты", "10^9/л", "4.0-9.0")]
+
+
+def synthetic_batches(rows: int, batch_size: int):
+    """Batches of synthetic lab result rows (ten distinct batches, repeated, so generating them isn't measured)"""
+    rng = random.Random(0)
+    base_day = datetime.date(2025, 1, 1)
+    base_time = datetime.datetime(2025, 1, 1)
+    pool = []
+    for offset in range(0, min(rows, 10 * batch_size), batch_size):
+        batch = []
+        for number in range(offset, min(offset + batch_size, rows)):
+            test_name, unit, reference_range = TESTS[number % len(TESTS)]
+            batch.append((
+                number // 8, f"Пациент {number // 40:07d}", rng.randint(18, 90),
+                base_day + datetime.timedelta(days=number % 365), "Городская лаборатория", test_name,
+                f"{rng.uniform(3, 160):.1f}", unit, reference_range, "normal",
+                base_time + datetime.timedelta(seconds=number), decimal.Decimal("0.95"),
+            ))
+        pool.append(batch)
+    for index, offset in enumerate(range(0, rows, batch_size)):
+        yield pool[index % len(pool)][:rows - offset]
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def available(export_format: str) -> bool:
+    """Whether the format's library is installed"""
+    if export_format != "parquet":
+        return True
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark export encoding throughput")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--dataset", default="lab_results")
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    for export_format in FORMATS:
+        if not available(export_format):
+            print(f"{export_format:<8} skipped (pyarrow not installed)")
+            continue
+        start = time.perf_counter()
+        size = 0
+        rows = [0]
+        if args.database_url:
+            exporter = Exporter(args.database_url, batch_size=args.batch_size)
+            chunks = exporter.stream(args.dataset, export_format, progress=lambda count: rows.__setitem__(0, count))
+        else:
+            rows[0] = args.rows
+            chunks = encode_batches(COLUMNS, synthetic_batches(args.rows, args.batch_size), export_format, TYPE_CODES)
+        for chunk in chunks:
+            size += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{export_format:<8} {rows[0] / elapsed:>10,.0f} rows/s  {size / 2**20:8,.1f} MB  "
+            f"peak RSS {max_rss_mb():6,.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
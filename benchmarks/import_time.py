@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Import-time benchmark for the API process
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+reports the total import time and the slowest top-level imports.
+
+Usage:
+    python benchmarks/import_time.py [module] [--top N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(module: str) -> Tuple[int, List[Tuple[int, int, str]]]:
+    """
+    Import a module in a fresh interpreter with -X importtime
+
+    Args:
+        module: Module to import
+
+    Returns:
+        Tuple of (cumulative microseconds for the module, [(self_us, cumulative_us, name), ...])
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    rows = []
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+        if name.strip() == module:
+            total = int(cumulative_us)
+    return total, rows
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to show")
+    parser.add_argument("--runs", type=int, default=5, help="Number of measured runs")
+    args = parser.parse_args()
+
+    # Warm-up run compiles bytecode so it doesn't skew the numbers
+    measure(args.module)
+
+    totals = []
+    rows: List[Tuple[int, int, str]] = []
+    for _ in range(args.runs):
+        total, rows = measure(args.module)
+        totals.append(total / 1000)
+
+    print(f"import {args.module}: median {statistics.median(totals):.1f} ms "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}, runs={args.runs})")
+
+    # Slowest packages directly below the measured module
+    depth: Dict[str, int] = {}
+    for _, cumulative_us, name in rows:
+        depth[name.strip()] = len(name) - len(name.lstrip())
+    top_level = min(depth.values()) if depth else 0
+    direct = [
+        (cumulative_us, name.strip())
+        for _, cumulative_us, name in rows
+        if len(name) - len(name.lstrip()) <= top_level + 2
+    ]
+    print(f"\nSlowest imports (cumulative):")
+    for cumulative_us, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    heavy = [name for name in ("fitz", "PIL", "openai", "numpy") if name in depth]
+    print(f"\nHeavy dependencies loaded at import: {', '.join(heavy) if heavy else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
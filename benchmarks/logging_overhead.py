@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Logging overhead benchmark for the analyze request path
+
+Runs the request path without the network: image validation of a page,
+classification and a lab report extraction of --tests results through a
+fake model client. Every log call of the real code runs. Image encoding
+is done once up front, so its cost doesn't hide the logging cost.
+Compares the time spent on the calling thread (the event loop in the
+API) per request for:
+- previous setup: logging.basicConfig, writing text synchronously at INFO
+- queued JSON logging at INFO (rendering and writing on the listener thread)
+- the same with 10% of the per-request INFO messages sampled
+- queued JSON logging at WARNING (INFO calls only cost a level check)
+- no logging at all (baseline)
+
+Each setup writes to two sinks: a file, and a slow pipe whose writes block
+for --sink-latency-us, like stdout when the log collector falls behind.
+
+Usage:
+    python benchmarks/logging_overhead.py [--requests 500] [--tests 40] [--sink-latency-us 200]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.schemas.base import DocumentType  # noqa: E402
+from app.services.document_classifier import DocumentClassifier  # noqa: E402
+from app.services.document_parser import DocumentParser  # noqa: E402
+from app.utils import encode_image_to_base64, validate_image  # noqa: E402
+from app.utils.logging_utils import TEXT_FORMAT, configure_logging  # noqa: E402
+
+# Loggers of every-request INFO messages, sampled in the "hot paths" setup
+HOT_LOGGERS = "app.utils.image_utils=0.1,app.services.document_classifier=0.1,app.services.document_parser=0.1"
+
+
+class SlowSink:
+    """Stream whose writes block, like a full pipe to a log collector"""
+
+    def __init__(self, stream, latency_seconds: float):
+        self.stream = stream
+        self.latency_seconds = latency_seconds
+
+    def write(self, text: str) -> int:
+        time.sleep(self.latency_seconds)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class FakeOpenAIService:
+    """Model client answering instantly with a fixed lab report"""
+
+    def __init__(self, test_count: int):
+        self.report = {
+            "summary": "Общий анализ крови",
+            "patient_name": "Иванов Иван Иванович",
+            "report_date": "2025-10-16",
+            "lab_info": {"lab_name": "Инвитро"},
+            "test_results": [
+                {"test_name": f"Показатель {index}", "result_value": "4.5", "unit": "г/л", "reference_range": "4.0-5.5"}
+                for index in range(test_count)
+            ],
+        }
+
+    async def classify_document(self, base64_image, tenant, priority):
+        return {"document_type": "lab_report", "confidence": 0.95}
+
+    async def extract_structured_data(self, **kwargs):
+        return dict(self.report)
+
+
+def make_page() -> bytes:
+    """A 1200x1600 JPEG page"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (1200, 1600), "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(40):
+        draw.text((80, 60 + row * 36), f"Показатель {row}    4.5    г/л    4.0-5.5", fill="black")
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def request(page: bytes, base64_image: str, classifier: DocumentClassifier, parser: DocumentParser) -> None:
+    """One analyze request, minus the network and image encoding"""
+    validate_image(page, 10 * 1024 * 1024, ["jpg"])
+    document_type, _ = await classifier.classify(base64_image)
+    await parser.parse(base64_image, DocumentType(document_type))
+
+
+def measure(page: bytes, requests: int, test_count: int) -> float:
+    """Mean milliseconds per request on the calling thread"""
+    service = FakeOpenAIService(test_count)
+    classifier, parser = DocumentClassifier(service), DocumentParser(service)
+    base64_image = encode_image_to_base64(page, "page.jpg")
+
+    async def run() -> float:
+        for _ in range(5):
+            await request(page, base64_image, classifier, parser)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await request(page, base64_image, classifier, parser)
+        return (time.perf_counter() - start) * 1000 / requests
+
+    return asyncio.run(run())
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark logging overhead of the analyze request path")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--tests", type=int, default=40)
+    parser.add_argument("--sink-latency-us", type=float, default=200)
+    args = parser.parse_args()
+
+    page = make_page()
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(logging.CRITICAL + 1)
+    baseline = measure(page, args.requests, args.tests)
+    print(f"no logging: {baseline:.3f} ms/request")
+    print(f"{'':<34} {'file':>10} {'slow pipe':>10}   (logging overhead, ms/request)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_file = open(Path(directory) / "app.log", "w", encoding="utf-8")
+        sinks = [log_file, SlowSink(log_file, args.sink_latency_us / 1e6)]
+
+        overheads = []
+        for sink in sinks:
+            root.handlers.clear()
+            handler = logging.StreamHandler(sink)
+            handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            root.addHandler(handler)
+            root.setLevel(logging.INFO)
+            overheads.append(measure(page, args.requests, args.tests) - baseline)
+        print(f"{'basicConfig text, INFO (previous)':<34} {overheads[0]:10.3f} {overheads[1]:10.3f}")
+
+        setups = [
+            ("queued JSON, INFO", "INFO", ""),
+            ("queued JSON, INFO, hot paths 10%", "INFO", HOT_LOGGERS),
+            ("queued JSON, WARNING", "WARNING", ""),
+        ]
+        for label, level, sample_rates in setups:
+            overheads = []
+            for sink in sinks:
+                handler = configure_logging(level, "json", sample_rates=sample_rates, stream=sink)
+                overheads.append(measure(page, args.requests, args.tests) - baseline)
+                handler.stop()
+            print(f"{label:<34} {overheads[0]:10.3f} {overheads[1]:10.3f}")
+        log_file.close()
+
+
+if __name__ == "__main__":
+    main()
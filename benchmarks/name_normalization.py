@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Name normalization benchmark
+
+Generates --names lab test and medication names the way they come out of
+extraction: dictionary synonyms drawn with a Zipf-like skew (a few tests
+dominate real reports), varied case, codes in parentheses, qualifiers such
+as "в крови", doses and dosage forms, one-letter typos and about 10% names
+that aren't in the dictionary. Reports:
+- dictionary build time
+- lookup cost per name without the cache (every name resolved) and with it
+- share of names mapped to the code they were generated from
+
+Usage:
+    python benchmarks/name_normalization.py [--names 100000] [--seed 0]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.name_normalizer import DEFAULT_DICTIONARY_PATH, LAB_TESTS, MEDICATIONS, NameNormalizer  # noqa: E402
+
+UNKNOWN = [
+    "Гомоцистеин", "Цинк", "Антитела к глиадину", "Кортизол", "Пролактин", "Тестостерон", "Инсулин",
+    "Ингавирин", "Арбидол", "Мирамистин", "Энтерофурил", "Смекта", "Линекс", "Кагоцел",
+]
+QUALIFIERS = {LAB_TESTS: ["в крови", "в сыворотке", "общий", "(кровь)"], MEDICATIONS: ["500 мг", "табл.", "20 мг капс.", "форте"]}
+ALPHABET = "абвгдеиклмнопрстуэ"
+
+
+def typo(name: str, rng: random.Random) -> str:
+    """Replace, drop or double one letter of a long word"""
+    words = name.split()
+    index = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[index]
+    if len(word) < 6:
+        return name
+    position = rng.randrange(1, len(word) - 1)
+    edit = rng.random()
+    if edit < 0.4:
+        word = word[:position] + rng.choice(ALPHABET) + word[position + 1:]
+    elif edit < 0.7:
+        word = word[:position] + word[position + 1:]
+    else:
+        word = word[:position] + word[position] + word[position:]
+    words[index] = word
+    return " ".join(words)
+
+
+def make_names(dictionary, count: int, rng: random.Random):
+    """Generate (kind, name, expected code or None) samples"""
+    entries = {
+        kind: [(code, name) for code, names in dictionary[kind].items() for name in names]
+        for kind in (LAB_TESTS, MEDICATIONS)
+    }
+    weights = {kind: [1 / (rank + 1) for rank in range(len(items))] for kind, items in entries.items()}
+    samples = []
+    for _ in range(count):
+        kind = LAB_TESTS if rng.random() < 0.7 else MEDICATIONS
+        if rng.random() < 0.1:
+            samples.append((kind, rng.choice(UNKNOWN), None))
+            continue
+        code, name = rng.choices(entries[kind], weights[kind])[0]
+        variant = rng.random()
+        if variant < 0.2:
+            name = name.upper()
+        elif variant < 0.35:
+            name = name.lower()
+        if rng.random() < 0.3:
+            name = f"{name} {rng.choice(QUALIFIERS[kind])}"
+        if kind == LAB_TESTS and rng.random() < 0.15:
+            name = f"{name} ({code})"
+        if rng.random() < 0.1:
+            name = typo(name, rng)
+        samples.append((kind, name, code))
+    return samples
+
+
+def run(normalizer: NameNormalizer, samples, cached: bool):
+    """Look up every sample; return per-name timings in microseconds and the number of correct codes"""
+    timings, correct = [], 0
+    for kind, name, expected in samples:
+        if not cached:
+            normalizer._cache.clear()
+        start = time.perf_counter()
+        code = normalizer.lookup(kind, name)
+        timings.append((time.perf_counter() - start) * 1e6)
+        correct += code == expected
+    timings.sort()
+    return timings, correct
+
+
+def report(label: str, timings, correct: int, total: int) -> None:
+    """Print latency percentiles and accuracy"""
+    pick = lambda share: timings[min(int(len(timings) * share), len(timings) - 1)]  # noqa: E731
+    print(
+        f"{label:<22} mean {sum(timings) / len(timings):7.1f} us  p50 {pick(0.5):7.1f} us  "
+        f"p99 {pick(0.99):8.1f} us  correct {correct / total:6.1%}"
+    )
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark lab test and medication name normalization")
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    normalizer = NameNormalizer.load()
+    print(f"Dictionary built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    with open(DEFAULT_DICTIONARY_PATH, encoding="utf-8") as handle:
+        dictionary = json.load(handle)
+    samples = make_names(dictionary, args.names, random.Random(args.seed))
+    print(f"Names: {len(samples):,} ({len(set(name for _, name, _ in samples)):,} distinct)")
+
+    report("uncached", *run(normalizer, samples, cached=False), len(samples))
+    normalizer._cache.clear()
+    report("cached (first pass)", *run(normalizer, samples, cached=True), len(samples))
+    report("cached (second pass)", *run(normalizer, samples, cached=True), len(samples))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Search index benchmark
+
+Indexes a synthetic corpus of extracted documents (lab reports with
+Russian test names, prescriptions and visit summaries with diagnoses,
+diagnostic findings; every document belongs to one of --patients patients)
+and reports:
+- indexing throughput and index size on disk
+- search latency (p50/p95/p99) for rare and common terms, multi-word
+  queries, inflected forms and per-patient queries
+
+Building the default 1M-document index takes several minutes; the index
+file is kept (--path) and reused on the next run unless --rebuild is given.
+
+Usage:
+    python benchmarks/search_index.py [--documents 1000000] [--queries 200] [--path /tmp/search_bench.db] [--rebuild]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.search_index import SearchIndex  # noqa: E402
+
+COMMON_TESTS = ["Гемоглобин", "Эритроциты", "Лейкоциты", "Тромбоциты", "Глюкоза", "СОЭ", "Холестерин общий"]
+RARE_TESTS = ["Ферритин", "Трансферрин", "Прокальцитонин", "Гомоцистеин", "Антитела к ТПО", "Витамин B12", "HbA1c"]
+DIAGNOSES = [
+    "Железодефицитная анемия", "Острый бронхит", "Сахарный диабет 2 типа", "Артериальная гипертензия",
+    "Хронический гастрит", "Внебольничная пневмония", "Гипотиреоз", "Остеохондроз поясничного отдела",
+]
+FINDINGS = [
+    "Очаговых изменений в легких не выявлено", "Признаки пневмонии в нижней доле правого легкого",
+    "Умеренные дегенеративные изменения позвоночника", "Печень не увеличена, структура однородная",
+]
+SURNAMES = ["Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков", "Морозов"]
+NAMES = ["Иван", "Анна", "Сергей", "Мария", "Алексей", "Ольга", "Дмитрий", "Елена"]
+
+
+def patient_names(count: int, rng: random.Random):
+    """Distinct synthetic patient names"""
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(SURNAMES)} {rng.choice(NAMES)} {rng.randrange(10**6):06d}")
+    return sorted(names)
+
+
+def make_document(rng: random.Random, patients):
+    """One synthetic extraction as (document_type, data)"""
+    patient = rng.choice(patients)
+    kind = rng.random()
+    if kind < 0.5:
+        tests = rng.sample(COMMON_TESTS, rng.randint(3, 7))
+        if rng.random() < 0.05:
+            tests.append(rng.choice(RARE_TESTS))
+        return "lab_report", {
+            "patient_name": patient,
+            "report_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "summary": "Показатели " + ("в пределах нормы" if rng.random() < 0.7 else "с отклонениями от нормы"),
+            "test_results": [{"test_name": name} for name in tests],
+        }
+    if kind < 0.8:
+        return "doctor_visit", {
+            "patient_name": patient,
+            "visit_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "summary": "Консультация терапевта, жалобы на слабость",
+            "diagnosis": rng.choice(DIAGNOSES),
+        }
+    return "diagnostic_results", {
+        "patient_name": patient,
+        "study_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "summary": "Рентгенография органов грудной клетки",
+        "findings_summary": rng.choice(FINDINGS),
+    }
+
+
+def build(index: SearchIndex, count: int, rng: random.Random, patients) -> None:
+    """Index count documents and print throughput"""
+    start = time.perf_counter()
+    conn = index._connection()
+    batch = 10_000
+    for offset in range(0, count, batch):
+        # Bulk load in large transactions; the service indexes one document per transaction
+        conn.execute("BEGIN")
+        for number in range(offset, min(offset + batch, count)):
+            document_type, data = make_document(rng, patients)
+            fields = index.extract_fields(data)
+            values = index._fts_values(fields, data["patient_name"], document_type)
+            cursor = conn.execute(
+                "INSERT INTO documents (document_id, document_type, patient_name, document_date, filename, indexed_at, fields) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (f"doc-{number}", document_type, data["patient_name"], None, None, time.time(), json.dumps(fields, ensure_ascii=False))
+            )
+            conn.execute(
+                "INSERT INTO documents_fts (rowid, summary, diagnosis, findings, tests, raw_text, patient, document_type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (cursor.lastrowid, *values)
+            )
+        conn.execute("COMMIT")
+        done = min(offset + batch, count)
+        elapsed = time.perf_counter() - start
+        print(f"\rIndexed {done}/{count} ({done / elapsed:,.0f} docs/s)", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+
+
+def measure(label: str, queries, index: SearchIndex) -> None:
+    """Print latency percentiles of a query set"""
+    timings, hits = [], 0
+    for query, patient in queries:
+        start = time.perf_counter()
+        results = index.search(query, patient=patient)
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += len(results)
+    timings.sort()
+    pick = lambda share: timings[min(int(len(timings) * share), len(timings) - 1)]  # noqa: E731
+    print(
+        f"{label:<34} p50 {statistics.median(timings):7.2f} ms  p95 {pick(0.95):7.2f} ms  "
+        f"p99 {pick(0.99):7.2f} ms  avg hits {hits / len(queries):5.1f}"
+    )
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the full-text search index")
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--path", default="/tmp/search_bench.db")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patients = patient_names(args.patients, rng)
+    if args.rebuild:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+    index = SearchIndex(args.path)
+    existing = index.count()
+    if existing != args.documents:
+        if existing:
+            sys.exit(f"{args.path} holds {existing} documents; pass --rebuild")
+        build(index, args.documents, rng, patients)
+
+    size_mb = os.path.getsize(args.path) / 2**20
+    print(f"Documents: {index.count():,}, index file: {size_mb:,.0f} MB")
+
+    qrng = random.Random(args.seed + 1)
+    lower = lambda words: [(word.lower(), None) for word in words]  # noqa: E731
+    measure("rare term (5% of lab reports)", lower(qrng.choices(RARE_TESTS, k=args.queries)), index)
+    measure("common term, top 20", lower(qrng.choices(COMMON_TESTS, k=args.queries)), index)
+    measure(
+        "inflected two-word query",
+        [(qrng.choice(["железодефицитной анемии", "острого бронхита", "внебольничной пневмонией"]), None)
+         for _ in range(args.queries)],
+        index
+    )
+    measure(
+        "common term for one patient",
+        [(qrng.choice(COMMON_TESTS).lower(), qrng.choice(patients).rsplit(" ", 1)[1]) for _ in range(args.queries)],
+        index
+    )
+    measure(
+        "rare term for one patient",
+        [(qrng.choice(RARE_TESTS), qrng.choice(patients).rsplit(" ", 1)[1]) for _ in range(args.queries)],
+        index
+    )
+
+
+if __name__ == "__main__":
+    main()
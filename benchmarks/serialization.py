@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Serialization benchmark for /api/v1/analyze responses
+
+Compares, per number of lab test results:
+- previous path: schema validation -> model_dump() -> AnalyzeResponse(...)
+  validation -> response_model re-validation -> jsonable_encoder -> json.dumps
+- current path: schema validation -> model_dump() -> AnalyzeResponse.model_construct()
+  -> orjson bytes
+
+Usage:
+    python benchmarks/serialization.py [--sizes 10,100,500,1000] [--repeat 200]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.models import AnalyzeResponse  # noqa: E402
+from app.schemas import LabReportSchema  # noqa: E402
+from app.schemas.base import DocumentType  # noqa: E402
+from app.utils import json_utils  # noqa: E402
+
+
+def make_payload(test_count: int) -> dict:
+    """Build a raw model payload for a lab report with test_count results"""
+    return {
+        "summary": "Общий анализ крови и биохимия: большинство показателей в норме",
+        "patient_name": "Иванов Иван Иванович",
+        "patient_age": 45,
+        "patient_id": "P123456",
+        "visit_date": "2025-10-15",
+        "report_date": "2025-10-16",
+        "collection_date": "2025-10-15",
+        "lab_info": {
+            "lab_name": "Городской диагностический центр",
+            "lab_location": "ул. Ленина, 1",
+            "lab_contact": "+7-495-000-00-00"
+        },
+        "doctor_name": "Петров П.П.",
+        "test_results": [
+            {
+                "test_name": f"Показатель {i}",
+                "result_value": f"{100 + i * 0.5:.1f}",
+                "unit": "г/л",
+                "reference_range": "120-160",
+                "status": "normal" if i % 3 else "abnormal"
+            }
+            for i in range(test_count)
+        ],
+        "notes": None
+    }
+
+
+def previous_path(raw: dict) -> bytes:
+    """Validate, re-validate in AnalyzeResponse and the response model, encode with json"""
+    data = LabReportSchema(**raw).model_dump()
+    response = AnalyzeResponse(
+        success=True,
+        document_type=DocumentType.LAB_REPORT,
+        confidence=0.95,
+        data=data,
+        raw_text=None,
+        processing_time_ms=1234,
+        error=None
+    )
+    # What FastAPI's response_model handling does with a returned model
+    validated = AnalyzeResponse.model_validate(response.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode("utf-8")
+
+
+def current_path(raw: dict) -> bytes:
+    """Validate once, construct the response without validation, encode with orjson"""
+    data = LabReportSchema.model_validate(raw).model_dump()
+    response = AnalyzeResponse.model_construct(
+        success=True,
+        document_type=DocumentType.LAB_REPORT,
+        confidence=0.95,
+        data=data,
+        raw_text=None,
+        processing_time_ms=1234,
+        error=None
+    )
+    return json_utils.dumps(dict(response))
+
+
+def bench(func, raw: dict, repeat: int) -> float:
+    """Return mean milliseconds per call"""
+    func(raw)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(raw)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark analyze response serialization")
+    parser.add_argument("--sizes", default="10,100,500,1000", help="Comma-separated test_results counts")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    encoder = "orjson" if json_utils.orjson is not None else "json (orjson not installed)"
+    print(f"Encoder: {encoder}")
+    print(f"{'tests':>6} {'bytes':>9} {'previous ms':>12} {'current ms':>11} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        raw = make_payload(size)
+        assert json.loads(previous_path(raw)) == json.loads(current_path(raw))
+        previous = bench(previous_path, raw, args.repeat)
+        current = bench(current_path, raw, args.repeat)
+        print(f"{size:>6} {len(current_path(raw)):>9} {previous:>12.3f} {current:>11.3f} {previous / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Bulk export of stored extractions
+
+Streams a dataset of the document database (database_schema.sql) to a
+file as NDJSON, CSV or Parquet. Rows are read with a server-side cursor
+and written batch by batch, so memory use doesn't grow with the dataset.
+The file is written under a temporary name and renamed when complete.
+
+Usage:
+    python export.py lab_results --format parquet --output lab_results.parquet
+                     [--database-url postgresql://...] [--since 2025-10-01] [--batch-size 10000]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+from app.config import settings
+from app.services.exporter import DATASETS, FORMATS, Exporter
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Export stored extractions as NDJSON, CSV or Parquet")
+    parser.add_argument("dataset", choices=sorted(DATASETS), help="Dataset to export")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson", help="Output format")
+    parser.add_argument("--output", help="Output file (default: <dataset>.<format>)")
+    parser.add_argument("--database-url", default=settings.database_url, help="PostgreSQL URL (default: DATABASE_URL)")
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, help="Only documents processed since (ISO 8601)")
+    parser.add_argument("--batch-size", type=int, default=settings.export_batch_size, help="Rows per fetch and row group")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        sys.exit("Pass --database-url or set DATABASE_URL")
+    try:
+        Exporter.check_format(args.format)
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+    output = args.output or f"{args.dataset}.{args.format}"
+    partial = f"{output}.partial"
+    start = time.perf_counter()
+
+    def progress(rows: int) -> None:
+        elapsed = time.perf_counter() - start
+        print(f"\r{rows:,} rows ({rows / elapsed:,.0f} rows/s)", end="", file=sys.stderr)
+
+    exporter = Exporter(args.database_url, batch_size=args.batch_size)
+    size = 0
+    try:
+        with open(partial, "wb") as handle:
+            for chunk in exporter.stream(args.dataset, args.format, since=args.since, progress=progress):
+                handle.write(chunk)
+                size += len(chunk)
+    except KeyboardInterrupt:
+        os.remove(partial)
+        print("\nInterrupted", file=sys.stderr)
+        sys.exit(130)
+    os.replace(partial, output)
+    print(f"\nWrote {output} ({size / 2**20:,.1f} MB) in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
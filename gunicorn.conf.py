@@ -0,0 +1,36 @@
+"""Gunicorn configuration for multi-worker deployments
+
+Usage:
+    gunicorn app.main:app -c gunicorn.conf.py
+"""
+
+import os
+
+from app.config import settings
+
+# Bind to Railway's port (or 8000 locally)
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# One async uvicorn worker per CPU core unless WEB_CONCURRENCY is set
+workers = settings.worker_count
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once in the master so workers fork warm; per-worker
+# services are created in the lifespan hook / on first request
+preload_app = True
+
+# Model calls on dense documents can take a while
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = settings.log_level.lower()
+
+
+def pre_fork(server, worker):
+    """Load PyMuPDF, PIL and the OpenAI SDK in the master before forking"""
+    from app.main import preload_dependencies
+    
+    preload_dependencies()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python
+"""
+Bulk ingestion client for the Medical Documents OCR API
+
+Walks files and directories, uploads every supported document with a
+configurable number of concurrent requests and appends one JSON line per
+document to an NDJSON results file. A manifest keyed by the SHA-256 of the
+file content records every finished document, so an interrupted run
+resumes where it stopped and files already processed (under any name) are
+skipped.
+
+A 429 from the server pauses all uploads for its Retry-After; 5xx answers
+and connection errors are retried with exponential backoff. Other errors,
+and analyses answered with "success": false, are recorded as failed and
+not retried (pass --retry-failed to try them again on the next run).
+
+Usage:
+    python ingest.py <path> [<path> ...] [--api-url http://localhost:8000] [--concurrency 8]
+                     [--output results.ndjson] [--manifest ingest_manifest.ndjson]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+
+DEFAULT_EXTENSIONS = ("jpg", "jpeg", "png", "pdf")
+
+# Slack on top of the server's deadline for the upload and the response
+TIMEOUT_SLACK_SECONDS = 30.0
+
+
+def iter_documents(paths: Iterable[str], extensions: Iterable[str] = DEFAULT_EXTENSIONS) -> Iterable[Path]:
+    """
+    Yield supported files under the given files and directories in a stable order
+
+    Args:
+        paths: Files and directories to ingest
+        extensions: File extensions to upload (without dot)
+
+    Yields:
+        Document paths
+    """
+    suffixes = {f".{extension.lower().lstrip('.')}" for extension in extensions}
+    for path in map(Path, paths):
+        if path.is_file():
+            if path.suffix.lower() in suffixes:
+                yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if Path(name).suffix.lower() in suffixes:
+                    yield Path(root) / name
+
+
+def _open_append(path: Path):
+    """Open a JSON lines file for appending, terminating a line torn by a crash"""
+    torn = False
+    if path.exists() and path.stat().st_size > 0:
+        with open(path, "rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            torn = handle.read(1) != b"\n"
+    handle = open(path, "a", encoding="utf-8")
+    if torn:
+        handle.write("\n")
+    return handle
+
+
+class Manifest:
+    """
+    Append-only record of processed documents, keyed by content hash
+
+    Each line is {"sha256", "path", "status"}; the last line for a hash
+    wins. Lines are flushed as they are written, so a crash loses at most
+    the documents that were still in flight.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize manifest, loading entries of earlier runs
+
+        Args:
+            path: Manifest file (created if missing)
+        """
+        self.path = Path(path)
+        self.entries: Dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # line torn by a crash
+                    self.entries[entry["sha256"]] = entry["status"]
+        self._file = None
+
+    def is_processed(self, digest: str, retry_failed: bool = False) -> bool:
+        """Check whether a document was already ingested (or failed, unless retrying failures)"""
+        status = self.entries.get(digest)
+        return status == "done" or (status == "failed" and not retry_failed)
+
+    def record(self, digest: str, path: Path, status: str) -> None:
+        """Record a finished document"""
+        if self._file is None:
+            self._file = _open_append(self.path)
+        self._file.write(json.dumps({"sha256": digest, "path": str(path), "status": status}, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.entries[digest] = status
+
+    def close(self) -> None:
+        """Close the manifest file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Progress:
+    """Counters and a rolling throughput estimate for live reporting"""
+
+    def __init__(self, total: int, window_seconds: float = 60.0):
+        """
+        Initialize progress
+
+        Args:
+            total: Number of documents found
+            window_seconds: Period the docs/sec rate is measured over
+        """
+        self.total = total
+        self.window_seconds = window_seconds
+        self.started = time.monotonic()
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.throttled = 0
+        self._finished: deque = deque()
+
+    def finish(self, ok: bool) -> None:
+        """Count an uploaded document"""
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+        self._finished.append(time.monotonic())
+
+    def rate(self) -> float:
+        """Uploaded documents per second over the recent window"""
+        now = time.monotonic()
+        while self._finished and now - self._finished[0] > self.window_seconds:
+            self._finished.popleft()
+        elapsed = min(now - self.started, self.window_seconds)
+        return len(self._finished) / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        """Estimated time to finish, or None before the first upload"""
+        rate = self.rate()
+        if rate <= 0:
+            return None
+        return (self.total - self.done - self.failed - self.skipped) / rate
+
+    def line(self) -> str:
+        """One-line status"""
+        eta = self.eta_seconds()
+        eta_text = "--:--:--" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+        processed = self.done + self.failed + self.skipped
+        return (
+            f"{processed}/{self.total} done={self.done} failed={self.failed} skipped={self.skipped} "
+            f"throttled={self.throttled} {self.rate():.1f} docs/s ETA {eta_text}"
+        )
+
+
+class BulkIngester:
+    """Upload documents concurrently, honoring server backpressure"""
+
+    # Answers worth retrying: overload, deadline and gateway errors
+    RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        manifest: Manifest,
+        output_path: Path,
+        concurrency: int = 8,
+        max_retries: int = 5,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, str]] = None,
+        retry_failed: bool = False,
+        max_backoff_seconds: float = 60.0
+    ):
+        """
+        Initialize ingester
+
+        Args:
+            client: HTTP client with the API base URL
+            manifest: Manifest of processed documents
+            output_path: NDJSON file results are appended to
+            concurrency: Maximum uploads in flight
+            max_retries: Retries of 5xx answers and connection errors per document
+            headers: Extra request headers (X-Priority, X-Tenant-ID)
+            params: Query parameters of /api/v1/analyze
+            retry_failed: Upload documents that failed in earlier runs again
+            max_backoff_seconds: Upper bound of a retry delay
+        """
+        self.client = client
+        self.manifest = manifest
+        self.output_path = Path(output_path)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.headers = headers or {}
+        self.params = params or {}
+        self.retry_failed = retry_failed
+        self.max_backoff_seconds = max_backoff_seconds
+        self.progress = Progress(0)
+        self._paused_until = 0.0
+        self._in_flight: Set[str] = set()
+        self._output = None
+
+    async def run(self, paths: List[Path], report_interval: float = 1.0) -> Progress:
+        """
+        Ingest documents
+
+        Args:
+            paths: Documents to upload
+            report_interval: Seconds between progress lines on stderr (0 = quiet)
+
+        Returns:
+            Final progress counters
+        """
+        self.progress = Progress(len(paths))
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(self._report(report_interval)) if report_interval > 0 else None
+
+        self._output = _open_append(self.output_path)
+        try:
+            for path in paths:
+                await queue.put(path)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if reporter is not None:
+                reporter.cancel()
+            self._output.close()
+            self.manifest.close()
+        return self.progress
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        """Upload documents from the queue until the None sentinel"""
+        while True:
+            path = await queue.get()
+            if path is None:
+                return
+            await self._ingest(path)
+
+    async def _report(self, interval: float) -> None:
+        """Print progress periodically"""
+        interactive = sys.stderr.isatty()
+        while True:
+            await asyncio.sleep(interval)
+            if interactive:
+                print(f"\r{self.progress.line()}\033[K", end="", file=sys.stderr, flush=True)
+            else:
+                print(self.progress.line(), file=sys.stderr, flush=True)
+
+    @staticmethod
+    def _read(path: Path) -> Tuple[bytes, str]:
+        """Read a file and hash its content"""
+        content = path.read_bytes()
+        return content, hashlib.sha256(content).hexdigest()
+
+    async def _ingest(self, path: Path) -> None:
+        """Upload one document unless it was already processed"""
+        try:
+            content, digest = await asyncio.to_thread(self._read, path)
+        except OSError as e:
+            self._write_result(path, None, "failed", None, None, str(e))
+            self.progress.finish(False)
+            return
+
+        if digest in self._in_flight or self.manifest.is_processed(digest, self.retry_failed):
+            self.progress.skipped += 1
+            return
+
+        self._in_flight.add(digest)
+        try:
+            status_code, result, error = await self._upload(path, content)
+        finally:
+            self._in_flight.discard(digest)
+
+        succeeded = status_code == 200 and bool(result.get("success"))
+        if status_code == 200 and not succeeded:
+            # Model and upstream failures are answered with 200 and "success": false
+            error = result.get("error") or "Analysis failed"
+        status = "done" if succeeded else "failed"
+        # Result first: a crash between the two writes re-uploads the document instead of losing it
+        self._write_result(path, digest, status, status_code, result, error)
+        self.manifest.record(digest, path, status)
+        self.progress.finish(status == "done")
+
+    def _write_result(
+        self,
+        path: Path,
+        digest: Optional[str],
+        status: str,
+        status_code: Optional[int],
+        result: Optional[Dict[str, Any]],
+        error: Any
+    ) -> None:
+        """Append one result line"""
+        line = {
+            "path": str(path),
+            "sha256": digest,
+            "status": status,
+            "status_code": status_code,
+            "result": result,
+            "error": error,
+        }
+        self._output.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self._output.flush()
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter"""
+        return min(2.0 ** attempt, self.max_backoff_seconds) * random.uniform(0.5, 1.0)
+
+    async def _wait_for_capacity(self) -> None:
+        """Hold off while the server asked clients to back off"""
+        loop = asyncio.get_running_loop()
+        while (delay := self._paused_until - loop.time()) > 0:
+            await asyncio.sleep(delay)
+
+    async def _upload(self, path: Path, content: bytes) -> Tuple[Optional[int], Optional[Dict[str, Any]], Any]:
+        """
+        Upload a document, retrying throttled and transient failures
+
+        Returns:
+            Tuple of (HTTP status or None, response JSON on success, error)
+        """
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        status_code, error = None, None
+        while True:
+            await self._wait_for_capacity()
+            try:
+                response = await self.client.post(
+                    "/api/v1/analyze",
+                    files={"file": (path.name, content)},
+                    headers=self.headers,
+                    params=self.params
+                )
+            except httpx.TransportError as e:
+                status_code, error = None, f"{type(e).__name__}: {e}"
+            else:
+                status_code = response.status_code
+                if status_code == 200:
+                    return status_code, response.json(), None
+                error = self._error_detail(response)
+
+                if status_code == 429:
+                    # A full lane: every worker pauses, and the wait doesn't count as a retry
+                    self.progress.throttled += 1
+                    delay = self._retry_after(response)
+                    if delay is None:
+                        delay = self._backoff(min(self.progress.throttled, 6))
+                    self._paused_until = max(self._paused_until, loop.time() + delay)
+                    continue
+                if status_code not in self.RETRY_STATUS_CODES:
+                    return status_code, None, error
+
+            if attempt >= self.max_retries:
+                return status_code, None, error
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        """Seconds from a Retry-After header, if present"""
+        try:
+            return max(float(response.headers["Retry-After"]), 0.0)
+        except (KeyError, ValueError):
+            return None
+
+    @staticmethod
+    def _error_detail(response: httpx.Response) -> Any:
+        """Error body of a failed request"""
+        try:
+            body = response.json()
+        except ValueError:
+            return response.text[:500]
+        return body.get("detail", body) if isinstance(body, dict) else body
+
+
+def default_timeout(priority: str) -> float:
+    """
+    Request timeout for a lane: its server-side deadline, which includes
+    queueing, plus some slack. A shorter timeout abandons uploads that are
+    still queued and sends them again.
+    """
+    from app.config import settings
+
+    if priority == "interactive":
+        return settings.interactive_deadline_seconds + TIMEOUT_SLACK_SECONDS
+    return settings.batch_deadline_seconds + TIMEOUT_SLACK_SECONDS
+
+
+async def ingest(args: argparse.Namespace) -> Progress:
+    """Run an ingestion from parsed command line arguments"""
+    paths = list(iter_documents(args.paths, args.extensions.split(",")))
+    print(f"Found {len(paths)} documents", file=sys.stderr)
+
+    headers = {"X-Priority": args.priority}
+    if args.tenant:
+        headers["X-Tenant-ID"] = args.tenant
+    params = {
+        name: value for name, value in (("fields", args.fields), ("tiled", args.tiled), ("split", args.split))
+        if value is not None
+    }
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout or default_timeout(args.priority), connect=10.0)
+    async with httpx.AsyncClient(base_url=args.api_url, limits=limits, timeout=timeout) as client:
+        ingester = BulkIngester(
+            client,
+            Manifest(Path(args.manifest)),
+            Path(args.output),
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+            headers=headers,
+            params=params,
+            retry_failed=args.retry_failed
+        )
+        progress = await ingester.run(paths)
+
+    print(f"\n{progress.line()}", file=sys.stderr)
+    return progress
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Upload a document archive to the Medical Documents OCR API")
+    parser.add_argument("paths", nargs="+", help="Files and directories to ingest")
+    parser.add_argument("--api-url", default="http://localhost:8000", help="Base URL of the API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Uploads in flight")
+    parser.add_argument("--output", default="results.ndjson", help="NDJSON file results are appended to")
+    parser.add_argument("--manifest", default="ingest_manifest.ndjson", help="Manifest of processed documents")
+    parser.add_argument("--extensions", default=",".join(DEFAULT_EXTENSIONS), help="Comma-separated file extensions")
+    parser.add_argument("--priority", default="batch", help="X-Priority lane (default: batch)")
+    parser.add_argument("--tenant", help="X-Tenant-ID header")
+    parser.add_argument("--fields", help="Comma-separated fields to extract")
+    parser.add_argument("--tiled", choices=("true", "false"), help="Override tiled extraction")
+    parser.add_argument("--split", choices=("true", "false"), help="Override multi-document splitting")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries of 5xx answers and connection errors")
+    parser.add_argument(
+        "--timeout", type=float, help="Per-request timeout in seconds (default: the lane's deadline plus 30 s)"
+    )
+    parser.add_argument("--retry-failed", action="store_true", help="Upload documents that failed in earlier runs again")
+    args = parser.parse_args()
+
+    try:
+        progress = asyncio.run(ingest(args))
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    sys.exit(1 if progress.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Adaptive model concurrency tests"""
+
+import asyncio
+import random
+import time
+
+from app.services.adaptive_limiter import AdaptiveLimiter
+from app.services.metrics import metrics
+
+
+class FakeModelServer:
+    """
+    Local stand-in for the model API with a capacity that changes over time
+
+    Up to capacity calls are served at base latency; beyond that, calls
+    queue and latency grows in proportion. At twice the capacity further
+    calls are rejected with 429.
+    """
+
+    def __init__(self, capacity_curve, base_latency: float = 0.01):
+        self.capacity_curve = capacity_curve
+        self.base_latency = base_latency
+        self.in_flight = 0
+        self.served = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+
+    @property
+    def capacity(self) -> int:
+        return self.capacity_curve(time.monotonic() - self.started)
+
+    async def call(self) -> bool:
+        capacity = self.capacity
+        if self.in_flight >= 2 * capacity:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        try:
+            load = max(1.0, self.in_flight / capacity)
+            await asyncio.sleep(self.base_latency * load * random.uniform(0.9, 1.1))
+        finally:
+            self.in_flight -= 1
+        self.served += 1
+        return True
+
+
+def run_simulation(capacity_curve, duration: float, clients: int = 60):
+    """Drive the fake server through a limiter; returns (server, [(elapsed, limit)])"""
+    async def scenario():
+        server = FakeModelServer(capacity_curve)
+        limiter = AdaptiveLimiter("simulation", initial_limit=2, min_limit=1, max_limit=64)
+        samples = []
+        deadline = time.monotonic() + duration
+
+        async def client():
+            while time.monotonic() < deadline:
+                async with limiter.acquire() as permit:
+                    permit.sent()
+                    if await server.call():
+                        permit.succeeded(time.monotonic() - permit.started)
+                    else:
+                        permit.overloaded()
+                        await asyncio.sleep(server.base_latency)
+
+        async def sample():
+            while time.monotonic() < deadline:
+                samples.append((time.monotonic() - server.started, limiter.limit))
+                await asyncio.sleep(0.02)
+
+        await asyncio.gather(sample(), *[client() for _ in range(clients)])
+        return server, samples
+
+    return asyncio.run(scenario())
+
+
+def mean_limit(samples, start: float, end: float) -> float:
+    window = [limit for elapsed, limit in samples if start <= elapsed < end]
+    return sum(window) / len(window)
+
+
+def test_limit_converges_to_capacity_and_follows_it_down():
+    """Test that the limit settles near the server's capacity, then backs off when capacity drops"""
+    server, samples = run_simulation(lambda elapsed: 12 if elapsed < 1.5 else 4, duration=3.0)
+
+    # Settled near capacity 12: at least using it, without sitting on the 429 ceiling
+    assert 12 * 0.7 <= mean_limit(samples, 0.75, 1.5) <= 12 * 2
+    # Capacity dropped to 4: the limit follows it down
+    assert 4 * 0.5 <= mean_limit(samples, 2.25, 3.0) <= 4 * 2
+    # 60 clients never flooded the server: rejections are a small share of the calls
+    assert server.rejected < 0.05 * server.served
+    assert metrics.get("openai.concurrency.simulation.limit") < 12
+
+
+def test_fixed_limit_serves_waiters_in_order():
+    """Test that a limiter with min_limit == max_limit never adapts and hands slots over FIFO"""
+    async def scenario():
+        limiter = AdaptiveLimiter("fixed", initial_limit=1, min_limit=2, max_limit=2)
+        assert not limiter.adaptive
+        assert limiter.limit == 2
+        order = []
+        release = asyncio.Event()
+
+        async def call(index):
+            async with limiter.acquire() as permit:
+                order.append(index)
+                await release.wait()
+                permit.overloaded()
+
+        tasks = [asyncio.create_task(call(index)) for index in range(5)]
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 2
+
+        # A cancelled waiter gives up its place without leaking a slot
+        tasks[2].cancel()
+        release.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert order == [0, 1, 3, 4]
+        assert limiter.in_flight == 0
+        assert limiter.limit == 2
+
+    asyncio.run(scenario())
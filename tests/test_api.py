@@ -55,6 +55,109 @@ def test_analyze_invalid_file_type():
     assert response.status_code == 400
 
 
+def test_analyze_unknown_field():
+    """Test analyze endpoint with an unknown extraction field"""
+    files = {"file": ("test.jpg", b"Not an image", "image/jpeg")}
+    response = client.post("/api/v1/analyze?fields=test_results,shoe_size", files=files)
+    assert response.status_code == 400
+    assert "shoe_size" in response.json()["detail"]["detail"]
+
+
 # Note: Additional tests would require mock images or test fixtures
 # For full integration tests, you would need actual medical document images
 
+
+def test_search_disabled():
+    """Test search endpoint when the index is not enabled"""
+    response = client.get("/api/v1/search", params={"q": "ферритин"})
+    assert response.status_code == 503
+
+
+def test_search_requires_data_token(monkeypatch, tmp_path):
+    """Test that search results, which hold patient data, need the X-API-Key"""
+    from app import main
+    from app.services.search_index import SearchIndex
+    
+    monkeypatch.setattr(main, "search_index", SearchIndex(str(tmp_path / "search.db")))
+    assert client.get("/api/v1/search", params={"q": "ферритин"}).status_code == 503
+    
+    monkeypatch.setattr(main.settings, "data_api_token", "secret")
+    assert client.get("/api/v1/search", params={"q": "ферритин"}).status_code == 403
+    response = client.get("/api/v1/search", params={"q": "ферритин"}, headers={"X-API-Key": "secret"})
+    assert response.status_code == 200
+    assert response.json()["results"] == []
+
+
+def test_trends_disabled():
+    """Test patient trends endpoint when the store is not enabled"""
+    response = client.get("/api/v1/patients/P123456/trends")
+    assert response.status_code == 503
+
+
+def test_trends_require_token_and_valid_dates(monkeypatch, tmp_path):
+    """Test that trends need the X-API-Key and a since/until that isn't a date is a 400"""
+    from app import main
+    from app.services.trend_store import TrendStore
+    
+    monkeypatch.setattr(main, "trend_store", TrendStore(str(tmp_path / "trends.db")))
+    monkeypatch.setattr(main.settings, "data_api_token", "secret")
+    assert client.get("/api/v1/patients/P123456/trends").status_code == 403
+    response = client.get(
+        "/api/v1/patients/P123456/trends", params={"since": "01.02.2025"}, headers={"X-API-Key": "secret"}
+    )
+    assert response.status_code == 400
+
+
+def test_export_disabled():
+    """Test export endpoint without a database"""
+    response = client.get("/api/v1/export/lab_results", params={"format": "csv"})
+    assert response.status_code == 503
+
+
+def test_export_requires_data_token(monkeypatch):
+    """Test that exports, which hold patient data, need the X-API-Key"""
+    from app import main
+    
+    monkeypatch.setattr(main.settings, "data_api_token", "secret")
+    monkeypatch.setattr(main.settings, "database_url", "postgresql://localhost/meddocs")
+    assert client.get("/api/v1/export/lab_results").status_code == 403
+    response = client.get("/api/v1/export/unknown", headers={"X-API-Key": "secret"})
+    assert response.status_code == 404
+
+
+def test_profiles_disabled():
+    """Test profile listing when profiling is not enabled"""
+    response = client.get("/debug/profiles", headers={"X-Profile-Token": "anything"})
+    assert response.status_code == 404
+
+
+def test_health_reports_readiness():
+    """Test that a running worker with the load monitor is ready"""
+    with TestClient(app) as running_client:
+        response = running_client.get("/api/v1/health")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "healthy"
+    assert data["ready"] is True
+    assert "loop_lag_ms" in data["load"]
+
+
+def test_queued_request_gets_504_at_its_deadline(monkeypatch):
+    """Test that a request waiting for a lane slot is answered 504 when its deadline passes"""
+    import asyncio
+    import time
+
+    from app import main
+    from app.services.priority_lanes import Lane
+
+    with TestClient(app) as running_client:
+        lane = Lane("interactive", max_concurrency=1, max_queue=10, deadline_seconds=0.3, image_workers=1)
+        lane._semaphore = asyncio.Semaphore(0)  # Every slot taken
+        monkeypatch.setitem(main.priority_lanes.lanes, "interactive", lane)
+        monkeypatch.setattr(main.settings, "result_cache_enabled", False)
+        started = time.monotonic()
+        response = running_client.post("/api/v1/analyze", files={"file": ("test.jpg", b"queued", "image/jpeg")})
+        lane.shutdown()
+    assert response.status_code == 504
+    assert time.monotonic() - started < 2
+    assert lane.waiting == 0
@@ -0,0 +1,34 @@
+"""Compact output format tests"""
+
+from app.schemas import DoctorVisitSchema, LabReportSchema, PrescriptionSchema
+from app.services.compact_output import CompactOutputFormat
+
+
+def test_table_fields_and_instructions():
+    """Test that only arrays of objects become tables"""
+    assert CompactOutputFormat.table_fields(LabReportSchema) == {
+        "test_results": ["test_name", "result_value", "unit", "reference_range"]
+    }
+    assert list(CompactOutputFormat.table_fields(DoctorVisitSchema)) == ["medications"]
+    assert '"test_name", "result_value"' in CompactOutputFormat.instructions(LabReportSchema)
+    assert CompactOutputFormat.instructions(LabReportSchema, ["patient_name"]) == ""
+
+
+def test_expand_restores_schema_structure():
+    """Test tables with and without a header row, and regular rows"""
+    with_header = {"test_results": [
+        ["test_name", "result_value", "unit"],
+        ["Гемоглобин", "145", "г/л"],
+        ["Глюкоза", "5.1", None],
+    ]}
+    assert CompactOutputFormat.expand(with_header, LabReportSchema)["test_results"] == [
+        {"test_name": "Гемоглобин", "result_value": "145", "unit": "г/л"},
+        {"test_name": "Глюкоза", "result_value": "5.1", "unit": None},
+    ]
+    
+    without_header = {"medications": [["Амоксициллин", "500 мг", "3 раза в день", "7 дней", None]]}
+    medication = CompactOutputFormat.expand(without_header, PrescriptionSchema)["medications"][0]
+    assert medication["name"] == "Амоксициллин" and medication["instructions"] is None
+    
+    regular = {"medications": [{"name": "Амоксициллин"}]}
+    assert CompactOutputFormat.expand(regular, PrescriptionSchema) == regular
@@ -0,0 +1,47 @@
+"""Document parser tests (no model calls)"""
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.base import DocumentType
+from app.services.document_parser import DocumentParser
+
+
+def test_reduced_prompt_contains_only_requested_fields():
+    """Test that a field subset keeps the requested blocks and their sub-fields"""
+    description = DocumentParser.build_schema_description(
+        DocumentType.LAB_REPORT, ["patient_name", "test_results"]
+    )
+    assert "- patient_name (" in description
+    assert "- test_results (" in description
+    assert "reference_range" in description
+    assert "- lab_info (" not in description
+    assert "- summary (" not in description
+    assert len(description) < len(DocumentParser.SCHEMA_DESCRIPTIONS[DocumentType.LAB_REPORT])
+
+
+def test_partial_schema_validates_subset():
+    """Test that the partial model keeps field types and required status"""
+    model = DocumentParser.partial_schema(DocumentType.PRESCRIPTION, ["medications"])
+    data = model.model_validate(
+        {"medications": [{"name": "Амоксициллин", "dosage": "500мг", "frequency": "3 раза в день", "duration": "7 дней"}]}
+    ).model_dump()
+    assert list(data) == ["medications"]
+    assert data["medications"][0]["instructions"] is None
+    
+    with pytest.raises(ValidationError):
+        model.model_validate({})
+
+
+def test_output_fraction_scales_with_fields():
+    """Test output shares for full and partial extractions"""
+    full = DocumentParser.output_fraction(DocumentType.LAB_REPORT)
+    tests_only = DocumentParser.output_fraction(DocumentType.LAB_REPORT, ["test_results"])
+    name_only = DocumentParser.output_fraction(DocumentType.LAB_REPORT, ["patient_name"])
+    assert full == 1.0
+    assert 0 < name_only < tests_only < full
+
+
+def test_select_fields_ignores_other_document_types():
+    """Test that fields of other document types are dropped"""
+    assert DocumentParser.select_fields(DocumentType.PRESCRIPTION, ["test_results", "medications"]) == ["medications"]
@@ -0,0 +1,53 @@
+"""Export encoding tests"""
+
+import datetime
+import decimal
+import io
+import json
+
+import pytest
+
+from app.services.exporter import encode_batches
+
+COLUMNS = ["id", "patient_name", "processed_at", "confidence"]
+TYPE_CODES = [23, 1043, 1114, 1700]
+ROWS = [
+    (1, "Иванов, Иван", datetime.datetime(2025, 10, 1, 8, 30), decimal.Decimal("0.95")),
+    (2, None, datetime.datetime(2025, 10, 2, 9, 0), None),
+    (3, 'Петров "П."', None, decimal.Decimal("0.8")),
+]
+
+
+def export(export_format, batches):
+    return list(encode_batches(COLUMNS, batches, export_format, TYPE_CODES))
+
+
+def test_ndjson_and_csv():
+    """Test values, NULLs and quoting, one chunk per batch, and a header-only empty CSV"""
+    chunks = export("ndjson", [ROWS[:2], ROWS[2:]])
+    assert len(chunks) == 2
+    lines = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert lines[0] == {"id": 1, "patient_name": "Иванов, Иван", "processed_at": "2025-10-01T08:30:00", "confidence": 0.95}
+    assert lines[1]["patient_name"] is None
+
+    text = b"".join(export("csv", [ROWS])).decode("utf-8")
+    assert text.splitlines() == [
+        "id,patient_name,processed_at,confidence",
+        '1,"Иванов, Иван",2025-10-01T08:30:00,0.95',
+        "2,,2025-10-02T09:00:00,",
+        '3,"Петров ""П.""",,0.8',
+    ]
+    assert b"".join(export("csv", [])).decode("utf-8").strip() == "id,patient_name,processed_at,confidence"
+
+
+def test_parquet_row_groups():
+    """Test that every batch becomes a row group with database column types"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    chunks = export("parquet", [ROWS[:2], ROWS[2:]])
+    assert len(chunks) == 3
+
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet_file.num_row_groups == 2
+    table = parquet_file.read()
+    assert [str(field.type) for field in table.schema] == ["int32", "string", "timestamp[us]", "double"]
+    assert table.column("confidence").to_pylist() == [0.95, None, 0.8]
@@ -0,0 +1,201 @@
+"""Image utility tests"""
+
+from io import BytesIO
+
+import base64
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from app.utils.image_utils import (
+    assess_image_quality,
+    detect_orientation,
+    encode_document_regions,
+    encode_image_to_base64,
+    find_document_regions,
+)
+
+
+def make_document() -> Image.Image:
+    """White page with lines of dark text-like marks"""
+    page = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(page)
+    for line in range(30):
+        for word in range(3 + line % 5):
+            x = 100 + word * 180
+            draw.rectangle((x, 120 + line * 50, x + 140, 140 + line * 50), fill="black")
+            for gap in range(x + 10, x + 140, 20):
+                draw.line((gap, 120 + line * 50, gap, 140 + line * 50), fill="white", width=4)
+    return page
+
+
+def make_text_page() -> Image.Image:
+    """White page with left-aligned lines of text of varying length"""
+    page = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=26)
+    words = "Гемоглобин 145 г/л Эритроциты 4.5 Лейкоциты 6.1 норма".split()
+    for line in range(28):
+        draw.text((100, 120 + line * 50), " ".join(words[:3 + line % 6]), fill="black", font=font)
+    return page
+
+
+def make_table_page() -> Image.Image:
+    """Lab report table: name, value, unit and reference range columns"""
+    page = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=26)
+    names = ["Гемоглобин", "Эритроциты", "Лейкоциты", "Тромбоциты", "СОЭ", "Гематокрит", "Нейтрофилы", "Лимфоциты"]
+    units = ["г/л", "10^9/л", "%", "мм/ч"]
+    draw.text((100, 80), "Общий анализ крови", fill="black", font=font)
+    for row in range(24):
+        y = 160 + row * 55
+        draw.text((100, y), names[row % 8], fill="black", font=font)
+        draw.text((520, y), f"{(row * 7) % 150 + 3}.{row % 10}", fill="black", font=font)
+        draw.text((720, y), units[row % 4], fill="black", font=font)
+        draw.text((920, y), f"{row % 5 + 1}.0-{row % 7 + 5}.5", fill="black", font=font)
+    return page
+
+
+def make_centered_page() -> Image.Image:
+    """Conclusion page with centered lines"""
+    page = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=26)
+    words = "Заключение врача по результатам обследования пациента без патологии".split()
+    for line in range(26):
+        text = " ".join(words[:3 + line % 6])
+        draw.text(((1240 - draw.textlength(text, font=font)) / 2, 120 + line * 55), text, fill="black", font=font)
+    return page
+
+
+def make_dense_table_page() -> Image.Image:
+    """Tightly spaced table whose aligned columns look like lines when turned"""
+    page = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=22)
+    for row in range(45):
+        for x, text in ((80, "Показатель"), (420, "12.5"), (620, "г/л"), (820, "4.0-5.5"), (1040, "N")):
+            draw.text((x, 100 + row * 34), text, fill="black", font=font)
+    return page
+
+
+def encode(image: Image.Image, **save_options) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=90, **save_options)
+    return buffer.getvalue()
+
+
+def png(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_quality_accepts_sharp_document():
+    """Test that a sharp text page passes"""
+    quality = assess_image_quality(encode(make_document()))
+    assert quality["acceptable"]
+    assert quality["text_likelihood"] > 0.6
+
+
+def test_quality_flags_blank_blurry_and_non_documents():
+    """Test each rejection reason"""
+    assert assess_image_quality(encode(Image.new("RGB", (1240, 1754), (250, 250, 247))))["issues"] == ["blank"]
+    
+    blurred = make_document().filter(ImageFilter.GaussianBlur(6))
+    assert assess_image_quality(encode(blurred))["issues"] == ["blurry"]
+    
+    # Smooth dark gradient with no paper and no text lines (a photo of a face or a room)
+    photo = Image.linear_gradient("L").resize((900, 1200)).convert("RGB")
+    photo = Image.blend(photo, Image.effect_noise((900, 1200), 40).convert("RGB"), 0.5)
+    assert "not_a_document" in assess_image_quality(encode(photo))["issues"]
+
+
+def test_quality_scores_the_page_not_the_table():
+    """Test that a page photographed on a dark table is scored on the paper, not the background"""
+    photo = Image.new("RGB", (2000, 2600), (110, 75, 50))
+    photo.paste(make_text_page().resize((1350, 1910)), (325, 345))  # ~50% of the frame
+    quality = assess_image_quality(encode(photo))
+    assert quality["acceptable"]
+    assert quality["ink_coverage"] < 0.2
+    assert quality["text_likelihood"] > 0.6
+    
+    photo.paste(Image.new("RGB", (1350, 1910), (245, 245, 240)), (325, 345))
+    assert assess_image_quality(encode(photo))["issues"] == ["blank"]
+
+
+def test_quality_of_transparent_png():
+    """Test that a transparent background counts as paper, not as ink"""
+    text = make_document().convert("L")
+    transparent = Image.new("RGBA", text.size, (0, 0, 0, 0))
+    transparent.putalpha(text.point(lambda value: 255 - value))
+    quality = assess_image_quality(png(transparent))
+    assert quality["acceptable"]
+    assert quality == assess_image_quality(png(make_document()))
+    assert quality == assess_image_quality(png(transparent.convert("LA")))
+
+
+def test_detect_orientation_turns_and_skew():
+    """Test detection of 90/180/270-degree turns combined with skew"""
+    for turn in (0, 90, 180, 270):
+        page = make_text_page().rotate(4, expand=True, fillcolor="white").rotate(turn, expand=True)
+        rotation, skew = detect_orientation(page)
+        assert rotation == (360 - turn) % 360
+        assert abs(skew + 4) <= 0.5
+
+
+def test_detect_orientation_tables_and_centered_pages():
+    """Test that table pages are never turned wrongly and pages with unclear direction are left alone"""
+    for turn in (0, 90, 180, 270):
+        page = make_table_page().rotate(turn, expand=True)
+        assert detect_orientation(page)[0] == (360 - turn) % 360
+    
+    # Upright pages stay upright
+    assert detect_orientation(make_dense_table_page()) == (0, 0.0)
+    assert detect_orientation(make_centered_page())[0] == 0
+    content = encode(make_dense_table_page())
+    encoded = Image.open(BytesIO(base64.b64decode(encode_image_to_base64(content, auto_orient=True))))
+    assert encoded.size == (1240, 1754)
+    
+    # Centered lines and two-sided-aligned tables have no ragged margin to tell the
+    # direction by: they may be left turned, but never turned the wrong way
+    for make_page in (make_centered_page, make_dense_table_page):
+        for turn in (90, 180, 270):
+            rotation, _ = detect_orientation(make_page().rotate(turn, expand=True))
+            assert rotation in (0, (360 - turn) % 360)
+
+
+def test_encode_applies_exif_orientation():
+    """Test that a phone photo stored sideways with an EXIF tag is encoded upright"""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # stored turned 90 degrees counter-clockwise
+    content = encode(make_text_page().rotate(90, expand=True), exif=exif)
+    
+    encoded = Image.open(BytesIO(base64.b64decode(encode_image_to_base64(content, auto_orient=False))))
+    assert encoded.size[0] < encoded.size[1]
+    assert detect_orientation(encoded)[0] == 0
+
+
+def test_find_document_regions_on_a_table():
+    """Test that slips photographed on a dark table are found in reading order"""
+    photo = Image.new("RGB", (3000, 2000), (90, 70, 50))
+    slips = [(150, 200, 1300, 1000), (1600, 150, 2800, 950), (400, 1200, 1800, 1900)]
+    for left, top, right, bottom in slips:
+        photo.paste(make_document().resize((right - left, bottom - top)), (left, top))
+    
+    regions = find_document_regions(photo)
+    assert len(regions) == 3
+    for (left, top, right, bottom), slip in zip(regions, slips):
+        assert all(abs(found - expected) <= 60 for found, expected in zip((left, top, right, bottom), slip))
+    
+    crops = encode_document_regions(encode(photo))
+    assert [box for box, _, _ in crops] == regions
+
+
+def test_find_document_regions_single_page():
+    """Test that a single page, scanned or on a table, is not split"""
+    assert find_document_regions(make_document()) == []
+    
+    photo = Image.new("RGB", (2000, 2600), (90, 70, 50))
+    photo.paste(make_document(), (380, 420))
+    assert find_document_regions(photo) == []
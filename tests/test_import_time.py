@@ -0,0 +1,71 @@
+"""Import-time budget tests (see benchmarks/import_time.py for the full report)"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Budget for `import app.main` in a fresh interpreter. FastAPI alone takes
+# ~300 ms; PyMuPDF, PIL and the OpenAI SDK would add another ~700 ms.
+IMPORT_TIME_BUDGET_MS = 1000
+
+HEAVY_MODULES = ("fitz", "PIL", "openai", "numpy")
+
+
+def _import_app_main():
+    """Import app.main in a fresh interpreter and return (-X importtime stderr, loaded heavy modules)"""
+    code = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stderr, [m for m in result.stdout.strip().split(",") if m]
+
+
+def _cumulative_ms(importtime_output: str, module: str) -> float:
+    """Get the cumulative import time of a module from -X importtime output"""
+    for line in importtime_output.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+def test_heavy_dependencies_are_lazy():
+    """Test that importing the app doesn't load PyMuPDF, PIL or the OpenAI SDK"""
+    _, loaded = _import_app_main()
+    assert loaded == []
+
+
+def test_import_time_budget():
+    """Test that importing the app stays within the cold-start budget"""
+    _import_app_main()  # warm bytecode cache
+    timings = sorted(_cumulative_ms(_import_app_main()[0], "app.main") for _ in range(3))
+    assert timings[1] < IMPORT_TIME_BUDGET_MS, f"import app.main took {timings[1]:.0f} ms"
+
+
+def test_health_answers_before_dependencies_load():
+    """Test that the health endpoint works without loading the heavy dependencies"""
+    code = (
+        "import sys\n"
+        "from fastapi.testclient import TestClient\n"
+        "from app.main import app\n"
+        "response = TestClient(app).get('/api/v1/health')\n"
+        "assert response.status_code == 200, response.text\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    assert result.stdout.strip() == ""
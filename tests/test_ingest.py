@@ -0,0 +1,125 @@
+"""Bulk ingestion client tests"""
+
+import asyncio
+import json
+
+import httpx
+
+from ingest import BulkIngester, Manifest, default_timeout, iter_documents
+
+
+def make_archive(tmp_path):
+    """Three uploads, two of them with identical content, plus a file that isn't a document"""
+    archive = tmp_path / "archive"
+    (archive / "2024").mkdir(parents=True)
+    (archive / "a.jpg").write_bytes(b"first document")
+    (archive / "2024" / "b.png").write_bytes(b"second document")
+    (archive / "2024" / "copy.JPG").write_bytes(b"first document")
+    (archive / "notes.txt").write_text("not a document")
+    return archive
+
+
+def run(tmp_path, handler, **options):
+    """Ingest the archive against a mock server"""
+    paths = list(iter_documents([str(tmp_path / "archive")]))
+
+    async def scenario():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ingester = BulkIngester(
+                client,
+                Manifest(tmp_path / "manifest.ndjson"),
+                tmp_path / "results.ndjson",
+                concurrency=2,
+                max_backoff_seconds=0.01,
+                **options
+            )
+            return await ingester.run(paths, report_interval=0)
+
+    return asyncio.run(scenario())
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_iter_documents_filters_and_orders(tmp_path):
+    """Test directory walking"""
+    archive = make_archive(tmp_path)
+    paths = [path.relative_to(archive).as_posix() for path in iter_documents([str(archive)])]
+    assert paths == ["a.jpg", "2024/b.png", "2024/copy.JPG"]
+
+
+def test_ingest_waits_out_throttling_and_resumes(tmp_path):
+    """Test 429 handling, duplicate skipping and resuming from the manifest"""
+    make_archive(tmp_path)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={"detail": {"error": "Too many requests"}})
+        return httpx.Response(200, json={"success": True, "document_type": "prescription"})
+
+    progress = run(tmp_path, handler)
+    assert (progress.done, progress.skipped, progress.failed, progress.throttled) == (2, 1, 0, 1)
+    assert len(calls) == 3
+
+    results = read_lines(tmp_path / "results.ndjson")
+    assert [line["status"] for line in results] == ["done", "done"]
+    assert all(line["result"]["document_type"] == "prescription" for line in results)
+
+    # A second run finds everything in the manifest
+    calls.clear()
+    progress = run(tmp_path, handler)
+    assert calls == []
+    assert progress.skipped == 3
+
+
+def test_ingest_records_failures_without_retrying_client_errors(tmp_path):
+    """Test that 4xx answers are recorded as failed and retried only on request"""
+    make_archive(tmp_path)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if b"second" in request.content:
+            return httpx.Response(422, json={"detail": {"error": "Image quality too low"}})
+        if sum(b"first" in call.content for call in calls) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"success": True})
+
+    progress = run(tmp_path, handler)
+    assert (progress.done, progress.failed) == (1, 1)
+
+    failed = [line for line in read_lines(tmp_path / "results.ndjson") if line["status"] == "failed"]
+    assert failed[0]["status_code"] == 422
+    assert failed[0]["error"] == {"error": "Image quality too low"}
+
+    calls.clear()
+    run(tmp_path, handler)
+    assert calls == []
+
+    progress = run(tmp_path, handler, retry_failed=True)
+    assert len(calls) == 1
+    assert progress.failed == 1
+
+
+def test_ingest_records_unsuccessful_analyses_as_failed(tmp_path):
+    """Test that a 200 answer with "success": false is a failure, and that the timeout outlasts the lane deadline"""
+    make_archive(tmp_path)
+
+    def handler(request):
+        if b"second" in request.content:
+            return httpx.Response(200, json={"success": False, "error": "Model API error"})
+        return httpx.Response(200, json={"success": True})
+
+    progress = run(tmp_path, handler)
+    assert (progress.done, progress.failed) == (1, 1)
+    failed = [line for line in read_lines(tmp_path / "results.ndjson") if line["status"] == "failed"]
+    assert failed[0]["status_code"] == 200
+    assert failed[0]["error"] == "Model API error"
+    assert Manifest(tmp_path / "manifest.ndjson").is_processed(failed[0]["sha256"], retry_failed=True) is False
+
+    assert default_timeout("batch") > 600
+    assert default_timeout("interactive") > 90
@@ -0,0 +1,66 @@
+"""Lab status tests"""
+
+import json
+import math
+
+from app.services.lab_status import compute_statuses, load_critical_limits, parse_range, parse_value
+
+
+def test_parse_range_and_value():
+    """Test range and value formats"""
+    assert parse_range("120-160") == (120.0, 160.0)
+    assert parse_range("4,0 – 5,5 10^12/л") == (4.0, 5.5)
+    assert parse_range("от 3.5 до 5.5") == (3.5, 5.5)
+    assert parse_range("-2.5 - 2.5") == (-2.5, 2.5)
+    assert parse_range("<5.0") == (-math.inf, 5.0)
+    assert parse_range("до 10") == (-math.inf, 10.0)
+    assert parse_range("более 60") == (60.0, math.inf)
+    assert parse_range("см. комментарий") is None
+    assert parse_value("14,5") == 14.5
+    assert parse_value("<0.5 мг/л") == 0.5
+    assert parse_value("10-20") is None
+    assert parse_value("2-3") is None
+    assert parse_value("1:160") is None
+    assert parse_value("1 / 40") is None
+    assert parse_value("отрицательно") is None
+
+
+def test_compute_statuses():
+    """Test normal and abnormal results; without critical limits nothing is critical"""
+    results = [
+        {"result_value": "145", "reference_range": "120-160"},
+        {"result_value": "170", "reference_range": "120-160"},
+        {"result_value": "75", "reference_range": "120-160", "status": "normal"},
+        {"result_value": "12", "reference_range": "<5"},
+        {"result_value": "330", "reference_range": "20-150"},
+        {"result_value": "8", "reference_range": "до 10"},
+        {"result_value": "обнаружено", "reference_range": "не обнаружено"},
+        {"result_value": "+", "reference_range": "см. бланк"},
+        {"result_value": "5.1", "reference_range": None},
+        {"result_value": "1:160", "reference_range": "<1:40"},
+        {"result_value": "7.1", "reference_range": "3.5-5.1", "status": "critical"},
+        {"result_value": "4.1", "reference_range": "3.5-5.1", "status": "critical"},
+    ]
+    assert compute_statuses(results) == 9
+    assert [result.get("status") for result in results] == [
+        "normal", "abnormal", "abnormal", "abnormal", "abnormal", "normal", "abnormal", None, None, None,
+        "abnormal", "normal",
+    ]
+
+
+def test_critical_limits(tmp_path):
+    """Test that only configured critical limits for the test code and unit make a result critical"""
+    path = tmp_path / "critical.json"
+    path.write_text(json.dumps({"K": [{"unit": "ммоль/л", "low": 2.5, "high": 6.5}], "HGB": [{"unit": "г/л", "low": 60}]}))
+    limits = load_critical_limits(str(path))
+    assert limits[("HGB", "г/л")] == (60.0, math.inf)
+
+    results = [
+        {"test_code": "K", "result_value": "6.9", "unit": "Ммоль / л", "reference_range": "3.5-5.1"},
+        {"test_code": "K", "result_value": "5.6", "unit": "ммоль/л", "reference_range": "3.5-5.1"},
+        {"test_code": "K", "result_value": "6.9", "unit": "мг/дл", "reference_range": "3.5-5.1"},
+        {"test_code": "HGB", "result_value": "55", "unit": "г/л", "reference_range": "120-160"},
+        {"test_code": "CRP", "result_value": "12", "unit": "мг/л", "reference_range": "<5"},
+    ]
+    compute_statuses(results, limits)
+    assert [result["status"] for result in results] == ["critical", "abnormal", "abnormal", "critical", "abnormal"]
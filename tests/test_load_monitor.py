@@ -0,0 +1,61 @@
+"""Load monitor and admission control tests"""
+
+import asyncio
+import time
+
+from app.services.load_monitor import AdmissionController, LoopLagMonitor
+from app.services.priority_lanes import Lane
+from app.services.metrics import metrics
+
+
+def test_blocked_loop_sheds_until_lag_leaves_the_window():
+    """Test that blocking the loop is measured as lag and sheds requests for the window"""
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.01, window_seconds=0.3)
+        controller = AdmissionController(monitor, max_lag_ms=100, retry_after=1)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            assert controller.admit() is None
+            
+            time.sleep(0.2)  # Synchronous work on the loop
+            await asyncio.sleep(0.03)
+            assert monitor.max_lag_ms >= 150
+            assert "lag" in controller.admit()
+            assert controller.status()["ready"] is False
+            assert metrics.get("loop.lag_max_ms") >= 150
+            
+            await asyncio.sleep(0.4)
+            assert controller.admit() is None
+        finally:
+            await monitor.stop()
+    
+    asyncio.run(scenario())
+
+
+def test_queue_depth_threshold_and_gauges():
+    """Test shedding on requests queued in the lanes"""
+    async def scenario():
+        lane = Lane("batch", max_concurrency=1, max_queue=10, deadline_seconds=10, image_workers=1)
+        monitor = LoopLagMonitor(lanes=[lane])
+        controller = AdmissionController(monitor, max_queued=2, retry_after=3)
+        release = asyncio.Event()
+        
+        async def hold():
+            async with lane.slot():
+                await release.wait()
+        
+        tasks = [asyncio.create_task(hold()) for _ in range(4)]
+        await asyncio.sleep(0)
+        monitor.record(0.0)
+        assert metrics.get("requests.in_flight") == 1
+        assert metrics.get("requests.queued") == 3
+        assert "3 requests are queued" in controller.admit()
+        assert controller.retry_after_seconds() == 3
+        
+        release.set()
+        await asyncio.gather(*tasks)
+        assert controller.status() == {"ready": True, "reason": None, "loop_lag_ms": 0.0, "in_flight": 0, "queued": 0}
+        lane.shutdown()
+    
+    asyncio.run(scenario())
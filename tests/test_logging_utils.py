@@ -0,0 +1,64 @@
+"""Queued JSON logging tests"""
+
+import io
+import json
+import logging
+
+from app.utils.logging_utils import SamplingFilter, capped, configure_logging, parse_sample_rates
+
+
+def test_queued_json_records_are_capped():
+    """Test JSON output from the listener thread, message caps and lazily rendered payloads"""
+    stream = io.StringIO()
+    root = logging.getLogger()
+    previous_handlers, previous_level = root.handlers[:], root.level
+    handler = configure_logging("INFO", "json", max_message_length=100, stream=stream)
+    try:
+        logger = logging.getLogger("app.test")
+        report = {"test_results": [{"test_name": f"Показатель {index}"} for index in range(1000)]}
+        logger.info("Extracted %s", capped(report, 50), extra={"tenant": "clinic"})
+        logger.warning("%s", "x" * 500)
+
+        rendered = []
+
+        class Payload:
+            def __str__(self):
+                rendered.append(True)
+                return "payload"
+
+        logger.debug("Not emitted: %s", Payload())
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logger.exception("Failed")
+        handler.stop()
+    finally:
+        root.handlers[:] = previous_handlers
+        root.setLevel(previous_level)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["levelname"] for record in records] == ["INFO", "WARNING", "ERROR"]
+    assert records[0]["name"] == "app.test"
+    assert records[0]["tenant"] == "clinic"
+    assert records[0]["message"].startswith("Extracted {'test_results': [{'test_name'")
+    assert len(records[0]["message"]) < 100
+    assert records[1]["message"].endswith("... (500 chars)")
+    assert "ValueError: broken" in records[2]["exc_info"]
+    assert not rendered
+
+
+def test_sampling_by_logger():
+    """Test that rates apply to a logger and its children and spare warnings"""
+    rates = parse_sample_rates("app.utils=0, app.utils.image_utils=1 ,app.services.openai_service=0.5")
+    assert rates == {"app.utils": 0.0, "app.utils.image_utils": 1.0, "app.services.openai_service": 0.5}
+    sampling = SamplingFilter(rates)
+
+    def record(name, level=logging.INFO):
+        return logging.LogRecord(name, level, __file__, 1, "message", None, None)
+
+    assert not sampling.filter(record("app.utils.json_utils"))
+    assert sampling.filter(record("app.utils.json_utils", logging.WARNING))
+    assert sampling.filter(record("app.utils.image_utils.tiles"))
+    assert sampling.filter(record("app.main"))
+    kept = sum(sampling.filter(record("app.services.openai_service")) for _ in range(2000))
+    assert 800 < kept < 1200
@@ -0,0 +1,63 @@
+"""Name normalizer tests"""
+
+import json
+
+from app.schemas.base import DocumentType
+from app.services.name_normalizer import NameNormalizer
+
+normalizer = NameNormalizer.load()
+
+
+def test_synonyms_abbreviations_and_qualifiers():
+    """Test that spellings of one test or drug map to one code"""
+    for name in ("Гемоглобин", "HGB", "Hb", "Гемоглобин (HGB)", "гемоглобин в крови"):
+        assert normalizer.lookup("lab_tests", name) == "HGB"
+    assert normalizer.lookup("lab_tests", "Холестерин общий") == "CHOL"
+    assert normalizer.lookup("lab_tests", "Холестерин ЛПНП") == "LDL"
+    assert normalizer.lookup("lab_tests", "Гемоглобин гликированный") == "HBA1C"
+    assert normalizer.lookup("medications", "Нурофен 200 мг") == "ibuprofen"
+    assert normalizer.lookup("medications", "Омепразол 20 мг капс.") == "omeprazole"
+    assert normalizer.lookup("medications", "Витамин D3") == "cholecalciferol"
+
+
+def test_typos_unknown_and_conflicting_names():
+    """Test that typos are corrected, but not in abbreviations, and unknown names stay unmapped"""
+    assert normalizer.lookup("lab_tests", "Креатенин") == "CREA"
+    assert normalizer.lookup("lab_tests", "Гемоглабин (HGB)") == "HGB"
+    assert normalizer.lookup("lab_tests", "Эритроциты в сывроотке") == "RBC"
+    assert normalizer.lookup("medications", "Амоксицилин") == "amoxicillin"
+    assert normalizer.lookup("lab_tests", "ALP") == "ALP"
+    assert normalizer.lookup("lab_tests", "AMP") is None
+    assert normalizer.lookup("lab_tests", "Глюкоза в моче") is None
+    assert normalizer.lookup("lab_tests", "Гомоцистеин") is None
+    assert normalizer.lookup("lab_tests", "Гемоглобин (RBC)") is None
+
+
+def test_no_correction_into_a_different_analyte():
+    """Test that qualifiers and abbreviations telling analytes apart are never corrected away"""
+    assert normalizer.lookup("lab_tests", "Билирубин прямой") == "DBIL"
+    assert normalizer.lookup("lab_tests", "Билирубин непрямой") is None
+    assert normalizer.lookup("lab_tests", "Непрямой билирубин") is None
+    assert normalizer.lookup("lab_tests", "Холестерин ЛПОНП") is None
+    assert normalizer.lookup("lab_tests", "холестерин лпонп") is None
+    assert normalizer.lookup("lab_tests", "ЛПОНП") is None
+    assert normalizer.lookup("lab_tests", "Холестирин ЛПНП") == "LDL"
+
+
+def test_annotate_and_extra_dictionary(tmp_path):
+    """Test codes added to parsed data and synonyms loaded from an extra file"""
+    lab_report = {"test_results": [
+        {"test_name": "Hb", "result_value": "141"},
+        {"test_name": "Посев", "result_value": "отрицательно"},
+    ]}
+    normalizer.annotate(DocumentType.LAB_REPORT, lab_report)
+    assert [result["test_code"] for result in lab_report["test_results"]] == ["HGB", None]
+
+    visit = {"medications": [{"name": "Амоксиклав 875/125"}]}
+    assert normalizer.annotate(DocumentType.DOCTOR_VISIT, visit)["medications"][0]["code"] == "amoxicillin_clavulanate"
+
+    path = tmp_path / "synonyms.json"
+    path.write_text(json.dumps({"lab_tests": {"HCY": ["Гомоцистеин"], "HGB": ["Гемоглобин крови общий"]}}))
+    extended = NameNormalizer.load(str(path))
+    assert extended.lookup("lab_tests", "гомоцистеин") == "HCY"
+    assert extended.lookup("lab_tests", "Hb") == "HGB"
@@ -0,0 +1,83 @@
+"""Model call retry and token accounting tests"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIConnectionError, BadRequestError, InternalServerError
+
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.openai_service import OpenAIService
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(error_class, status_code):
+    response = httpx.Response(status_code, request=REQUEST)
+    return error_class("upstream error", response=response, body=None)
+
+
+class FakeCompletions:
+    """Raises the given errors in order, then answers"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def create(self, **params):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=10, total_tokens=1010)
+        message = SimpleNamespace(content='{"ok": true}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+
+def make_service(monkeypatch, errors):
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(settings, "openai_tokens_per_minute", 100000)
+    monkeypatch.setattr(settings, "openai_max_retries", 2)
+    monkeypatch.setattr(OpenAIService, "_retry_after", staticmethod(lambda error, attempt: 0.01))
+    service = OpenAIService()
+    completions = FakeCompletions(errors)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service, completions
+
+
+def create(service):
+    params = {"model": "gpt-4o", "max_tokens": 500, "messages": []}
+    return asyncio.run(service._create_completion(params, 1000, "default", "interactive"))
+
+
+def test_server_and_connection_errors_are_retried(monkeypatch):
+    """Test that 5xx answers and connection errors are retried and their tokens refunded"""
+    metrics.reset()
+    service, completions = make_service(monkeypatch, [
+        status_error(InternalServerError, 503),
+        APIConnectionError(request=REQUEST),
+    ])
+
+    response = create(service)
+
+    assert response.usage.total_tokens == 1010
+    assert completions.calls == 3
+    assert metrics.get("openai.transient_errors") == 2
+    # Only the answered call stays in the token budget
+    assert service.scheduler._usage()[1] == 1010
+
+
+def test_failed_calls_refund_their_tokens(monkeypatch):
+    """Test that calls that fail for good give back the tokens reserved for them"""
+    service, completions = make_service(monkeypatch, [status_error(BadRequestError, 400)])
+    with pytest.raises(BadRequestError):
+        create(service)
+    assert completions.calls == 1
+    assert service.scheduler._usage()[1] == 0
+
+    service, completions = make_service(monkeypatch, [status_error(InternalServerError, 500)] * 3)
+    with pytest.raises(InternalServerError):
+        create(service)
+    assert completions.calls == 3
+    assert service.scheduler._usage()[1] == 0
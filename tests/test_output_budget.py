@@ -0,0 +1,86 @@
+"""Output token budgeting and continuation tests"""
+
+import asyncio
+from types import SimpleNamespace
+
+from app.config import settings
+from app.schemas.base import DocumentType
+from app.services.metrics import metrics
+from app.services.openai_service import OpenAIService
+from app.services.output_budget import OutputTokenEstimator
+
+
+class FakeCompletions:
+    """Returns the given (content, finish_reason) pairs in order"""
+    
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+    
+    async def create(self, **params):
+        self.calls.append(params)
+        content, finish_reason = self.replies.pop(0)
+        usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=len(content), total_tokens=1000 + len(content))
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)], usage=usage)
+
+
+def make_service(monkeypatch, replies):
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    service = OpenAIService()
+    completions = FakeCompletions(replies)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service, completions
+
+
+def test_estimator_scales_and_learns():
+    """Test budgets by type, page size and field share, and learning from usage"""
+    estimator = OutputTokenEstimator(min_tokens=300, max_tokens=4096)
+    page = 300 * 1024
+    lab = estimator.estimate(DocumentType.LAB_REPORT, page)
+    prescription = estimator.estimate(DocumentType.PRESCRIPTION, page)
+    assert prescription < lab
+    assert estimator.estimate(DocumentType.LAB_REPORT, page * 2) > lab
+    assert estimator.estimate(DocumentType.LAB_REPORT, page, fraction=0.01) == 300
+    
+    for _ in range(20):
+        estimator.observe(DocumentType.PRESCRIPTION, page, 2000)
+    assert estimator.estimate(DocumentType.PRESCRIPTION, page) > 2000
+
+
+def test_truncated_extraction_is_continued(monkeypatch):
+    """Test that a response cut at max_tokens is continued, not re-run"""
+    metrics.reset()
+    service, completions = make_service(monkeypatch, [
+        ('```json\n{"patient_name": "Иванов", "medications": [{"name": "Амокси', "length"),
+        ('```json\n{"name": "Амоксициллин"}]}\n```', "stop"),
+    ])
+    
+    result = asyncio.run(service.extract_structured_data("aW1n", "prescription", "- patient_name", max_tokens=20))
+    
+    assert result == {"patient_name": "Иванов", "medications": [{"name": "Амоксициллин"}]}
+    assert len(completions.calls) == 2
+    continuation = completions.calls[1]["messages"]
+    assert continuation[1]["role"] == "assistant"
+    assert continuation[2]["content"] == OpenAIService.CONTINUATION_PROMPT
+    assert metrics.get("extraction.continued") == 1
+    assert metrics.get("extraction.single") == 0
+    assert metrics.get("extraction.continued.failure_rate") == 0
+
+
+def test_continuations_are_limited(monkeypatch):
+    """Test that extraction gives up after the configured continuations"""
+    metrics.reset()
+    monkeypatch.setattr(settings, "extraction_max_continuations", 1)
+    service, completions = make_service(monkeypatch, [('{"a": "', "length"), ('xx', "length")])
+    
+    try:
+        asyncio.run(service.extract_structured_data("aW1n", "prescription", "- a", max_tokens=5))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("truncated JSON should not parse")
+    
+    assert len(completions.calls) == 2
+    assert metrics.get("extraction.truncated") == 1
+    assert metrics.get("extraction.continued.failure_rate") == 1
@@ -0,0 +1,74 @@
+"""Priority lane tests"""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.priority_lanes import Lane, LaneFullError, PriorityLanes
+
+
+def test_resolve_priority():
+    """Test header and tenant based lane selection"""
+    lanes = PriorityLanes(settings, batch_tenants="archive-migration")
+    try:
+        assert lanes.resolve(None, "clinic") == "interactive"
+        assert lanes.resolve("BATCH", "clinic") == "batch"
+        assert lanes.resolve("urgent", "clinic") == "interactive"
+        assert lanes.resolve("interactive", "archive-migration") == "batch"
+    finally:
+        lanes.shutdown()
+
+
+def test_lane_rejects_when_queue_is_full():
+    """Test that a saturated lane queues up to max_queue and rejects the rest"""
+    async def scenario():
+        lane = Lane("batch", max_concurrency=1, max_queue=1, deadline_seconds=10, image_workers=1)
+        release = asyncio.Event()
+        
+        async def hold():
+            async with lane.slot():
+                await release.wait()
+        
+        running = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert lane.in_flight == 1
+        assert lane.waiting == 1
+        
+        with pytest.raises(LaneFullError):
+            async with lane.slot():
+                pass
+        
+        release.set()
+        await asyncio.gather(running, queued)
+        assert lane.in_flight == 0
+        lane.shutdown()
+    
+    asyncio.run(scenario())
+
+
+def test_queued_request_times_out_at_its_deadline():
+    """Test that waiting for a slot ends at the timeout without leaking the slot"""
+    async def scenario():
+        lane = Lane("batch", max_concurrency=1, max_queue=10, deadline_seconds=10, image_workers=1)
+        release = asyncio.Event()
+        
+        async def hold():
+            async with lane.slot():
+                await release.wait()
+        
+        running = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            async with lane.slot(timeout=0.05):
+                pass
+        assert lane.waiting == 0
+        
+        release.set()
+        await running
+        async with lane.slot(timeout=0.05):
+            assert lane.in_flight == 1
+        lane.shutdown()
+    
+    asyncio.run(scenario())
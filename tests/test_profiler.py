@@ -0,0 +1,72 @@
+"""Request profiler tests"""
+
+import asyncio
+import pstats
+
+import pytest
+
+from app.services.priority_lanes import Lane
+from app.services.profiler import RequestProfiler, in_active_profile
+
+
+def busy_work(count: int) -> int:
+    """CPU work run on a lane thread"""
+    return sum(i * i for i in range(count))
+
+
+async def profiled_request(profiler: RequestProfiler, token):
+    """Profile one fake request that hands work to a lane thread pool"""
+    lane = Lane("interactive", max_concurrency=1, max_queue=1, deadline_seconds=10, image_workers=1)
+    try:
+        profile = profiler.begin(token, "analyze-clinic/1")
+        if profile is None:
+            return None
+        await lane.run_in_executor(busy_work, 10_000)
+        profiler.end(profile)
+        return profiler.save(profile)
+    finally:
+        lane.shutdown()
+
+
+def test_token_sampling_and_listing(tmp_path):
+    """Test that only picked requests are profiled, thread pool work included, and old profiles are pruned"""
+    profiler = RequestProfiler(str(tmp_path), token="secret", max_profiles=2)
+    assert asyncio.run(profiled_request(profiler, None)) is None
+    assert asyncio.run(profiled_request(profiler, "wrong")) is None
+
+    names = [asyncio.run(profiled_request(profiler, "secret")) for _ in range(3)]
+    assert all(name.endswith("-analyze-clinic_1.pstats") for name in names)
+    listed = profiler.list_profiles()
+    assert len(listed) == 2
+    assert {profile["format"] for profile in listed} == {"pstats"}
+
+    stats = pstats.Stats(str(profiler.path_of(names[-1])))
+    assert any(function == "busy_work" for _, _, function in stats.stats)
+    assert profiler.path_of("../secret.pstats") is None
+
+    sampled = RequestProfiler(str(tmp_path / "sampled"), sample_rate=1.0)
+    assert asyncio.run(profiled_request(sampled, None)) is not None
+    assert not sampled.authorized("")
+
+
+def test_thread_work_under_a_running_profile(tmp_path):
+    """Test a worker call that starts while the request's profiler is active on the same thread"""
+    profiler = RequestProfiler(str(tmp_path), token="secret")
+    profile = profiler.begin("secret", "nested")
+    try:
+        # From Python 3.12 the request's cProfile is active on every thread
+        assert in_active_profile(busy_work)(10_000) == busy_work(10_000)
+    finally:
+        profiler.end(profile)
+
+    stats = pstats.Stats(str(profiler.path_of(profiler.save(profile))))
+    assert any(function == "busy_work" for _, _, function in stats.stats)
+
+
+def test_pyinstrument_flame_graph(tmp_path):
+    """Test the HTML output of the pyinstrument engine"""
+    pytest.importorskip("pyinstrument")
+    profiler = RequestProfiler(str(tmp_path), token="secret", engine="pyinstrument")
+    name = asyncio.run(profiled_request(profiler, "secret"))
+    assert name.endswith(".html")
+    assert "<html" in profiler.path_of(name).read_text(encoding="utf-8").lower()
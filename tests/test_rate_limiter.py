@@ -0,0 +1,115 @@
+"""Model API budget scheduler tests"""
+
+import asyncio
+import threading
+
+from app.services.rate_limiter import (
+    TokenBudgetScheduler,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    estimate_image_tokens,
+)
+from app.services.shared_store import SharedStore
+
+
+def test_estimate_image_tokens():
+    """Test vision token estimate for common page sizes"""
+    # 1024x1024 -> 768x768 -> 2x2 tiles
+    assert estimate_image_tokens(1024, 1024) == 85 + 170 * 4
+    # A4 page at 2048px long edge -> 768x1086 -> 2x3 tiles
+    assert estimate_image_tokens(1448, 2048) == 85 + 170 * 6
+    assert estimate_image_tokens(100, 100) == 85 + 170
+
+
+def test_interactive_served_before_batch_and_tenants_round_robin():
+    """Test grant order once budget frees up"""
+    async def scenario():
+        scheduler = TokenBudgetScheduler(requests_per_minute=1, tokens_per_minute=0)
+        await scheduler.acquire(10)  # spend the budget
+        
+        order = []
+        
+        async def call(name, tenant, priority):
+            await scheduler.acquire(10, tenant=tenant, priority=priority)
+            order.append(name)
+        
+        tasks = [
+            asyncio.create_task(call("batch-a1", "a", PRIORITY_BATCH)),
+            asyncio.create_task(call("batch-a2", "a", PRIORITY_BATCH)),
+            asyncio.create_task(call("batch-b1", "b", PRIORITY_BATCH)),
+            asyncio.create_task(call("interactive-c1", "c", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 4
+        
+        # Release budget one call at a time
+        for _ in range(4):
+            scheduler.requests_per_minute += 1
+            scheduler._dispatch()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+    
+    assert asyncio.run(scenario()) == ["interactive-c1", "batch-a1", "batch-b1", "batch-a2"]
+
+
+def test_token_budget_waits_instead_of_failing():
+    """Test that calls over the token budget wait and cancelled waiters are dropped"""
+    async def scenario():
+        scheduler = TokenBudgetScheduler(requests_per_minute=0, tokens_per_minute=1000)
+        await scheduler.acquire(900)
+        
+        waiter = asyncio.create_task(scheduler.acquire(500))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        
+        # Real usage was lower than reserved: budget frees up
+        scheduler.record_usage(300, 900)
+        await asyncio.wait_for(waiter, timeout=1)
+        
+        blocked = asyncio.create_task(scheduler.acquire(900))
+        await asyncio.sleep(0.01)
+        blocked.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 0
+    
+    asyncio.run(scenario())
+
+
+def test_shared_budget_is_synced_off_the_event_loop(tmp_path):
+    """Test that workers share one budget through the store without SQLite calls on the loop"""
+    store_threads = set()
+    
+    class RecordingStore(SharedStore):
+        def _connection(self):
+            store_threads.add(threading.get_ident())
+            return super()._connection()
+    
+    class Scheduler(TokenBudgetScheduler):
+        WINDOW_SECONDS = 3600
+        SYNC_INTERVAL_SECONDS = 0.01
+    
+    async def scenario():
+        store = RecordingStore(str(tmp_path / "state.db"))
+        worker_a = Scheduler(requests_per_minute=0, tokens_per_minute=1000, shared_store=store)
+        worker_b = Scheduler(requests_per_minute=0, tokens_per_minute=1000, shared_store=store)
+        await worker_a.acquire(600)
+        await asyncio.sleep(0.05)
+        
+        # Worker b sees worker a's reservation
+        waiter = asyncio.create_task(worker_b.acquire(600))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        
+        # Worker a's refund reaches worker b with its next exchange
+        worker_a.record_usage(100, 600)
+        await asyncio.sleep(0.05)
+        worker_b._dispatch()
+        await asyncio.wait_for(waiter, timeout=1)
+        await asyncio.sleep(0.05)
+        return store
+    
+    store = asyncio.run(scenario())
+    assert store_threads and threading.get_ident() not in store_threads
+    assert store.get_counter("openai:tpm", window_seconds=3600) == 700
+    assert store.get_counter("openai:rpm", window_seconds=3600) == 2
@@ -0,0 +1,61 @@
+"""Search index tests"""
+
+from app.services.search_index import SearchIndex
+from app.utils.russian_stemmer import stem, stem_tokens
+
+
+def test_stem_inflected_forms():
+    """Test that inflected forms of a term share a stem"""
+    assert {stem(word) for word in ("ферритин", "ферритина", "ферритином")} == {"ферритин"}
+    assert {stem(word) for word in ("бронхит", "бронхита", "бронхитом")} == {"бронхит"}
+    assert stem("повышенного") == stem("повышенный")
+    assert stem_tokens("HbA1c, Ёмкость") == ["hba1c", stem("емкость")]
+
+
+def make_index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.add("lab-1", "lab_report", {
+        "patient_name": "Иванов Иван",
+        "summary": "Снижен уровень ферритина",
+        "test_results": [{"test_name": "Ферритин"}, {"test_name": "Гемоглобин"}],
+        "report_date": "2025-03-01",
+    }, filename="lab.jpg")
+    index.add("lab-2", "lab_report", {
+        "patient_name": "Петрова Анна",
+        "test_results": [{"test_name": "Гемоглобин"}],
+    })
+    index.add("visit-1", "doctor_visit", {
+        "patient_name": "Иванов Иван",
+        "diagnosis": "Железодефицитная анемия",
+        "summary": "Контроль ферритина через месяц",
+    })
+    return index
+
+
+def test_search_ranks_and_filters(tmp_path):
+    """Test inflected queries, ranking, patient and type filters"""
+    index = make_index(tmp_path)
+
+    hits = index.search("ферритином")
+    assert [hit["document_id"] for hit in hits] == ["lab-1", "visit-1"]
+    assert hits[0]["document_date"] == "2025-03-01"
+    assert "ферритин" in hits[0]["snippet"].lower()
+
+    assert [hit["document_id"] for hit in index.search("гемоглобин", patient="петрова")] == ["lab-2"]
+    assert [hit["document_id"] for hit in index.search("ферритин", document_type="doctor_visit")] == ["visit-1"]
+    assert [hit["document_id"] for hit in index.search("анемии ферритина")] == ["visit-1"]
+    assert index.search('" OR * NEAR(') == []
+
+
+def test_reindex_replaces_terms(tmp_path):
+    """Test that re-indexing a document drops its old terms"""
+    index = make_index(tmp_path)
+    index.add("lab-1", "lab_report", {"patient_name": "Иванов Иван", "summary": "Норма"})
+
+    assert [hit["document_id"] for hit in index.search("ферритин")] == ["visit-1"]
+    assert [hit["document_id"] for hit in index.search("норма")] == ["lab-1"]
+    assert index.count() == 3
+
+    assert index.remove("lab-1")
+    assert index.search("норма") == []
+    assert not index.remove("lab-1")
@@ -0,0 +1,50 @@
+"""Shared state store tests"""
+
+import multiprocessing
+import os
+import stat
+
+from app.services.shared_store import SharedStore
+
+
+def _increment_in_child(path: str):
+    SharedStore(path).incr_counter("requests", 5, window_seconds=3600)
+
+
+def test_cache_roundtrip_and_expiry(tmp_path):
+    """Test cache set/get and TTL handling"""
+    store = SharedStore(str(tmp_path / "state.db"))
+    store.cache_set("a", b"payload", ttl_seconds=60)
+    store.cache_set("b", b"stale", ttl_seconds=-1)
+    
+    assert store.cache_get("a") == b"payload"
+    assert store.cache_get("b") is None
+    assert store.cache_get("missing") is None
+    assert store.cache_purge_expired() == 1
+    assert stat.S_IMODE(os.stat(store.path).st_mode) & 0o077 == 0
+
+
+def test_counters_shared_across_processes(tmp_path):
+    """Test that counters are visible to other processes"""
+    path = str(tmp_path / "state.db")
+    store = SharedStore(path)
+    store.incr_counter("requests", 2, window_seconds=3600)
+    
+    child = multiprocessing.get_context("spawn").Process(target=_increment_in_child, args=(path,))
+    child.start()
+    child.join(timeout=30)
+    
+    assert store.get_counter("requests", window_seconds=3600) == 7
+
+
+def test_cache_writes_purge_expired_entries(tmp_path, monkeypatch):
+    """Test that writing to the cache drops expired entries"""
+    store = SharedStore(str(tmp_path / "state.db"))
+    store.cache_set("a", b"stale", ttl_seconds=-1)
+    store.cache_set("b", b"stale", ttl_seconds=-1)
+    
+    monkeypatch.setattr(SharedStore, "PURGE_INTERVAL_SECONDS", 0)
+    store.cache_set("c", b"payload", ttl_seconds=60)
+    
+    assert store.cache_purge_expired() == 0
+    assert store.cache_get("c") == b"payload"
@@ -0,0 +1,75 @@
+"""Single-flight coalescing tests"""
+
+import asyncio
+import json
+import threading
+
+from app.services.shared_store import SharedStore
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    """Test that identical concurrent calls run the pipeline once"""
+    calls = []
+    
+    async def pipeline():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"document_type": "prescription"}
+    
+    async def scenario():
+        group = SingleFlight()
+        results = await asyncio.gather(*(group.do("same-image", pipeline) for _ in range(3)))
+        assert group.in_flight == 0
+        return results
+    
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"document_type": "prescription"}] * 3
+
+
+def test_caller_timeout_does_not_cancel_shared_run():
+    """Test that one caller giving up leaves the pipeline running for the others"""
+    async def pipeline():
+        await asyncio.sleep(0.05)
+        return "done"
+    
+    async def scenario():
+        group = SingleFlight()
+        impatient = asyncio.wait_for(group.do("key", pipeline), timeout=0.01)
+        patient = group.do("key", pipeline)
+        return await asyncio.gather(impatient, patient, return_exceptions=True)
+    
+    impatient, patient = asyncio.run(scenario())
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == "done"
+
+
+def test_workers_coalesce_through_shared_store(tmp_path):
+    """Test cross-worker coalescing with two groups sharing one store, off the event loop"""
+    calls = []
+    store_threads = set()
+    
+    class RecordingStore(SharedStore):
+        def _connection(self):
+            store_threads.add(threading.get_ident())
+            return super()._connection()
+    
+    async def pipeline():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"confidence": 0.9}
+    
+    async def scenario():
+        store = RecordingStore(str(tmp_path / "state.db"))
+        worker_a = SingleFlight(shared_store=store, poll_interval=0.01)
+        worker_b = SingleFlight(shared_store=store, poll_interval=0.01)
+        codec = {"encode": lambda r: json.dumps(r).encode(), "decode": json.loads}
+        return await asyncio.gather(
+            worker_a.do("key", pipeline, **codec),
+            worker_b.do("key", pipeline, **codec)
+        )
+    
+    assert asyncio.run(scenario()) == [{"confidence": 0.9}, {"confidence": 0.9}]
+    assert len(calls) == 1
+    assert store_threads and threading.get_ident() not in store_threads
@@ -0,0 +1,90 @@
+"""Speculative extraction tests"""
+
+import asyncio
+
+from app.schemas.base import DocumentType
+from app.services.metrics import metrics
+from app.services.speculation import SpeculativeAnalyzer, TypePredictor
+
+
+class FakeClassifier:
+    def __init__(self, document_type):
+        self.document_type = document_type
+    
+    async def classify(self, base64_image, tenant="default", priority="interactive"):
+        await asyncio.sleep(0.05)
+        return self.document_type, 0.9
+
+
+class FakeParser:
+    def __init__(self):
+        self.parsed = []
+        self.cancelled = []
+    
+    async def parse(self, base64_image, document_type, tenant="default", priority="interactive", fields=None):
+        try:
+            await asyncio.sleep(0.07)
+        except asyncio.CancelledError:
+            self.cancelled.append(document_type)
+            raise
+        self.parsed.append(document_type)
+        return {"parsed_as": document_type.value}
+
+
+def test_predictor_uses_filename_then_history():
+    """Test filename pre-signal and tenant history"""
+    predictor = TypePredictor(min_samples=3, min_probability=0.6)
+    assert predictor.predict("clinic", "Анализ_крови_2025.pdf") == DocumentType.LAB_REPORT
+    assert predictor.predict("clinic", "scan_001.jpg") is None
+    
+    for document_type in (DocumentType.PRESCRIPTION, DocumentType.PRESCRIPTION, DocumentType.LAB_REPORT):
+        predictor.record("clinic", document_type)
+    assert predictor.predict("clinic", "scan_001.jpg") == DocumentType.PRESCRIPTION
+    assert predictor.predict("other", "scan_001.jpg") is None
+
+
+def test_filename_hints_match_whole_words():
+    """Test that short keywords don't match inside other words"""
+    predictor = TypePredictor()
+    assert predictor.predict("clinic", "КТ_грудной_клетки.jpg") == DocumentType.DIAGNOSTIC_RESULTS
+    assert predictor.predict("clinic", "ct-head2.png") == DocumentType.DIAGNOSTIC_RESULTS
+    assert predictor.predict("clinic", "lab_results.pdf") == DocumentType.LAB_REPORT
+    assert predictor.predict("clinic", "Labs2024.jpg") == DocumentType.LAB_REPORT
+    assert predictor.predict("clinic", "laboratory-report.jpg") == DocumentType.LAB_REPORT
+    
+    for filename in ("доктор.jpg", "акт_выполненных_работ.pdf", "продукты.jpg", "label.png", "collab_notes.jpg"):
+        assert predictor.predict("clinic", filename) is None, filename
+
+
+def test_speculation_hit_overlaps_calls():
+    """Test that a correct guess runs classify and extract concurrently"""
+    metrics.reset()
+    parser = FakeParser()
+    analyzer = SpeculativeAnalyzer(FakeClassifier(DocumentType.LAB_REPORT), parser, TypePredictor())
+    
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await analyzer.analyze("img", filename="lab_results.jpg")
+        return result, loop.time() - started
+    
+    (document_type, _, data), elapsed = asyncio.run(run())
+    assert document_type == DocumentType.LAB_REPORT
+    assert data == {"parsed_as": "lab_report"}
+    assert elapsed < 0.11  # sequential would take 0.12
+    assert metrics.get("speculation.hits") == 1
+    assert metrics.get("speculation.hit_rate") == 1.0
+
+
+def test_speculation_miss_cancels_and_reparses():
+    """Test that a wrong guess is cancelled and the real type is extracted"""
+    metrics.reset()
+    parser = FakeParser()
+    analyzer = SpeculativeAnalyzer(FakeClassifier(DocumentType.PRESCRIPTION), parser, TypePredictor())
+    
+    document_type, _, data = asyncio.run(analyzer.analyze("img", filename="lab_results.jpg"))
+    assert document_type == DocumentType.PRESCRIPTION
+    assert data == {"parsed_as": "prescription"}
+    assert parser.cancelled == [DocumentType.LAB_REPORT]
+    assert metrics.get("speculation.misses") == 1
+    assert metrics.get("speculation.hit_rate") == 0.0
@@ -0,0 +1,113 @@
+"""Tiled extraction tests"""
+
+import asyncio
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+from app.schemas.base import DocumentType
+from app.services.document_parser import DocumentParser
+from app.services.tiled_extraction import TiledExtractor
+from app.utils.image_utils import encode_image_tiles
+
+
+def row(name, value=None, unit=None):
+    return {"test_name": name, "result_value": value, "unit": unit}
+
+
+class FakeParser(DocumentParser):
+    """Returns canned rows per strip and page fields for the whole page"""
+    
+    def __init__(self, tile_rows):
+        self.tile_rows = tile_rows
+        self.calls = []
+    
+    async def parse(self, base64_image, document_type, tenant="default", priority="interactive", fields=None):
+        self.calls.append((base64_image, fields))
+        await asyncio.sleep(0.05)
+        if fields == ["test_results"]:
+            rows = self.tile_rows[base64_image]
+            return None if rows is None else {"test_results": rows}
+        if self.tile_rows.get(base64_image, []) is None:
+            return None
+        return {
+            name: value for name, value in {
+                "summary": "Общий анализ крови",
+                "patient_name": "Иванов И.И.",
+                "report_date": "2025-10-16",
+                "lab_info": {"lab_name": "Лаборатория"},
+            }.items() if name in fields
+        }
+
+
+def test_encode_image_tiles_overlapping_strips():
+    """Test strip count, width and overlap for a tall page"""
+    buffer = BytesIO()
+    Image.new("RGB", (1000, 3000), "white").save(buffer, format="PNG")
+    
+    tiles = encode_image_tiles(buffer.getvalue(), max_width=2048, overlap=0.2, max_tiles=10)
+    sizes = [Image.open(BytesIO(base64.b64decode(tile))).size for tile in tiles]
+    assert len(tiles) == 8
+    assert all(size == (1000, 500) for size in sizes)
+    
+    capped = encode_image_tiles(buffer.getvalue(), max_width=2048, overlap=0.2, max_tiles=3)
+    assert len(capped) == 3
+    assert sum(Image.open(BytesIO(base64.b64decode(tile))).size[1] for tile in capped) >= 3000
+
+
+def test_merge_rows_deduplicates_overlap():
+    """Test that rows repeated at strip edges are kept once, preferring complete copies"""
+    merged = TiledExtractor.merge_rows([
+        [row("Гемоглобин", "145", "г/л"), row("Эритроциты", "4.5")],
+        [row("Эритроциты", "4.5", "10^12/л"), row("Лейкоциты", "6.1", "10^9/л")],
+        [row("лейкоциты ", "6.1"), row("Тромбоциты", "250", "10^9/л"), row("Тромбоциты", "250", "10^9/л")],
+    ])
+    assert [item["test_name"] for item in merged] == ["Гемоглобин", "Эритроциты", "Лейкоциты", "Тромбоциты", "Тромбоциты"]
+    assert merged[1]["unit"] == "10^12/л"
+
+
+def test_merge_rows_keeps_same_name_rows_with_other_values():
+    """Test that rows sharing a name at a strip boundary are kept apart by unit and value"""
+    merged = TiledExtractor.merge_rows([
+        [row("Лейкоциты", "6.1", "10^9/л"), row("Нейтрофилы", "55", "%")],
+        [row("Нейтрофилы", "3.4", "10^9/л"), row("Лимфоциты", "35", "%")],
+    ])
+    assert [(item["test_name"], item["unit"]) for item in merged] == [
+        ("Лейкоциты", "10^9/л"), ("Нейтрофилы", "%"), ("Нейтрофилы", "10^9/л"), ("Лимфоциты", "%")
+    ]
+
+
+def test_tiled_parse_runs_calls_concurrently():
+    """Test that strips and page fields are extracted at once and merged"""
+    parser = FakeParser({
+        "tile0": [row("Гемоглобин", "145", "г/л"), row("Эритроциты", "4.5", "10^12/л")],
+        "tile1": [row("Эритроциты", "4.5", "10^12/л"), row("Лейкоциты", "6.1", "10^9/л")],
+    })
+    extractor = TiledExtractor(parser)
+    
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await extractor.parse("page", ["tile0", "tile1"], DocumentType.LAB_REPORT)
+        return result, loop.time() - started
+    
+    data, elapsed = asyncio.run(run())
+    assert elapsed < 0.09
+    assert len(parser.calls) == 3
+    assert [item["test_name"] for item in data["test_results"]] == ["Гемоглобин", "Эритроциты", "Лейкоциты"]
+    assert data["patient_name"] == "Иванов И.И."
+    assert list(data) == list(DocumentParser.SCHEMA_CLASSES[DocumentType.LAB_REPORT].model_fields)
+
+
+def test_tiled_parse_keeps_rows_when_page_fields_fail():
+    """Test that failed page fields leave the strip rows in place, and only failed strips give None"""
+    parser = FakeParser({"page": None, "tile0": [row("Гемоглобин", "145", "г/л")], "tile1": None})
+    extractor = TiledExtractor(parser)
+    
+    data = asyncio.run(extractor.parse("page", ["tile0", "tile1"], DocumentType.LAB_REPORT))
+    assert [item["test_name"] for item in data["test_results"]] == ["Гемоглобин"]
+    assert data["patient_name"] is None
+    
+    parser.tile_rows["tile0"] = None
+    assert asyncio.run(extractor.parse("page", ["tile0", "tile1"], DocumentType.LAB_REPORT)) is None
@@ -0,0 +1,76 @@
+"""Tracing tests"""
+
+import asyncio
+from io import BytesIO
+
+import pytest
+
+from app.schemas.base import DocumentType
+from app.services import tracing
+from app.services.document_classifier import DocumentClassifier
+from app.services.priority_lanes import Lane
+from app.utils import encode_image_to_base64
+
+
+def test_noop_when_not_configured():
+    """Test that spans, attributes and traced functions work with tracing off"""
+    assert tracing.configure_tracing("") is False
+    with tracing.span("analyze", {"file.name": None}) as span:
+        span.set_attribute("file.bytes", 10)
+        tracing.set_attributes({"lane": "interactive"})
+        tracing.add_event("rate_limited")
+
+    @tracing.traced("double")
+    def double(value):
+        return value * 2
+
+    assert double(21) == 42
+    assert double.__name__ == "double"
+
+
+def test_spans_follow_the_pipeline_into_threads():
+    """Test that executor and model call spans are children of the request span, with attributes"""
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (300, 200), "white").save(buffer, format="PNG")
+
+    class FakeOpenAIService:
+        async def classify_document(self, base64_image, tenant, priority):
+            return {"document_type": "lab_report", "confidence": 0.9}
+
+    async def scenario():
+        lane = Lane("interactive", max_concurrency=1, max_queue=1, deadline_seconds=10, image_workers=1)
+        try:
+            with tracing.span("analyze", {"tenant": "clinic", "document.type": None}):
+                base64_image = await lane.run_in_executor(encode_image_to_base64, buffer.getvalue(), "page.png")
+                return await DocumentClassifier(FakeOpenAIService()).classify(base64_image)
+        finally:
+            lane.shutdown()
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracing.use_provider(provider)
+    try:
+        assert asyncio.run(scenario()) == (DocumentType.LAB_REPORT, 0.9)
+    finally:
+        tracing.shutdown_tracing()
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert set(spans) == {"analyze", "encode_image", "classify"}
+    root = spans["analyze"]
+    assert dict(root.attributes) == {"tenant": "clinic"}
+    for name in ("encode_image", "classify"):
+        assert spans[name].parent.span_id == root.context.span_id
+        assert spans[name].context.trace_id == root.context.trace_id
+    assert spans["encode_image"].attributes["image.width"] == 300
+    assert spans["encode_image"].attributes["image.base64_length"] > 0
+    assert spans["classify"].attributes["document.type"] == "lab_report"
+
+    # Off again after shutdown
+    assert tracing.span("analyze") is tracing.span("parse")
@@ -0,0 +1,87 @@
+"""Lab trend store tests"""
+
+import pytest
+
+from app.services.trend_store import TrendStore
+
+
+def report(day, hemoglobin, glucose="5,4 ммоль/л", **fields):
+    return {
+        "patient_name": "Иванов Иван",
+        "patient_id": "P-123",
+        "report_date": day,
+        "test_results": [
+            {"test_name": "Гемоглобин", "result_value": hemoglobin, "unit": None if " " in hemoglobin else "г/л"},
+            {"test_name": "Глюкоза", "result_value": glucose},
+            {"test_name": "Посев", "result_value": "отрицательно"},
+        ],
+        **fields,
+    }
+
+
+def test_parse_value():
+    """Test numeric value and unit parsing"""
+    assert TrendStore.parse_value("14,5", "г / Л") == (14.5, "г/л")
+    assert TrendStore.parse_value("<0.5 мг/л") == (0.5, "мг/л")
+    assert TrendStore.parse_value(7) == (7.0, "")
+    assert TrendStore.parse_value("не обнаружено") is None
+    assert TrendStore.parse_value("2-3") is None
+    assert TrendStore.parse_value("1:160") is None
+
+
+def test_series_aggregates_and_points(tmp_path):
+    """Test out-of-order ingestion, deduplication, aggregates and date filters"""
+    store = TrendStore(str(tmp_path / "trends.db"))
+    assert store.add_report(report("2025-03-01", "128")) == 2
+    assert store.add_report(report("2025-01-15", "141")) == 2
+    assert store.add_report(report("2025-02-10", "135", collection_date="2025-02-09")) == 2
+    assert store.add_report(report("2025-03-01", "128")) == 0
+
+    series = {entry["test"]: entry for entry in store.trends("p-123")}
+    assert set(series) == {"гемоглобин", "глюкоза"}
+
+    hemoglobin = series["гемоглобин"]
+    assert hemoglobin["unit"] == "г/л"
+    assert [point["date"] for point in hemoglobin["points"]] == ["2025-01-15", "2025-02-09", "2025-03-01"]
+    assert (hemoglobin["count"], hemoglobin["min"], hemoglobin["max"]) == (3, 128.0, 141.0)
+    assert hemoglobin["last"] == {"date": "2025-03-01", "value": 128.0}
+    assert series["глюкоза"]["unit"] == "ммоль/л"
+
+    filtered = store.trends("P-123", test="ГЕМОГЛОБИН", since="2025-02-01", until="2025-02-28")
+    assert [point["value"] for point in filtered[0]["points"]] == [135.0]
+    assert filtered[0]["count"] == 3
+    assert "points" not in store.trends("P-123", include_points=False)[0]
+    assert store.trends("P-999") == []
+    with pytest.raises(ValueError):
+        store.trends("P-123", since="01.02.2025")
+
+
+def test_units_and_missing_dates(tmp_path):
+    """Test that other units get their own series and undated reports are skipped"""
+    store = TrendStore(str(tmp_path / "trends.db"))
+    store.add_report(report("2025-01-15", "141"))
+    store.add_report(report("2025-02-15", "14.0 г/дл"))
+    assert [entry["unit"] for entry in store.trends("P-123", test="гемоглобин")] == ["г/дл", "г/л"]
+    assert store.add_report(report("", "150")) == 0
+
+
+def test_reports_without_patient_id_are_skipped(tmp_path):
+    """Test that patients are never matched by name"""
+    store = TrendStore(str(tmp_path / "trends.db"))
+    assert store.add_report(report("2025-01-15", "141", patient_id=None)) == 0
+    assert store.trends("Иванов Иван") == []
+
+
+def test_series_keyed_by_test_code(tmp_path):
+    """Test that differently named results of one test share a series"""
+    store = TrendStore(str(tmp_path / "trends.db"))
+    first = report("2025-01-15", "141")
+    first["test_results"][0]["test_code"] = "HGB"
+    second = report("2025-02-09", "135")
+    second["test_results"][0].update(test_name="Hb", test_code="HGB")
+    store.add_report(first)
+    store.add_report(second)
+
+    series = store.trends("P-123", test="HGB")
+    assert len(series) == 1
+    assert [point["value"] for point in series[0]["points"]] == [141.0, 135.0]